@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark: camino de persistencia anterior (add + commit + refresh) frente al
+INSERT único compartido (insert_submissions + commit).
+
+Uso (contra una base de datos de pruebas, las filas se borran al terminar):
+    DATABASE_URL=postgresql://... python benchmarks/insert_roundtrip.py -n 2000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete  # noqa: E402
+
+from database import (  # noqa: E402
+    AsyncSessionLocal,
+    FormSubmission,
+    async_engine,
+    create_tables,
+    insert_submissions,
+    normalize_submission_row,
+)
+from dimensions import dimension_cache  # noqa: E402
+from forms import FORMS_BY_NAME  # noqa: E402
+from ids import uuid7  # noqa: E402
+
+DATA = {"store": "KCH Centro"}
+
+
+def new_row() -> dict:
+    return {
+        "id": uuid7(),
+        "form": "favorite-store",
+        "received_at": datetime.now(timezone.utc),
+        "data": DATA,
+        **FORMS_BY_NAME["favorite-store"].extract(DATA),
+    }
+
+
+async def legacy_path(row: dict):
+    """Camino anterior: objeto ORM, commit y SELECT extra por db.refresh"""
+    # Las respuestas de dimensión se guardan como ids (<nombre>_id), igual que en insert_submissions
+    await dimension_cache.encode([row])
+    async with AsyncSessionLocal() as db:
+        submission = FormSubmission(**normalize_submission_row(row))
+        db.add(submission)
+        await db.commit()
+        await db.refresh(submission)
+
+
+async def single_insert_path(row: dict):
+    """Camino actual: un único INSERT sin recargar la fila"""
+    async with AsyncSessionLocal() as db:
+        await insert_submissions(db, [row])
+        await db.commit()
+
+
+async def measure(name: str, func, iterations: int, ids: list) -> dict:
+    timings = []
+    for _ in range(iterations):
+        row = new_row()
+        ids.append(row["id"])
+        start = time.perf_counter()
+        await func(row)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "path": name,
+        "iterations": iterations,
+        "mean_ms": statistics.fmean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+async def main(iterations: int, warmup: int):
+    ids = []
+    try:
+        # Calentamiento del pool y de la caché de sentencias de asyncpg
+        await measure("warmup", legacy_path, warmup, ids)
+        await measure("warmup", single_insert_path, warmup, ids)
+
+        results = [
+            await measure("add + commit + refresh", legacy_path, iterations, ids),
+            await measure("insert_submissions + commit", single_insert_path, iterations, ids),
+        ]
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(FormSubmission).where(FormSubmission.id.in_(ids)))
+            await db.commit()
+        await async_engine.dispose()
+
+    print(f"{'camino':<30} {'media ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for result in results:
+        print(f"{result['path']:<30} {result['mean_ms']:>10.3f} {result['p50_ms']:>10.3f} {result['p95_ms']:>10.3f}")
+    saved = results[0]["mean_ms"] - results[1]["mean_ms"]
+    print(f"\nAhorro medio por envío: {saved:.3f} ms ({saved / results[0]['mean_ms']:.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--iterations", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    args = parser.parse_args()
+
+    create_tables()
+    asyncio.run(main(args.iterations, args.warmup))
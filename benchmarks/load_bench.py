@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga: los nueve endpoints /form/* (uno por formulario del registro)
+más /health, con concurrencia configurable. Mide latencia p50/p95/p99 y
+peticiones por segundo, por endpoint y en total, y guarda el resultado en JSON
+para comparar entre versiones.
+
+Cada payload es el ejemplo (json_schema_extra) del modelo del formulario.
+Los envíos se guardan: usar una base de datos de pruebas.
+
+Uso:
+    # contra un servidor en marcha
+    python benchmarks/load_bench.py --url http://localhost:8000 -c 50 -d 30
+
+    # sin servidor: la app en el mismo proceso (DATABASE_URL=postgresql://...)
+    python benchmarks/load_bench.py --in-process -c 20 -d 10
+
+    # comparar con una ejecución anterior (sale con código 1 si el p95 empeora)
+    python benchmarks/load_bench.py -d 30 --baseline benchmarks/results/anterior.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from forms import FORMS  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# (nombre, método, ruta, cuerpo JSON)
+Target = Tuple[str, str, str, Optional[dict]]
+
+
+def build_targets(only: Optional[List[str]] = None) -> List[Target]:
+    targets = [
+        (spec.name, "POST", spec.route, spec.payload_model.model_config["json_schema_extra"]["example"])
+        for spec in FORMS
+    ]
+    targets.append(("health", "GET", "/health", None))
+    if only:
+        unknown = set(only) - {target[0] for target in targets}
+        if unknown:
+            raise SystemExit(f"Endpoints desconocidos: {', '.join(sorted(unknown))}")
+        targets = [target for target in targets if target[0] in only]
+    return targets
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentil por rango más cercano (valores ya ordenados)"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(timings: List[float], errors: int, elapsed: float) -> dict:
+    timings = sorted(timings)
+    return {
+        "requests": len(timings) + errors,
+        "errors": errors,
+        "rps": round((len(timings) + errors) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(timings) / len(timings), 3) if timings else 0.0,
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "max_ms": round(timings[-1], 3) if timings else 0.0,
+    }
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    targets: List[Target],
+    offset: int,
+    deadline: float,
+    timings: Dict[str, List[float]],
+    errors: Dict[str, int],
+    record: bool,
+):
+    """Bucle cerrado: una petición tras otra, recorriendo los endpoints en turno"""
+    index = offset
+    while time.perf_counter() < deadline:
+        name, method, path, body = targets[index % len(targets)]
+        index += 1
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if not record:
+            continue
+        if ok:
+            timings[name].append(elapsed_ms)
+        else:
+            errors[name] += 1
+
+
+async def run_phase(client, targets, concurrency: int, duration: float, record: bool) -> Tuple[dict, dict, float]:
+    timings = {target[0]: [] for target in targets}
+    errors = {target[0]: 0 for target in targets}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(
+        worker(client, targets, offset, deadline, timings, errors, record) for offset in range(concurrency)
+    ))
+    return timings, errors, time.perf_counter() - started
+
+
+async def run(args) -> dict:
+    targets = build_targets(args.endpoints)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    if args.in_process:
+        from main import app
+
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test")
+    else:
+        lifespan = None
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout)
+
+    try:
+        if args.warmup:
+            await run_phase(client, targets, args.concurrency, args.warmup, record=False)
+        timings, errors, elapsed = await run_phase(client, targets, args.concurrency, args.duration, record=True)
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+
+    all_timings = [value for values in timings.values() for value in values]
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "target": "in-process" if args.in_process else args.url,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "endpoints": [target[0] for target in targets],
+        },
+        "environment": environment(),
+        "overall": summarize(all_timings, sum(errors.values()), elapsed),
+        "endpoints": {name: summarize(timings[name], errors[name], elapsed) for name in timings},
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "git_commit": commit}
+
+
+def print_report(result: dict):
+    print(f"{'endpoint':<26} {'peticiones':>10} {'errores':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = list(result["endpoints"].items()) + [("TOTAL", result["overall"])]
+    for name, stats in rows:
+        print(
+            f"{name:<26} {stats['requests']:>10} {stats['errors']:>8} {stats['rps']:>9.1f} "
+            f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+        )
+
+
+def compare(result: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Endpoints cuyo p95 empeora más de `max_regression` (fracción) respecto a la referencia"""
+    regressions = []
+    print(f"\n{'endpoint':<26} {'p95 antes':>10} {'p95 ahora':>10} {'cambio':>8}")
+    current = {**result["endpoints"], "TOTAL": result["overall"]}
+    previous = {**baseline["endpoints"], "TOTAL": baseline["overall"]}
+    for name, stats in current.items():
+        if name not in previous or not previous[name]["p95_ms"]:
+            continue
+        change = stats["p95_ms"] / previous[name]["p95_ms"] - 1
+        flag = "  ← regresión" if change > max_regression else ""
+        print(f"{name:<26} {previous[name]['p95_ms']:>10.2f} {stats['p95_ms']:>10.2f} {change:>+8.0%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="URL base del servidor")
+    parser.add_argument("--in-process", action="store_true", help="Ejecutar la app en este proceso (sin servidor)")
+    parser.add_argument("-c", "--concurrency", type=int, default=20, help="Peticiones simultáneas")
+    parser.add_argument("-d", "--duration", type=float, default=10, help="Segundos de medición")
+    parser.add_argument("--warmup", type=float, default=2, help="Segundos de calentamiento (no se miden)")
+    parser.add_argument("--timeout", type=float, default=30, help="Timeout por petición en segundos")
+    parser.add_argument("--endpoints", nargs="+", help="Subconjunto de endpoints (p.ej. age contact health)")
+    parser.add_argument("-o", "--output", help="Fichero JSON de resultados (por defecto en benchmarks/results/)")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Empeoramiento de p95 tolerado (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"load_bench_{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResultados guardados en {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.max_regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: CPU por respuesta de los endpoints /form/*, sin red ni base
+de datos. Compara el camino anterior con el actual para los nueve formularios:
+
+    anterior  FormResponse validado + XResponse(**meta.model_dump(), data=payload)
+              + validación/serialización de FastAPI contra response_model
+              + JSONResponse (json.dumps)
+    actual    FormResponse.model_construct + dict + FormJSONResponse (orjson)
+
+Uso:
+    python benchmarks/serialization.py -n 20000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from forms import FORMS, FormJSONResponse, FormResponse, form_response_body  # noqa: E402
+from ids import uuid7  # noqa: E402
+
+
+def legacy_meta(form: str) -> FormResponse:
+    return FormResponse(id=str(uuid4()), form=form, received_at=datetime.now(timezone.utc))
+
+
+def fast_meta(form: str) -> FormResponse:
+    received_at = datetime.now(timezone.utc)
+    return FormResponse.model_construct(id=uuid7(received_at), form=form, received_at=received_at)
+
+
+async def measure(spec, iterations: int) -> dict:
+    payload = spec.payload_model.model_validate(spec.payload_model.model_config["json_schema_extra"]["example"])
+    data_dict = payload.model_dump()
+    field = create_response_field(f"Response_{spec.name}", spec.response_model, mode="serialization")
+
+    async def legacy():
+        meta = legacy_meta(spec.name)
+        response = spec.response_model(**meta.model_dump(), data=payload)
+        content = await serialize_response(field=field, response_content=response)
+        return JSONResponse(content).body
+
+    async def fast():
+        return FormJSONResponse(form_response_body(fast_meta(spec.name), data_dict)).body
+
+    result = {"form": spec.name}
+    for name, func in (("legacy_us", legacy), ("fast_us", fast)):
+        for _ in range(min(iterations, 1000)):
+            await func()
+        samples = []
+        # Lotes de 100 para que el coste de perf_counter no pese en la medida
+        for _ in range(max(1, iterations // 100)):
+            start = time.perf_counter()
+            for _ in range(100):
+                await func()
+            samples.append((time.perf_counter() - start) / 100 * 1e6)
+        result[name] = statistics.median(samples)
+    return result
+
+
+async def main(iterations: int):
+    results = [await measure(spec, iterations) for spec in FORMS]
+
+    print(f"{'formulario':<26} {'anterior µs':>12} {'actual µs':>10} {'ahorro µs':>10} {'ahorro':>7}")
+    for result in results:
+        saved = result["legacy_us"] - result["fast_us"]
+        print(
+            f"{result['form']:<26} {result['legacy_us']:>12.2f} {result['fast_us']:>10.2f} "
+            f"{saved:>10.2f} {saved / result['legacy_us']:>7.0%}"
+        )
+    legacy = statistics.fmean(result["legacy_us"] for result in results)
+    fast = statistics.fmean(result["fast_us"] for result in results)
+    print(f"\nAhorro medio por respuesta: {legacy - fast:.2f} µs de CPU ({(legacy - fast) / legacy:.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--iterations", type=int, default=20000, help="Respuestas por formulario y camino")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.iterations))
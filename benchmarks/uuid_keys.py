@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: claves primarias uuid4 (aleatorias) frente a UUIDv7 (ordenadas en
+el tiempo, ver ids.py) en una tabla de varios millones de filas.
+
+Llena dos tablas de prueba con la misma forma (id UUID PRIMARY KEY,
+received_at, payload) por lotes multi-fila, como la cola de ingesta, y mide
+por cada tipo de id:
+    - filas por segundo en total y en el último 10% de la carga (con la tabla
+      ya grande, cuando el índice no cabe en caché)
+    - tamaño final de la clave primaria y de la tabla
+    - WAL generado por fila (las hojas partidas y las escrituras de página
+      completa tras cada checkpoint lo disparan con claves aleatorias)
+
+Uso (contra una base de datos de pruebas; las tablas se borran al terminar):
+    DATABASE_URL=postgresql://... python benchmarks/uuid_keys.py --rows 5000000
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import engine  # noqa: E402
+from ids import uuid7  # noqa: E402
+
+GENERATORS = {"uuid4": uuid4, "uuid7": uuid7}
+PAYLOAD = '{"store": "KCH Centro"}'
+
+
+def table_name(kind: str) -> str:
+    return f"bench_keys_{kind}"
+
+
+def measure(cursor, kind: str, rows: int, batch_size: int) -> dict:
+    table = table_name(kind)
+    generate = GENERATORS[kind]
+    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    cursor.execute(
+        f"CREATE TABLE {table} (id UUID PRIMARY KEY, received_at TIMESTAMPTZ NOT NULL, payload TEXT NOT NULL)"
+    )
+    cursor.execute("CHECKPOINT")
+    cursor.execute("SELECT pg_current_wal_lsn()")
+    wal_start = cursor.fetchone()[0]
+
+    elapsed = tail_elapsed = 0.0
+    tail_start = rows - rows // 10
+    inserted = 0
+    while inserted < rows:
+        n = min(batch_size, rows - inserted)
+        # Los ids se generan fuera de la medida: solo cuenta el INSERT y su COMMIT
+        ids = [str(generate()) for _ in range(n)]
+        received_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        cursor.execute(
+            f"INSERT INTO {table} (id, received_at, payload) "
+            "SELECT id, %s, %s FROM unnest(%s::uuid[]) AS id",
+            (received_at, PAYLOAD, ids),
+        )
+        cursor.connection.commit()
+        batch_elapsed = time.perf_counter() - start
+        elapsed += batch_elapsed
+        if inserted >= tail_start:
+            tail_elapsed += batch_elapsed
+        inserted += n
+        if inserted % (batch_size * 100) == 0:
+            print(f"  {kind}: {inserted:,} filas, {inserted / elapsed:,.0f} filas/s", flush=True)
+
+    cursor.execute(
+        f"SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s), "
+        f"pg_relation_size('{table}_pkey'), pg_relation_size('{table}')",
+        (wal_start,),
+    )
+    wal_bytes, index_bytes, table_bytes = cursor.fetchone()
+    cursor.connection.commit()
+    return {
+        "kind": kind,
+        "rows_per_s": rows / elapsed,
+        "tail_rows_per_s": (rows - tail_start) / tail_elapsed if tail_elapsed else 0.0,
+        "index_mb": index_bytes / 2**20,
+        "table_mb": table_bytes / 2**20,
+        "wal_bytes_per_row": float(wal_bytes) / rows,
+    }
+
+
+def main(rows: int, batch_size: int, keep: bool):
+    connection = engine.raw_connection()
+    cursor = connection.cursor()
+    results = []
+    try:
+        for kind in GENERATORS:
+            print(f"Cargando {rows:,} filas con ids {kind}...")
+            results.append(measure(cursor, kind, rows, batch_size))
+    finally:
+        if not keep:
+            connection.rollback()
+            for kind in GENERATORS:
+                cursor.execute(f"DROP TABLE IF EXISTS {table_name(kind)}")
+            connection.commit()
+        connection.close()
+
+    print(f"\n{'ids':<6} {'filas/s':>10} {'filas/s (último 10%)':>21} {'PK MB':>8} {'tabla MB':>9} {'WAL B/fila':>11}")
+    for result in results:
+        print(
+            f"{result['kind']:<6} {result['rows_per_s']:>10,.0f} {result['tail_rows_per_s']:>21,.0f} "
+            f"{result['index_mb']:>8.1f} {result['table_mb']:>9.1f} {result['wal_bytes_per_row']:>11.1f}"
+        )
+    v4, v7 = results
+    print(
+        f"\nUUIDv7: {v7['rows_per_s'] / v4['rows_per_s']:.2f}x filas/s, "
+        f"{v7['tail_rows_per_s'] / v4['tail_rows_per_s']:.2f}x en el último 10%, "
+        f"PK {1 - v7['index_mb'] / v4['index_mb']:.0%} más pequeña"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5_000_000, help="Filas por tabla")
+    parser.add_argument("--batch-size", type=int, default=500, help="Filas por INSERT (como INGESTION_BATCH_SIZE)")
+    parser.add_argument("--keep", action="store_true", help="No borrar las tablas de prueba al terminar")
+    args = parser.parse_args()
+
+    main(args.rows, args.batch_size, args.keep)
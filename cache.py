@@ -0,0 +1,135 @@
+"""
+Caché en memoria (TTL + LRU) para consultas de lectura
+
+Pensada para los reportes que consultan los dashboards cada pocos segundos:
+cada entrada se etiqueta con los formularios de los que depende y se invalida
+en cuanto se confirma (commit) una inserción de alguno de ellos.
+La caché es por proceso: con varios workers, cada uno mantiene la suya.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, FrozenSet, Hashable, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import WRITTEN_FORMS_KEY
+
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "5"))
+REPORT_CACHE_MAXSIZE = int(os.getenv("REPORT_CACHE_MAXSIZE", "1024"))
+
+
+class TTLCache:
+    """
+    Caché LRU acotada en tamaño con caducidad por entrada e invalidación por etiquetas
+    """
+
+    def __init__(self, maxsize: int = REPORT_CACHE_MAXSIZE, ttl: float = REPORT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # clave -> (caduca_en, etiquetas, valor)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable):
+        """Valor en caché o None si no está o ha caducado"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, key: Hashable, value, tags: Iterable[str] = ()):
+        self._entries[key] = (time.monotonic() + self.ttl, frozenset(tags), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable], tags: Iterable[str] = ()):
+        """
+        Devuelve el valor en caché o lo calcula con `loader`. Si varias peticiones
+        piden la misma clave a la vez, solo una consulta la base de datos.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # evita el aviso de excepción no recuperada
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        # Si hubo una invalidación mientras se calculaba, el valor puede ser viejo
+        if generation == self._generation:
+            self.set(key, value, tags)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, forms: Iterable[str]):
+        """Elimina las entradas etiquetadas con alguno de los formularios"""
+        forms: FrozenSet[str] = frozenset(forms)
+        if not forms:
+            return
+        self._generation += 1
+        stale = [key for key, (_, tags, _) in self._entries.items() if tags & forms]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def clear(self):
+        self._entries.clear()
+        self._generation += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# Caché compartida por los endpoints de reportes
+report_cache = TTLCache()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    forms: Optional[set] = session.info.pop(WRITTEN_FORMS_KEY, None)
+    if forms:
+        report_cache.invalidate(forms)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop(WRITTEN_FORMS_KEY, None)
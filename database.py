@@ -2,14 +2,27 @@
 Database configuration and models for KCH Forms API
 """
 
+import asyncio
+import logging
 import os
-from sqlalchemy import create_engine, Column, String, Boolean, DateTime, Text, JSON
+import time
+from collections import Counter
+from enum import Enum
+from typing import List, Optional
+
+from sqlalchemy import (
+    create_engine, event, insert, BigInteger, Column, Date, ForeignKey, Identity, Index, SmallInteger, String, Table,
+    Boolean, DateTime, Text,
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.dialects.postgresql import UUID
-import uuid
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.dialects.postgresql import JSONB, UUID, insert as pg_insert
 from datetime import datetime, timezone
 
+logger = logging.getLogger(__name__)
+
 # Database URL - configurable via environment variable
 # Build URL from individual components for flexibility
 POSTGRES_HOST = os.getenv("POSTGRES_HOST", "postgres")
@@ -23,29 +36,215 @@ DATABASE_URL = os.getenv(
     f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 )
 
+# Pool de conexiones - dimensionar frente a max_connections de Postgres:
+# (DB_POOL_SIZE + DB_MAX_OVERFLOW) x nº de workers debe quedar por debajo
+# (+1 por worker con LIVE_COUNTERS_ENABLED: la conexión de LISTEN de live.py)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+# Motor síncrono (migraciones y scripts de mantenimiento): sin límite por defecto,
+# porque recorren o reescriben tablas enteras (copias, backfill, archivado)
+DB_MAINTENANCE_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_MAINTENANCE_STATEMENT_TIMEOUT_MS", "0"))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+# Segundos entre escrituras del rollup diario acumulado en memoria (ver RollupWriter)
+ROLLUP_FLUSH_INTERVAL = float(os.getenv("ROLLUP_FLUSH_INTERVAL", "2"))
+
+
+def to_async_url(url: str) -> str:
+    """Convierte una URL síncrona (psycopg2) en su equivalente asyncpg"""
+    parsed = make_url(url)
+    if parsed.drivername in ("postgresql", "postgresql+psycopg2"):
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+    return parsed.render_as_string(hide_password=False)
+
+
+# URL para el motor asíncrono que usan los endpoints
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+# Réplica de lectura opcional (ver replicas.py), con su propio pool.
+# Sin READ_DATABASE_URL todas las lecturas van al primario
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL", "")
+READ_ASYNC_DATABASE_URL = os.getenv(
+    "READ_ASYNC_DATABASE_URL", to_async_url(READ_DATABASE_URL) if READ_DATABASE_URL else ""
+)
+READ_DB_POOL_SIZE = int(os.getenv("READ_DB_POOL_SIZE", str(DB_POOL_SIZE)))
+READ_DB_MAX_OVERFLOW = int(os.getenv("READ_DB_MAX_OVERFLOW", str(DB_MAX_OVERFLOW)))
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+
+def sync_connect_args() -> dict:
+    """Timeouts de conexión y de sentencia para psycopg2 (motor de mantenimiento)"""
+    args = {"connect_timeout": DB_CONNECT_TIMEOUT}
+    if DB_MAINTENANCE_STATEMENT_TIMEOUT_MS:
+        args["options"] = f"-c statement_timeout={DB_MAINTENANCE_STATEMENT_TIMEOUT_MS}"
+    return args
+
+
+def async_connect_args() -> dict:
+    """Timeouts de conexión y de sentencia para asyncpg"""
+    args = {"timeout": DB_CONNECT_TIMEOUT}
+    if DB_STATEMENT_TIMEOUT_MS:
+        args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+    return args
+
+
 # SQLAlchemy setup
-engine = create_engine(DATABASE_URL)
+# Motor síncrono: solo para migraciones y scripts de mantenimiento (creación de
+# tablas, init_database.py, retención, backfill, rebuild), sin el statement_timeout de los endpoints
+engine = create_engine(DATABASE_URL, connect_args=sync_connect_args(), pool_pre_ping=DB_POOL_PRE_PING)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Motor asíncrono (asyncpg): lo usan todos los endpoints para no bloquear el event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, connect_args=async_connect_args(), **POOL_OPTIONS)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+# Motor de la réplica de lectura (None si no hay READ_DATABASE_URL)
+read_async_engine = None
+ReadAsyncSessionLocal = None
+if READ_ASYNC_DATABASE_URL:
+    read_async_engine = create_async_engine(
+        READ_ASYNC_DATABASE_URL,
+        connect_args=async_connect_args(),
+        **{**POOL_OPTIONS, "pool_size": READ_DB_POOL_SIZE, "max_overflow": READ_DB_MAX_OVERFLOW},
+    )
+    ReadAsyncSessionLocal = async_sessionmaker(read_async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+class PoolWaitStats:
+    """
+    Tiempo que esperan las sesiones hasta obtener conexión del pool.
+    Se mide entre el inicio de la transacción de la sesión y el momento en que
+    tiene conexión (eventos after_transaction_create / after_begin).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _mark_checkout_start(session, transaction):
+    if transaction.parent is None:
+        session.info["checkout_started"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_begin")
+def _record_checkout_wait(session, transaction, connection):
+    started = session.info.pop("checkout_started", None)
+    if started is not None:
+        pool_wait_stats.record(time.perf_counter() - started)
+
+
+def get_pool_status() -> dict:
+    """Estado del pool del motor asíncrono (conexiones en uso, overflow, esperas)"""
+    pool = async_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "capacity": DB_POOL_SIZE + DB_MAX_OVERFLOW,
+        "timeout_s": DB_POOL_TIMEOUT,
+        "wait": pool_wait_stats.as_dict(),
+    }
+
+
 Base = declarative_base()
 
 
+# Respuestas de baja cardinalidad normalizadas en tablas de dimensión
+# (dim_<nombre>): form_submissions guarda solo <nombre>_id (smallint) y el
+# texto vive una vez en la dimensión (ver dimensions.py)
+DIMENSION_COLUMNS = (
+    "age_range",
+    "discovery_source",
+    "favorite_store",
+    "delivery_type",
+    "weekly_promos_answer",
+)
+
+
+def dimension_table(name: str) -> Table:
+    return Table(
+        f"dim_{name}",
+        Base.metadata,
+        Column("id", SmallInteger, Identity(), primary_key=True),
+        # Forma canónica (sin mayúsculas, tildes ni espacios repetidos): "Sí" y "si" son la misma respuesta
+        Column("canonical", String(100), nullable=False, unique=True),
+        # Texto que se muestra en reportes y exportaciones (la primera variante recibida)
+        Column("label", String(100), nullable=False),
+    )
+
+
+DIMENSION_TABLES = {name: dimension_table(name) for name in DIMENSION_COLUMNS}
+
+
+def dimension_id_column(name: str) -> str:
+    return f"{name}_id"
+
+
 class FormSubmission(Base):
     """
-    Tabla principal para almacenar todas las respuestas de formularios
+    Tabla principal para almacenar todas las respuestas de formularios.
+
+    Particionada por formulario (LIST sobre `form`): cada formulario vive en su
+    propia partición con solo los índices de sus columnas (ver partitioning.py),
+    así una inserción no mantiene índices de otros formularios y las consultas
+    por formulario solo recorren su partición. Cada partición de formulario se
+    subdivide por meses (RANGE sobre `received_at`) para archivar los datos
+    antiguos desvinculando particiones en lugar de borrar filas.
     """
     __tablename__ = "form_submissions"
+    __table_args__ = (
+        # Paginación keyset (exportación y /debug/dump) y consultas por rango de fechas
+        Index("ix_form_submissions_received_at_id", "received_at", "id"),
+        {"postgresql_partition_by": "LIST (form)"},
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    form = Column(String(50), nullable=False, index=True)
-    received_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
-    data = Column(JSON, nullable=False)
+    # El id lo genera siempre la aplicación (make_meta), no hay default en el modelo.
+    # La clave primaria incluye las columnas de partición (requisito de Postgres)
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    form = Column(String(50), primary_key=True)
+    received_at = Column(DateTime(timezone=True), primary_key=True, default=lambda: datetime.now(timezone.utc))
+    # Payload validado. NULL en modo DATA_COLUMNS_ONLY para los formularios cuyas
+    # columnas ya lo contienen entero (se reconstruye al leer, ver payloads.py)
+    data = Column(JSONB(none_as_null=True), nullable=True)
     
     # Campos específicos para facilitar consultas y reportes
+    # (los índices de estas columnas se crean por partición en partitioning.py)
+    # Las respuestas de baja cardinalidad son claves de sus tablas de dimensión
     # Edad
-    age_range = Column(String(10), nullable=True, index=True)
+    age_range_id = Column(SmallInteger, ForeignKey("dim_age_range.id"), nullable=True)
     
     # Datos personales
-    customer_name = Column(String(255), nullable=True, index=True)
+    customer_name = Column(String(255), nullable=True)
     street = Column(String(255), nullable=True)
     number = Column(String(20), nullable=True)
     floor = Column(String(20), nullable=True)
@@ -54,82 +253,248 @@ class FormSubmission(Base):
     
     # Identificación
     document_type = Column(String(50), nullable=True)
-    document_number = Column(String(50), nullable=True, index=True)
-    phone = Column(String(50), nullable=True, index=True)
+    document_number = Column(String(50), nullable=True)
+    phone = Column(String(50), nullable=True)
     
     # Marketing
-    discovery_source = Column(String(100), nullable=True, index=True)
-    favorite_store = Column(String(100), nullable=True, index=True)
-    delivery_type = Column(String(100), nullable=True, index=True)
+    discovery_source_id = Column(SmallInteger, ForeignKey("dim_discovery_source.id"), nullable=True)
+    favorite_store_id = Column(SmallInteger, ForeignKey("dim_favorite_store.id"), nullable=True)
+    delivery_type_id = Column(SmallInteger, ForeignKey("dim_delivery_type.id"), nullable=True)
     
     # Productos (almacenado como JSON pero también como texto para búsquedas)
-    products_text = Column(Text, nullable=True)  # Para búsquedas full-text
+    products_text = Column(Text, nullable=True)  # Para búsquedas full-text (ver search.py)
     
     # Promociones
-    weekly_promos_answer = Column(String(100), nullable=True, index=True)
+    weekly_promos_answer_id = Column(SmallInteger, ForeignKey("dim_weekly_promos_answer.id"), nullable=True)
     
     # Contacto
-    email = Column(String(255), nullable=True, index=True)
-    large_family = Column(Boolean, nullable=True, index=True)
+    email = Column(String(255), nullable=True)
+    large_family = Column(Boolean, nullable=True)
 
 
-def create_tables():
-    """Crear todas las tablas en la base de datos"""
-    Base.metadata.create_all(bind=engine)
+class FormAnswerDaily(Base):
+    """
+    Rollup diario de respuestas: nº de envíos por día (UTC), formulario y
+    respuesta. Se mantiene incrementalmente (RollupWriter suma cada pocos
+    segundos lo insertado) para que los reportes no tengan que recorrer
+    form_submissions.
+    """
+    __tablename__ = "form_answer_daily"
+
+    day = Column(Date, primary_key=True)
+    form = Column(String(50), primary_key=True)
+    # Columna de form_submissions agregada ("favorite_store", ...), "product"
+    # para cada producto de la lista, o TOTAL_DIMENSION para el total del formulario
+    dimension = Column(String(50), primary_key=True)
+    answer = Column(String(255), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
 
 
-def get_db():
+class IdempotencyKey(Base):
     """
-    Dependency para obtener una sesión de base de datos
+    Claves Idempotency-Key ya usadas y el envío que crearon (ver idempotency.py).
+    La clave primaria garantiza que un reintento no inserta un segundo envío,
+    también si llega a otro worker o a la vez que el original.
     """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    form = Column(String(50), nullable=False)
+    # Huella (sha256) del payload validado: un reintento debe traer el mismo
+    fingerprint = Column(String(64), nullable=False)
+    submission_id = Column(UUID(as_uuid=True), nullable=False)
+    # received_at del envío original; también marca la caducidad de la clave
+    received_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
 
+# Dimensiones con rollup: columnas de respuesta con pocos valores distintos
+# (en las filas a insertar, las de dimensión llevan ya la etiqueta canónica)
+ROLLUP_COLUMNS = DIMENSION_COLUMNS + ("large_family",)
+PRODUCT_DIMENSION = "product"
+TOTAL_DIMENSION = "_total"
+# Filas por sentencia de upsert (5 parámetros por fila, límite de 32767 en Postgres)
+ROLLUP_UPSERT_CHUNK = 1000
 
-def extract_fields_from_data(form_type: str, data: dict) -> dict:
+
+def rollup_answer(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, Enum):
+        value = value.value
+    return str(value)[:255]
+
+
+def rollup_counts(rows: List[dict]) -> Counter:
+    """Incrementos (día, formulario, dimensión, respuesta) -> n para un lote de filas"""
+    counts = Counter()
+    for row in rows:
+        key = (row["received_at"].astimezone(timezone.utc).date(), row["form"])
+        counts[(*key, TOTAL_DIMENSION, "")] += 1
+        for column in ROLLUP_COLUMNS:
+            value = row.get(column)
+            if value is not None:
+                counts[(*key, column, rollup_answer(value))] += 1
+        if row["form"] == "products":
+            for product in set((row.get("data") or {}).get("products") or ()):
+                counts[(*key, PRODUCT_DIMENSION, rollup_answer(product))] += 1
+    return counts
+
+
+async def upsert_rollups(db: AsyncSession, counts: Counter):
+    """Suma los contadores de un lote (rollup_counts) al rollup diario (INSERT ... ON CONFLICT)"""
+    if not counts:
+        return
+    # Orden estable de claves: evita interbloqueos entre transacciones concurrentes
+    values = [
+        {"day": day, "form": form, "dimension": dimension, "answer": answer, "count": n}
+        for (day, form, dimension, answer), n in sorted(counts.items())
+    ]
+    table = FormAnswerDaily.__table__
+    for start in range(0, len(values), ROLLUP_UPSERT_CHUNK):
+        stmt = pg_insert(table).values(values[start:start + ROLLUP_UPSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.form, table.c.dimension, table.c.answer],
+            set_={"count": table.c.count + stmt.excluded.count},
+        )
+        await db.execute(stmt)
+
+
+# Clave de Session.info donde se anotan los formularios insertados en la
+# transacción en curso (cache.py invalida sus entradas tras el commit)
+WRITTEN_FORMS_KEY = "written_forms"
+# Ídem con los incrementos del rollup de la transacción (live.py los publica tras el commit)
+WRITTEN_COUNTS_KEY = "written_counts"
+# Ídem para RollupWriter, que los suma al rollup tras el commit
+PENDING_ROLLUP_KEY = "pending_rollup"
+
+
+class RollupWriter:
     """
-    Extrae campos específicos del JSON data para almacenarlos en columnas separadas
-    Esto facilita las consultas y reportes
+    Acumula en memoria los incrementos del rollup de las transacciones
+    confirmadas y los escribe en form_answer_daily cada `interval` segundos,
+    en una transacción propia.
+
+    Las inserciones no tocan el rollup: todos los envíos de un formulario
+    actualizan la misma fila (día, formulario, _total), y su bloqueo hasta el
+    commit serializaría los envíos concurrentes. Así cada worker la actualiza
+    una vez por intervalo. Los reportes van hasta `interval` segundos por
+    detrás; si un proceso muere sin escribir lo pendiente, `python reports.py
+    rebuild` recalcula el rollup desde form_submissions.
     """
-    fields = {}
-    
-    if form_type == "age":
-        fields["age_range"] = data.get("age")
-    
-    elif form_type == "personal-data":
-        fields["customer_name"] = data.get("name")
-        fields["street"] = data.get("street")
-        fields["number"] = data.get("number")
-        fields["floor"] = data.get("floor")
-        fields["door"] = data.get("door")
-        fields["stair"] = data.get("stair")
-    
-    elif form_type == "identification":
-        fields["document_type"] = data.get("document_type")
-        fields["document_number"] = data.get("document_number")
-        fields["phone"] = data.get("phone")
-    
-    elif form_type == "discovery":
-        fields["discovery_source"] = data.get("source")
-    
-    elif form_type == "favorite-store":
-        fields["favorite_store"] = data.get("store")
-    
-    elif form_type == "delivery-type":
-        fields["delivery_type"] = data.get("service_type")
-    
-    elif form_type == "products":
-        products = data.get("products", [])
-        fields["products_text"] = ", ".join(products) if products else None
-    
-    elif form_type == "weekly-promos-knowledge":
-        fields["weekly_promos_answer"] = data.get("answer")
-    
-    elif form_type == "contact":
-        fields["email"] = data.get("email")
-        fields["large_family"] = data.get("large_family")
-    
-    return fields
+
+    def __init__(self, interval: float = ROLLUP_FLUSH_INTERVAL):
+        self.interval = interval
+        self.pending: Counter = Counter()
+        # Una escritura a la vez: quien llama a flush() ve escrito todo lo anterior
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, counts: Counter):
+        """Incrementos de una transacción confirmada (sin E/S)"""
+        self.pending.update(counts)
+
+    async def flush(self):
+        """Escribe lo pendiente; si falla, lo conserva para el siguiente intento"""
+        async with self._lock:
+            if not self.pending:
+                return
+            counts, self.pending = self.pending, Counter()
+            try:
+                async with AsyncSessionLocal() as db:
+                    await upsert_rollups(db, counts)
+                    # Los reportes en caché de estos formularios quedan obsoletos (cache.py)
+                    db.info.setdefault(WRITTEN_FORMS_KEY, set()).update(form for _, form, _, _ in counts)
+                    await db.commit()
+            except BaseException:
+                self.pending.update(counts)
+                raise
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run(), name="rollup-writer")
+
+    async def stop(self):
+        """Detiene la tarea y escribe lo pendiente (al apagar, después de drenar la cola de ingesta)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("No se pudo escribir el rollup pendiente: ejecuta `python reports.py rebuild`")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Error escribiendo el rollup diario")
+
+
+# Instancia compartida por la aplicación (una por worker)
+rollup_writer = RollupWriter()
+
+
+@event.listens_for(Session, "after_commit")
+def _add_rollup_after_commit(session):
+    counts: Optional[Counter] = session.info.pop(PENDING_ROLLUP_KEY, None)
+    if counts:
+        rollup_writer.add(counts)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rollup_after_rollback(session):
+    session.info.pop(PENDING_ROLLUP_KEY, None)
+
+
+# Columnas de form_submissions, en orden; las inserciones multi-fila normalizan
+# cada fila a este conjunto para que todas compartan la misma forma
+SUBMISSION_COLUMNS = tuple(column.name for column in FormSubmission.__table__.columns)
+
+
+def normalize_submission_row(row: dict) -> dict:
+    """Completa con None las columnas que no aplican al formulario"""
+    return {column: row.get(column) for column in SUBMISSION_COLUMNS}
+
+
+async def insert_submissions(db: AsyncSession, rows: List[dict]):
+    """
+    Inserta varias filas en form_submissions con un único INSERT multi-fila y
+    anota sus incrementos del rollup diario, que RollupWriter escribe tras el
+    commit. Las respuestas de dimensión (texto) se traducen antes a sus ids.
+    No hace commit: la transacción la controla quien llama.
+    """
+    # Importación diferida: dimensions.py importa este módulo
+    from dimensions import dimension_cache
+
+    if rows:
+        await dimension_cache.encode(rows)
+        await db.execute(insert(FormSubmission.__table__), [normalize_submission_row(row) for row in rows])
+        counts = rollup_counts(rows)
+        db.info.setdefault(PENDING_ROLLUP_KEY, Counter()).update(counts)
+        db.info.setdefault(WRITTEN_FORMS_KEY, set()).update(row["form"] for row in rows)
+        db.info.setdefault(WRITTEN_COUNTS_KEY, Counter()).update(counts)
+
+
+def create_tables():
+    """
+    Crear todas las tablas (y las particiones de form_submissions) en la base de datos.
+    Para tests y desarrollo local: en producción el esquema lo gestiona Alembic.
+    """
+    from partitioning import ensure_form_partitions
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        ensure_form_partitions(conn)
+
+
+async def get_db():
+    """
+    Dependency para obtener una sesión asíncrona de base de datos
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
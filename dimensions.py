@@ -0,0 +1,139 @@
+"""
+Tablas de dimensión para las respuestas de baja cardinalidad
+
+age_range, discovery_source, favorite_store, delivery_type y
+weekly_promos_answer se repetían como texto en cada fila de form_submissions.
+Ahora cada valor distinto se guarda una vez en dim_<nombre> y la fila solo
+lleva su id (smallint): filas más pequeñas y agregaciones por entero.
+
+Los valores se comparan en forma canónica (sin mayúsculas, tildes ni espacios
+repetidos), así que "Sí", "si" y " SI " son la misma respuesta; reportes y
+exportaciones muestran la etiqueta de la primera variante recibida.
+
+Cada worker mantiene en memoria el mapeo texto -> id (precargado al arrancar),
+así que una respuesta conocida no consulta la base de datos. Un valor nuevo se
+da de alta en su propia transacción (INSERT ... ON CONFLICT DO NOTHING), de
+modo que el id en caché existe aunque el envío que lo trajo se revierta.
+Un smallint admite hasta 32767 valores distintos por dimensión.
+"""
+
+import logging
+import os
+import unicodedata
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database import DIMENSION_COLUMNS, DIMENSION_TABLES, async_engine, dimension_id_column
+
+logger = logging.getLogger(__name__)
+
+# Variantes exactas (texto tal cual llega) recordadas por dimensión antes de vaciar la memoria
+DIMENSION_CACHE_MAXSIZE = int(os.getenv("DIMENSION_CACHE_MAXSIZE", "10000"))
+DIMENSION_LABEL_MAX_LENGTH = 100
+
+# Columna de dimensión -> columna del id en form_submissions
+ID_COLUMNS = {name: dimension_id_column(name) for name in DIMENSION_COLUMNS}
+
+
+def answer_text(value) -> str:
+    if isinstance(value, Enum):
+        value = value.value
+    return str(value).strip()[:DIMENSION_LABEL_MAX_LENGTH]
+
+
+def canonicalize(value) -> str:
+    """Forma canónica de una respuesta: minúsculas, sin tildes y sin espacios repetidos"""
+    decomposed = unicodedata.normalize("NFKD", answer_text(value))
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(without_accents.casefold().split())
+
+
+class DimensionCache:
+    """Mapeo en memoria texto -> id y id -> etiqueta de cada dimensión"""
+
+    def __init__(self, maxsize: int = DIMENSION_CACHE_MAXSIZE, engine=async_engine):
+        self.maxsize = maxsize
+        self.engine = engine
+        # Texto tal cual llega -> id (evita recalcular la forma canónica)
+        self._by_text: Dict[str, Dict[str, int]] = {name: {} for name in DIMENSION_COLUMNS}
+        self._by_canonical: Dict[str, Dict[str, int]] = {name: {} for name in DIMENSION_COLUMNS}
+        self._labels: Dict[str, Dict[int, str]] = {name: {} for name in DIMENSION_COLUMNS}
+
+    def _remember(self, name: str, rows: Iterable[Tuple[int, str, str]]):
+        for dimension_id, canonical, label in rows:
+            self._by_canonical[name][canonical] = dimension_id
+            self._labels[name][dimension_id] = label
+
+    async def load(self):
+        """Precarga todas las dimensiones (al arrancar el worker)"""
+        async with self.engine.connect() as conn:
+            for name, table in DIMENSION_TABLES.items():
+                result = await conn.execute(select(table.c.id, table.c.canonical, table.c.label))
+                self._remember(name, result.all())
+
+    def lookup(self, name: str, value) -> Optional[int]:
+        """Id de una respuesta si ya está en memoria"""
+        by_text = self._by_text[name]
+        dimension_id = by_text.get(value)
+        if dimension_id is None:
+            dimension_id = self._by_canonical[name].get(canonicalize(value))
+            if dimension_id is not None:
+                if len(by_text) >= self.maxsize:
+                    by_text.clear()
+                by_text[value] = dimension_id
+        return dimension_id
+
+    def label(self, name: str, dimension_id: int) -> Optional[str]:
+        return self._labels[name].get(dimension_id)
+
+    async def register(self, values: Dict[str, Dict[str, str]]):
+        """
+        Da de alta los valores nuevos ({dimensión: {canónica: etiqueta}}) en una
+        transacción propia y los añade a la memoria. Si otro worker ya los creó,
+        se reutilizan sus ids.
+        """
+        async with self.engine.begin() as conn:
+            for name, labels in values.items():
+                table = DIMENSION_TABLES[name]
+                # Orden estable: evita interbloqueos entre workers que dan de alta lo mismo
+                rows = [{"canonical": canonical, "label": labels[canonical]} for canonical in sorted(labels)]
+                await conn.execute(
+                    pg_insert(table).on_conflict_do_nothing(index_elements=[table.c.canonical]), rows
+                )
+                result = await conn.execute(
+                    select(table.c.id, table.c.canonical, table.c.label).where(table.c.canonical.in_(list(labels)))
+                )
+                self._remember(name, result.all())
+
+    async def encode(self, rows: List[dict]):
+        """
+        Sustituye en cada fila el texto de sus dimensiones por el id
+        (<nombre>_id) y deja en <nombre> la etiqueta canónica para el rollup
+        """
+        missing: Dict[str, Dict[str, str]] = {}
+        for row in rows:
+            for name in DIMENSION_COLUMNS:
+                value = row.get(name)
+                if value is not None and self.lookup(name, value) is None:
+                    missing.setdefault(name, {}).setdefault(canonicalize(value), answer_text(value))
+        if missing:
+            await self.register(missing)
+
+        for row in rows:
+            for name, id_column in ID_COLUMNS.items():
+                value = row.get(name)
+                if value is not None:
+                    dimension_id = self.lookup(name, value)
+                    row[id_column] = dimension_id
+                    row[name] = self._labels[name][dimension_id]
+
+    def clear(self):
+        for mapping in (*self._by_text.values(), *self._by_canonical.values(), *self._labels.values()):
+            mapping.clear()
+
+
+# Caché compartida por la aplicación (una por worker)
+dimension_cache = DimensionCache()
@@ -0,0 +1,154 @@
+"""
+Lectura paginada y exportación en streaming de form_submissions
+
+Se recorre la tabla por páginas con keyset pagination sobre (received_at, id)
+(índice ix_form_submissions_received_at_id) y cada página se lee con un cursor
+del lado del servidor, así que la memoria no depende del tamaño de la tabla.
+Las respuestas guardadas como id de dimensión se exportan con su etiqueta.
+"""
+
+import base64
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import DIMENSION_TABLES, AsyncSessionLocal, FormSubmission, dimension_id_column
+from payloads import restore_data
+
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+
+Cursor = Tuple[datetime, UUID]
+
+
+def export_selection():
+    """
+    Columnas de form_submissions en su orden, con cada <nombre>_id sustituido
+    por la etiqueta de su dimensión (<nombre>), y los joins que necesitan
+    """
+    table = FormSubmission.__table__
+    dimension_ids = {dimension_id_column(name): name for name in DIMENSION_TABLES}
+    columns, source = [], table
+    for column in table.columns:
+        name = dimension_ids.get(column.name)
+        if name is None:
+            columns.append(column)
+            continue
+        dimension = DIMENSION_TABLES[name]
+        columns.append(dimension.c.label.label(name))
+        source = source.outerjoin(dimension, dimension.c.id == column)
+    return columns, source
+
+
+EXPORT_SELECT_COLUMNS, EXPORT_SOURCE = export_selection()
+# Columnas de la exportación (cabecera del CSV)
+EXPORT_COLUMNS = tuple(column.name for column in EXPORT_SELECT_COLUMNS)
+
+
+def encode_cursor(received_at: datetime, submission_id: UUID) -> str:
+    """Cursor opaco (seguro para URLs) que apunta a la última fila devuelta"""
+    raw = f"{received_at.isoformat()}|{submission_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(value: str) -> Cursor:
+    """Inverso de encode_cursor; lanza ValueError si el cursor no es válido"""
+    try:
+        received_at, submission_id = base64.urlsafe_b64decode(value.encode()).decode().split("|")
+        return datetime.fromisoformat(received_at), UUID(submission_id)
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {value!r}") from e
+
+
+async def fetch_page(
+    db: AsyncSession,
+    form: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[Cursor] = None,
+    limit: int = EXPORT_PAGE_SIZE,
+) -> List[dict]:
+    """
+    Devuelve como mucho `limit` filas ordenadas por (received_at, id),
+    posteriores al cursor `after` y dentro de los filtros indicados
+    """
+    table = FormSubmission.__table__
+    stmt = (
+        select(*EXPORT_SELECT_COLUMNS)
+        .select_from(EXPORT_SOURCE)
+        .order_by(table.c.received_at, table.c.id)
+        .limit(limit)
+    )
+    if form is not None:
+        stmt = stmt.where(table.c.form == form)
+    if since is not None:
+        stmt = stmt.where(table.c.received_at >= since)
+    if until is not None:
+        stmt = stmt.where(table.c.received_at < until)
+    if after is not None:
+        stmt = stmt.where(tuple_(table.c.received_at, table.c.id) > tuple_(*after))
+
+    result = await db.stream(stmt)
+    rows = [dict(row) async for row in result.mappings()]
+    for row in rows:
+        row["data"] = restore_data(row)
+    return rows
+
+
+async def iter_pages(
+    form: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+    session_factory=AsyncSessionLocal,
+) -> AsyncIterator[List[dict]]:
+    """Recorre todas las filas que cumplen los filtros, página a página"""
+    after = None
+    async with session_factory() as db:
+        while True:
+            rows = await fetch_page(db, form, since, until, after, page_size)
+            # Cerrar la transacción entre páginas devuelve la conexión al pool
+            await db.commit()
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            after = (rows[-1]["received_at"], rows[-1]["id"])
+
+
+def row_to_json(row: dict) -> dict:
+    """Fila de form_submissions con tipos serializables a JSON"""
+    return {
+        **row,
+        "id": str(row["id"]),
+        "received_at": row["received_at"].isoformat() if row["received_at"] else None,
+    }
+
+
+async def ndjson_stream(pages: AsyncIterator[List[dict]]) -> AsyncIterator[str]:
+    """Una línea JSON por fila"""
+    async for rows in pages:
+        yield "".join(json.dumps(row_to_json(row), ensure_ascii=False) + "\n" for row in rows)
+
+
+async def csv_stream(pages: AsyncIterator[List[dict]]) -> AsyncIterator[str]:
+    """CSV con una columna por campo de form_submissions; `data` va como JSON"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in pages:
+        for row in rows:
+            row = row_to_json(row)
+            row["data"] = json.dumps(row["data"], ensure_ascii=False)
+            writer.writerow([row[column] for column in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
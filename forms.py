@@ -0,0 +1,351 @@
+"""
+Modelos y registro declarativo de los formularios de KCH
+
+Cada formulario se describe una sola vez en FORMS (ruta, modelo del payload,
+modelo de respuesta, tag de OpenAPI y mapeo a columnas de form_submissions).
+main.py genera los endpoints a partir de este registro y cada FormSpec lleva
+su extractor de columnas precompilado.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Tuple, Type, Union
+from uuid import UUID
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field, EmailStr, constr
+
+
+# -----------------
+# Utilidades comunes
+# -----------------
+class FormResponse(BaseModel):
+    id: UUID = Field(..., description="Identificador único de la respuesta (UUIDv7, ordenado por received_at)")
+    form: str = Field(..., description="Nombre del formulario / endpoint")
+    received_at: datetime = Field(..., description="Fecha ISO de recepción (UTC)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id": "0199ed4b-4f80-7c3a-9d2e-5c3b7bc9e123",
+                "form": "age",
+                "received_at": "2025-09-26T12:00:00Z",
+            }
+        }
+
+
+class FormJSONResponse(JSONResponse):
+    """
+    Respuesta de los endpoints /form/*: JSON serializado con orjson a partir de
+    un dict ya validado. Devolver una Response hace que FastAPI no vuelva a
+    validar el cuerpo contra response_model (que se mantiene para OpenAPI).
+    OPT_UTC_Z: las fechas UTC salen como "...Z", igual que con Pydantic.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+def form_response_body(meta: FormResponse, data: dict) -> dict:
+    """Cuerpo de un *Response (FormResponse + data) sin construir el modelo"""
+    return {"id": meta.id, "form": meta.form, "received_at": meta.received_at, "data": data}
+
+
+# 1) Edad
+class AgeEnum(str, Enum):
+    a_18_24 = "18-24"
+    a_25_35 = "25-35"
+    a_35_44 = "35-44"
+    a_45_plus = "45+"
+
+
+class AgePayload(BaseModel):
+    age: AgeEnum = Field(..., description="Rango de edad")
+
+    class Config:
+        json_schema_extra = {"example": {"age": "25-35"}}
+
+
+class AgeResponse(FormResponse):
+    data: AgePayload
+
+
+# 2) Datos personales
+# Los max_length coinciden con el tamaño de las columnas de form_submissions
+# (las respuestas de dimensión, con la etiqueta de dim_<nombre>): un valor
+# demasiado largo se rechaza con 422 en lugar de fallar en el INSERT
+class PersonalDataPayload(BaseModel):
+    name: constr(strip_whitespace=True, min_length=1, max_length=255) = Field(..., description="Nombre completo")
+    street: constr(strip_whitespace=True, min_length=1, max_length=255) = Field(..., description="Calle")
+    number: constr(strip_whitespace=True, min_length=1, max_length=20) = Field(..., description="Número de portal (como texto)")
+    floor: Optional[constr(strip_whitespace=True, min_length=1, max_length=20)] = Field(None, description="Piso")
+    door: Optional[constr(strip_whitespace=True, min_length=1, max_length=20)] = Field(None, description="Puerta")
+    stair: Optional[constr(strip_whitespace=True, min_length=1, max_length=20)] = Field(None, description="Escalera")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "name": "Ana Pérez",
+                "street": "Gran Vía",
+                "number": "123",
+                "floor": "4",
+                "door": "B",
+                "stair": "2",
+            }
+        }
+
+
+class PersonalDataResponse(FormResponse):
+    data: PersonalDataPayload
+
+
+# 3) Identificación
+class IdentificationPayload(BaseModel):
+    document_type: constr(strip_whitespace=True, min_length=2, max_length=50) = Field(
+        ..., description="Tipo de documento (DNI, NIE, Pasaporte, etc.)"
+    )
+    document_number: constr(strip_whitespace=True, min_length=3, max_length=50) = Field(
+        ..., description="Número de documento"
+    )
+    phone: constr(strip_whitespace=True, min_length=6, max_length=50, pattern=r"^[+]?[- 0-9()]{6,}$") = Field(
+        ..., description="Teléfono (se acepta formato local o E.164)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "document_type": "DNI",
+                "document_number": "12345678Z",
+                "phone": "+34 600 123 456",
+            }
+        }
+
+
+class IdentificationResponse(FormResponse):
+    data: IdentificationPayload
+
+
+# 4) Descubrimiento de descuentos
+class DiscoveryPayload(BaseModel):
+    source: constr(strip_whitespace=True, min_length=2, max_length=100) = Field(
+        ..., description="¿Cómo te enteraste de los descuentos?"
+    )
+
+    class Config:
+        json_schema_extra = {"example": {"source": "Instagram"}}
+
+
+class DiscoveryResponse(FormResponse):
+    data: DiscoveryPayload
+
+
+# 5) Tienda favorita
+class FavoriteStorePayload(BaseModel):
+    store: constr(strip_whitespace=True, min_length=1, max_length=100) = Field(..., description="Tienda que visita más")
+
+    class Config:
+        json_schema_extra = {"example": {"store": "KCH Centro"}}
+
+
+class FavoriteStoreResponse(FormResponse):
+    data: FavoriteStorePayload
+
+
+# 6) Tipo de servicio a domicilio
+class DeliveryTypePayload(BaseModel):
+    service_type: constr(strip_whitespace=True, min_length=2, max_length=100) = Field(
+        ..., description="Tipo de servicio a domicilio"
+    )
+
+    class Config:
+        json_schema_extra = {"example": {"service_type": "Express"}}
+
+
+class DeliveryTypeResponse(FormResponse):
+    data: DeliveryTypePayload
+
+
+# 7) Lista de productos a comprar
+class ProductsPayload(BaseModel):
+    products: List[constr(strip_whitespace=True, min_length=1, max_length=255)] = Field(
+        ..., min_length=1, description="Listado de productos de interés"
+    )
+
+    class Config:
+        json_schema_extra = {"example": {"products": ["Champú", "Acondicionador", "Serum"]}}
+
+
+class ProductsResponse(FormResponse):
+    data: ProductsPayload
+
+
+# 8) Conocimiento de promociones semanales
+class WeeklyPromosKnowledgePayload(BaseModel):
+    answer: constr(strip_whitespace=True, min_length=1, max_length=100) = Field(
+        ..., description="Respuesta a si conoces las promociones semanales (Sí/No/…)"
+    )
+
+    class Config:
+        json_schema_extra = {"example": {"answer": "Sí"}}
+
+
+class WeeklyPromosKnowledgeResponse(FormResponse):
+    data: WeeklyPromosKnowledgePayload
+
+
+# 9) Contacto adicional (email + familia numerosa)
+class ContactPayload(BaseModel):
+    email: EmailStr = Field(..., description="Correo electrónico")
+    large_family: bool = Field(..., description="¿Tiene familia numerosa? true/false")
+
+    class Config:
+        json_schema_extra = {"example": {"email": "ana@example.com", "large_family": True}}
+
+
+class ContactResponse(FormResponse):
+    data: ContactPayload
+
+
+# -----------------
+# Registro de formularios
+# -----------------
+# Columna de form_submissions -> campo del payload, o función que recibe el
+# payload (dict) y devuelve el valor de la columna
+ColumnSource = Union[str, Callable[[dict], object]]
+
+
+def join_products(data: dict) -> Optional[str]:
+    """Productos como texto plano separado por comas (para búsquedas)"""
+    products = data.get("products")
+    return ", ".join(products) if products else None
+
+
+def compile_extractor(columns: Dict[str, ColumnSource]) -> Callable[[dict], dict]:
+    """
+    Precompila el mapeo columna -> origen en una función que solo recorre una
+    tupla ya resuelta (sin ramas por formulario en el camino caliente)
+    """
+    getters: Tuple[Tuple[str, Callable[[dict], object]], ...] = tuple(
+        (column, source if callable(source) else (lambda data, key=source: data.get(key)))
+        for column, source in columns.items()
+    )
+
+    def extract(data: dict) -> dict:
+        return {column: getter(data) for column, getter in getters}
+
+    return extract
+
+
+@dataclass(frozen=True)
+class FormSpec:
+    name: str
+    route: str
+    payload_model: Type[BaseModel]
+    response_model: Type[FormResponse]
+    tag: str
+    columns: Dict[str, ColumnSource]
+    extract: Callable[[dict], dict] = field(init=False, repr=False, compare=False)
+    # Campo del payload -> columna, si cada campo se copia tal cual a una columna
+    # (el payload se puede reconstruir desde la fila); None si no
+    field_columns: Optional[Dict[str, str]] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "extract", compile_extractor(self.columns))
+        copied = {source: column for column, source in self.columns.items() if isinstance(source, str)}
+        fields = self.payload_model.model_fields
+        field_columns = {name: copied[name] for name in fields} if set(fields) <= set(copied) else None
+        object.__setattr__(self, "field_columns", field_columns)
+
+    def rebuild_data(self, row: dict) -> dict:
+        """Payload a partir de las columnas de una fila (solo si field_columns no es None)"""
+        return {name: row[column] for name, column in self.field_columns.items()}
+
+
+FORMS: Tuple[FormSpec, ...] = (
+    FormSpec(
+        name="age",
+        route="/form/age",
+        payload_model=AgePayload,
+        response_model=AgeResponse,
+        tag="01 – Edad",
+        columns={"age_range": "age"},
+    ),
+    FormSpec(
+        name="personal-data",
+        route="/form/personal-data",
+        payload_model=PersonalDataPayload,
+        response_model=PersonalDataResponse,
+        tag="02 – Datos personales",
+        columns={
+            "customer_name": "name",
+            "street": "street",
+            "number": "number",
+            "floor": "floor",
+            "door": "door",
+            "stair": "stair",
+        },
+    ),
+    FormSpec(
+        name="identification",
+        route="/form/identification",
+        payload_model=IdentificationPayload,
+        response_model=IdentificationResponse,
+        tag="03 – Identificación",
+        columns={
+            "document_type": "document_type",
+            "document_number": "document_number",
+            "phone": "phone",
+        },
+    ),
+    FormSpec(
+        name="discovery",
+        route="/form/discovery",
+        payload_model=DiscoveryPayload,
+        response_model=DiscoveryResponse,
+        tag="04 – Marketing / Descubrimiento",
+        columns={"discovery_source": "source"},
+    ),
+    FormSpec(
+        name="favorite-store",
+        route="/form/favorite-store",
+        payload_model=FavoriteStorePayload,
+        response_model=FavoriteStoreResponse,
+        tag="05 – Preferencias de tienda",
+        columns={"favorite_store": "store"},
+    ),
+    FormSpec(
+        name="delivery-type",
+        route="/form/delivery-type",
+        payload_model=DeliveryTypePayload,
+        response_model=DeliveryTypeResponse,
+        tag="06 – Envíos",
+        columns={"delivery_type": "service_type"},
+    ),
+    FormSpec(
+        name="products",
+        route="/form/products",
+        payload_model=ProductsPayload,
+        response_model=ProductsResponse,
+        tag="07 – Productos",
+        columns={"products_text": join_products},
+    ),
+    FormSpec(
+        name="weekly-promos-knowledge",
+        route="/form/weekly-promos-knowledge",
+        payload_model=WeeklyPromosKnowledgePayload,
+        response_model=WeeklyPromosKnowledgeResponse,
+        tag="08 – Promociones",
+        columns={"weekly_promos_answer": "answer"},
+    ),
+    FormSpec(
+        name="contact",
+        route="/form/contact",
+        payload_model=ContactPayload,
+        response_model=ContactResponse,
+        tag="09 – Contacto",
+        columns={"email": "email", "large_family": "large_family"},
+    ),
+)
+
+FORMS_BY_NAME: Dict[str, FormSpec] = {spec.name: spec for spec in FORMS}
@@ -0,0 +1,62 @@
+"""
+Configuración de gunicorn para producción (KCH Forms API)
+
+gunicorn gestiona varios procesos worker de uvicorn (UvicornWorker). Con
+uvicorn[standard] instalado, cada worker usa uvloop como event loop y
+httptools como parser HTTP (loop="auto" / http="auto" los eligen si existen).
+
+Todo se ajusta con variables de entorno. Cada worker abre su propio pool de
+conexiones: WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW) debe caber en
+max_connections de Postgres (+1 por worker con LIVE_COUNTERS_ENABLED, la
+conexión de LISTEN, y el doble de pools con READ_DATABASE_URL si la réplica es
+el mismo servidor).
+
+Uso:
+    gunicorn -c gunicorn.conf.py main:app
+"""
+
+import importlib.util
+import multiprocessing
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Procesos: por defecto uno por CPU (los workers son asíncronos)
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+
+# Conexiones keep-alive: segundos que se mantiene abierta una conexión ociosa
+keepalive = int(os.getenv("KEEP_ALIVE", "5"))
+# Conexiones pendientes de aceptar en el socket
+backlog = int(os.getenv("BACKLOG", "2048"))
+# Segundos para terminar las peticiones en curso (y vaciar la cola de ingesta) al parar.
+# Las conexiones de /live/stream duran menos (LIVE_STREAM_MAX_SECONDS)
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+# Un worker que no responde en este tiempo se reinicia
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+
+# Reciclar workers cada N peticiones (0 = nunca); el jitter evita que se reinicien todos a la vez
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "0"))
+
+accesslog = os.getenv("ACCESS_LOG", "-") or None
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    missing = [module for module in ("uvloop", "httptools") if importlib.util.find_spec(module) is None]
+    if missing:
+        server.log.warning(f"Sin {', '.join(missing)}: se usará asyncio/h11 (instala uvicorn[standard])")
+    server.log.info(
+        f"KCH Forms API: {workers} workers, keepalive={keepalive}s, backlog={backlog}, "
+        f"graceful_timeout={graceful_timeout}s"
+    )
+
+
+def child_exit(server, worker):
+    # Métricas Prometheus en modo multiproceso: descartar los ficheros del worker que termina
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,120 @@
+"""
+Comprobaciones de salud para KCH Forms API
+
+- /live: el proceso responde (sin E/S).
+- /ready: resultado en caché de la última comprobación, que una tarea en
+  segundo plano repite cada READINESS_INTERVAL segundos: conexión a Postgres
+  (SELECT 1 con timeout), saturación del pool y retraso de la cola de ingesta.
+  Las sondas (Docker, balanceador, monitores) no abren conexiones por su cuenta.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+
+from database import async_engine, get_pool_status
+from ingestion import INGESTION_QUEUE_ENABLED, submission_queue
+
+logger = logging.getLogger(__name__)
+
+READINESS_INTERVAL = float(os.getenv("READINESS_INTERVAL", "5"))
+READINESS_DB_TIMEOUT = float(os.getenv("READINESS_DB_TIMEOUT", "2"))
+# Fracción de la capacidad del pool (size + overflow) en uso a partir de la cual no está listo
+READY_MAX_POOL_USAGE = float(os.getenv("READY_MAX_POOL_USAGE", "0.9"))
+# Fracción de la cola de ingesta ocupada y segundos de retraso de escritura tolerados
+READY_MAX_QUEUE_FILL = float(os.getenv("READY_MAX_QUEUE_FILL", "0.8"))
+READY_MAX_QUEUE_LAG = float(os.getenv("READY_MAX_QUEUE_LAG", "5"))
+
+
+def evaluate(database_ok: bool, pool: dict, queue: Optional[dict]) -> Tuple[bool, List[str]]:
+    """¿Está lista la instancia? Devuelve (listo, motivos por los que no lo está)"""
+    reasons = []
+    if not database_ok:
+        reasons.append("database")
+    if pool["capacity"] and pool["checked_out"] / pool["capacity"] >= READY_MAX_POOL_USAGE:
+        reasons.append("pool_saturated")
+    if queue is not None:
+        if queue["maxsize"] and queue["depth"] / queue["maxsize"] >= READY_MAX_QUEUE_FILL:
+            reasons.append("queue_full")
+        if queue["depth"] and queue["last_lag_s"] >= READY_MAX_QUEUE_LAG:
+            reasons.append("queue_lag")
+    return not reasons, reasons
+
+
+class ReadinessMonitor:
+    """Repite la comprobación de disponibilidad en segundo plano y guarda el último resultado"""
+
+    def __init__(self, interval: float = READINESS_INTERVAL, db_timeout: float = READINESS_DB_TIMEOUT):
+        self.interval = interval
+        self.db_timeout = db_timeout
+        self.status: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status is not None and self.status["ready"]
+
+    async def start(self):
+        """Primera comprobación antes de aceptar tráfico y, después, cada `interval` segundos"""
+        await self.refresh()
+        self._task = asyncio.create_task(self._run(), name="readiness-monitor")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Error comprobando la disponibilidad")
+
+    async def check_database(self) -> Tuple[bool, Optional[str]]:
+        try:
+            async with asyncio.timeout(self.db_timeout):
+                async with async_engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            return True, None
+        except Exception as e:
+            return False, str(e) or type(e).__name__
+
+    async def refresh(self) -> dict:
+        database_ok, error = await self.check_database()
+        pool = get_pool_status()
+        queue = None
+        if INGESTION_QUEUE_ENABLED:
+            queue = {
+                "depth": submission_queue.depth,
+                "maxsize": submission_queue.maxsize,
+                "last_lag_s": round(submission_queue.last_lag, 3),
+            }
+        ready, reasons = evaluate(database_ok, pool, queue)
+        self.status = {
+            "ready": ready,
+            "reasons": reasons,
+            "database": {"ok": database_ok, "error": error},
+            "pool": {
+                "checked_out": pool["checked_out"],
+                "capacity": pool["capacity"],
+                "usage": round(pool["checked_out"] / pool["capacity"], 3) if pool["capacity"] else 0.0,
+            },
+            "queue": queue,
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+        }
+        return self.status
+
+
+# Instancia compartida por la aplicación (un monitor por worker)
+readiness_monitor = ReadinessMonitor()
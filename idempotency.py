@@ -0,0 +1,149 @@
+"""
+Claves de idempotencia para los envíos de formularios (cabecera Idempotency-Key)
+
+Los clientes móviles reintentan cuando vence su timeout aunque el envío ya se
+haya guardado. Si la petición trae `Idempotency-Key`, la clave se guarda en
+idempotency_keys en la misma transacción que el envío; los reintentos con la
+misma clave devuelven el id y received_at originales sin volver a insertar.
+
+- La clave primaria de idempotency_keys resuelve los reintentos concurrentes y
+  los que llegan a otro worker: INSERT ... ON CONFLICT DO NOTHING y, si la
+  clave ya existía, se lee el envío original.
+- Una caché en memoria (TTLCache acotada, por worker) responde sin consultar la
+  base de datos a los reintentos que llegan al mismo worker. Solo se llena tras
+  el commit, así que nunca contiene claves de envíos no guardados.
+- Reutilizar una clave con otro formulario o con otro payload es un error (422).
+- Con la cola de ingesta activa, los envíos con clave no se encolan: se
+  escriben en la transacción de la clave (ver main.persist_submission).
+
+El payload no se guarda: un reintento válido trae el mismo (se compara su
+huella), así que la respuesta repite el `data` validado de la propia petición.
+
+Las claves caducan a las IDEMPOTENCY_KEY_TTL_HOURS horas. Purga periódica:
+    python idempotency.py purge [--hours 24]
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+import orjson
+from sqlalchemy import delete, event, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from database import IdempotencyKey
+from forms import FormResponse
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+IDEMPOTENCY_CACHE_MAXSIZE = int(os.getenv("IDEMPOTENCY_CACHE_MAXSIZE", "10000"))
+
+# Clave de Session.info con las claves reservadas en la transacción en curso
+PENDING_KEYS = "idempotency_keys"
+
+# Clave -> (huella del payload, metadatos del envío original)
+idempotency_cache = TTLCache(maxsize=IDEMPOTENCY_CACHE_MAXSIZE, ttl=IDEMPOTENCY_KEY_TTL_HOURS * 3600)
+
+
+class IdempotencyConflict(Exception):
+    """La clave ya se usó con otro formulario u otro payload"""
+
+
+def fingerprint(data: dict) -> str:
+    """Huella estable del payload validado (independiente del orden de los campos)"""
+    return hashlib.sha256(orjson.dumps(data, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def check_original(key: str, stored: Tuple[str, FormResponse], form: str, digest: str) -> FormResponse:
+    stored_digest, original = stored
+    if original.form != form:
+        raise IdempotencyConflict(f"La clave {key!r} ya se usó en el formulario {original.form!r}")
+    if stored_digest != digest:
+        raise IdempotencyConflict(f"La clave {key!r} ya se usó con otro contenido")
+    return original
+
+
+async def claim_key(db: AsyncSession, key: str, meta: FormResponse, data: dict) -> Optional[FormResponse]:
+    """
+    Metadatos del envío original si `key` ya se usó (con el mismo formulario y
+    payload). Si no, reserva la clave para `meta` en la transacción en curso y
+    devuelve None: quien llama guarda el envío y hace commit.
+    Si otra transacción tiene la clave reservada, el INSERT espera a que termine.
+    """
+    digest = fingerprint(data)
+    cached = idempotency_cache.get(key)
+    if cached is not None:
+        return check_original(key, cached, meta.form, digest)
+
+    table = IdempotencyKey.__table__
+    stmt = pg_insert(table).values(
+        key=key,
+        form=meta.form,
+        fingerprint=digest,
+        submission_id=meta.id,
+        received_at=meta.received_at,
+    )
+    claimed = await db.execute(stmt.on_conflict_do_nothing(index_elements=[table.c.key]).returning(table.c.key))
+    if claimed.first() is not None:
+        db.info.setdefault(PENDING_KEYS, {})[key] = (digest, meta)
+        return None
+
+    row = (await db.execute(
+        select(table.c.form, table.c.fingerprint, table.c.submission_id, table.c.received_at)
+        .where(table.c.key == key)
+    )).one()
+    # asyncpg devuelve su propia subclase de UUID, que orjson no serializa
+    submission_id = UUID(bytes=row.submission_id.bytes)
+    original = FormResponse.model_construct(id=submission_id, form=row.form, received_at=row.received_at)
+    stored = (row.fingerprint, original)
+    idempotency_cache.set(key, stored)
+    return check_original(key, stored, meta.form, digest)
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_after_commit(session):
+    keys: Optional[Dict[str, tuple]] = session.info.pop(PENDING_KEYS, None)
+    if keys:
+        for key, stored in keys.items():
+            idempotency_cache.set(key, stored)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop(PENDING_KEYS, None)
+
+
+def purge_expired(engine, hours: float = IDEMPOTENCY_KEY_TTL_HOURS, now: Optional[datetime] = None) -> int:
+    """Elimina las claves de envíos recibidos hace más de `hours` horas; devuelve cuántas"""
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(hours=hours)
+    with engine.begin() as conn:
+        result = conn.execute(delete(IdempotencyKey).where(IdempotencyKey.received_at < cutoff))
+    return result.rowcount
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    purge = commands.add_parser("purge", help="Eliminar las claves de idempotencia caducadas")
+    purge.add_argument("--hours", type=float, default=IDEMPOTENCY_KEY_TTL_HOURS)
+    args = parser.parse_args()
+
+    from database import engine
+
+    purged = purge_expired(engine, args.hours)
+    logger.info(f"✅ {purged} claves de idempotencia eliminadas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Identificadores de envío ordenados en el tiempo (UUIDv7, RFC 9562)
+
+Con uuid4 cada INSERT cae en una hoja aleatoria de la clave primaria de
+form_submissions: con la tabla grande, casi todas las hojas tocadas están
+fuera de caché y se parten a la mitad (índice más grande y más E/S). Un
+UUIDv7 empieza por el instante en milisegundos, así que los ids nuevos van
+siempre al final del índice, como un serial, sin dejar de ser únicos entre
+workers y generables sin consultar la base de datos.
+
+Formato (128 bits):
+    48  milisegundos Unix (el received_at del envío)
+     4  versión (7)
+    12  contador dentro del milisegundo (orden estricto en el proceso)
+     2  variante (RFC 4122)
+    62  aleatorios
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MILLISECOND = timedelta(milliseconds=1)
+_COUNTER_MAX = 0xFFF
+# Retrocesos del instante menores que esto continúan la secuencia del proceso
+_SEQUENCE_WINDOW_MS = 1000
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7(timestamp: Optional[datetime] = None) -> UUID:
+    """
+    UUIDv7 con el instante de `timestamp` (con zona horaria; por defecto,
+    ahora). Dentro de un proceso los ids son estrictamente crecientes, aunque
+    se pidan varios en el mismo milisegundo o el reloj retroceda un poco.
+    Un instante claramente anterior (un timestamp antiguo explícito) se
+    codifica tal cual, sin garantía de orden.
+    """
+    global _last_ms, _counter
+    # Aritmética entera: timestamp() (float) puede redondear al milisegundo anterior
+    ms = (timestamp - _EPOCH) // _MILLISECOND if timestamp is not None else time.time_ns() // 1_000_000
+    counter = None
+    with _lock:
+        if ms > _last_ms:
+            _last_ms, _counter = ms, 0
+            counter = 0
+        elif _last_ms - ms < _SEQUENCE_WINDOW_MS:
+            # Mismo milisegundo (o reloj algo atrasado): se continúa la secuencia
+            _counter += 1
+            if _counter > _COUNTER_MAX:
+                # Más de 4096 ids en un milisegundo: se toma prestado el siguiente
+                _last_ms, _counter = _last_ms + 1, 0
+            ms, counter = _last_ms, _counter
+    if counter is None:
+        counter = int.from_bytes(os.urandom(2), "big") & _COUNTER_MAX
+    rand = int.from_bytes(os.urandom(8), "big") & 0x3FFF_FFFF_FFFF_FFFF
+    return UUID(int=(ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand)
+
+
+def uuid7_time_ms(value: UUID) -> int:
+    """Milisegundos Unix codificados en un UUIDv7"""
+    return value.int >> 80
@@ -0,0 +1,205 @@
+"""
+Auditoría de índices de form_submissions para KCH Forms API
+
+Reproduce una carga de consultas representativa (WORKLOAD) contra la base de
+datos y cruza el plan de cada consulta con los contadores de
+pg_stat_user_indexes para saber qué índices se usan de verdad. Los índices de
+las particiones (uno por mes y formulario) se agregan en su índice raíz.
+
+Con pocas filas el planificador prefiere recorridos secuenciales: ejecutar
+contra una copia con el volumen de producción. El resultado es una propuesta;
+los cambios se aplican con una migración de Alembic (ver
+migrations/versions/0004_lean_submission_indexes.py).
+
+Uso:
+    python index_audit.py [--repeat N] [--json FICHERO]
+"""
+
+import argparse
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+from partitioning import PARENT_TABLE, PRODUCTS_TSVECTOR
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class WorkloadQuery:
+    name: str
+    sql: str
+    params: Dict[str, object] = field(default_factory=dict)
+
+
+# Consultas que hace la aplicación (exportación, /debug/dump) y las búsquedas
+# puntuales de soporte (un cliente por email, teléfono, documento o nombre)
+WORKLOAD = (
+    WorkloadQuery(
+        "export_keyset",
+        f"SELECT * FROM {PARENT_TABLE} WHERE received_at >= now() - interval '7 days' "
+        "ORDER BY received_at, id LIMIT 1000",
+    ),
+    WorkloadQuery(
+        "dump_by_form",
+        f"SELECT * FROM {PARENT_TABLE} WHERE form = :form ORDER BY received_at, id LIMIT 100",
+        {"form": "contact"},
+    ),
+    WorkloadQuery(
+        "lookup_email",
+        f"SELECT id FROM {PARENT_TABLE} WHERE form = 'contact' AND email = :value",
+        {"value": "ana@example.com"},
+    ),
+    WorkloadQuery(
+        "lookup_phone",
+        f"SELECT id FROM {PARENT_TABLE} WHERE form = 'identification' AND phone = :value",
+        {"value": "600000000"},
+    ),
+    WorkloadQuery(
+        "lookup_document",
+        f"SELECT id FROM {PARENT_TABLE} WHERE form = 'identification' AND document_number = :value",
+        {"value": "12345678A"},
+    ),
+    WorkloadQuery(
+        "lookup_customer_name",
+        f"SELECT id FROM {PARENT_TABLE} WHERE form = 'personal-data' AND customer_name = :value",
+        {"value": "Ana García"},
+    ),
+    WorkloadQuery(
+        "products_search",
+        f"SELECT id FROM {PARENT_TABLE} WHERE form = 'products' "
+        f"AND {PRODUCTS_TSVECTOR} @@ plainto_tsquery('spanish', :value)",
+        {"value": "champú"},
+    ),
+)
+
+
+def plan_nodes(plan: dict):
+    """Recorre en profundidad los nodos de un plan de EXPLAIN (FORMAT JSON)"""
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+def explain(conn, query: WorkloadQuery) -> dict:
+    """Índices (hoja) y tablas recorridas secuencialmente por una consulta"""
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {query.sql}"), query.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = list(plan_nodes(plan[0]["Plan"]))
+    return {
+        "indexes": sorted({node["Index Name"] for node in nodes if "Index Name" in node}),
+        "seq_scans": sorted({node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"}),
+    }
+
+
+def index_stats(conn) -> Dict[str, dict]:
+    """
+    Índice raíz -> escaneos, tamaño y nº de índices hoja, sumando los índices
+    de todas las particiones de form_submissions
+    """
+    rows = conn.execute(text("""
+        WITH RECURSIVE tree AS (
+            SELECT i.indexrelid AS root, i.indexrelid AS leaf
+            FROM pg_index AS i
+            JOIN pg_partition_tree(CAST(:parent AS regclass)) AS t ON t.relid = i.indrelid
+            WHERE NOT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = i.indexrelid)
+            UNION ALL
+            SELECT tree.root, inh.inhrelid
+            FROM tree JOIN pg_inherits AS inh ON inh.inhparent = tree.leaf
+        )
+        SELECT
+            tree.root::regclass::text AS index,
+            bool_or(i.indisunique) AS is_unique,
+            coalesce(sum(s.idx_scan), 0) AS scans,
+            coalesce(sum(pg_relation_size(tree.leaf)), 0) AS size_bytes,
+            count(s.indexrelid) AS leaves,
+            array_agg(tree.leaf::regclass::text) AS leaf_names
+        FROM tree
+        JOIN pg_index AS i ON i.indexrelid = tree.root
+        LEFT JOIN pg_stat_user_indexes AS s ON s.indexrelid = tree.leaf
+        GROUP BY tree.root
+    """), {"parent": PARENT_TABLE}).mappings()
+    return {row["index"]: dict(row) for row in rows}
+
+
+def flush_stats(conn):
+    """Publica los contadores pendientes de la sesión (Postgres 15+; antes se publican solos)"""
+    if conn.execute(text("SELECT 1 FROM pg_proc WHERE proname = 'pg_stat_force_next_flush'")).scalar():
+        conn.execute(text("SELECT pg_stat_force_next_flush()"))
+
+
+def run_audit(engine, repeat: int = 10, workload=WORKLOAD) -> dict:
+    """
+    Ejecuta la carga `repeat` veces y devuelve, por índice raíz, cuántas veces
+    se usó, su tamaño, qué consultas lo eligen y si es candidato a eliminarse
+    """
+    with engine.connect() as conn:
+        before = index_stats(conn)
+        plans = {query.name: explain(conn, query) for query in workload}
+        for _ in range(repeat):
+            for query in workload:
+                conn.execute(text(query.sql), query.params).all()
+        flush_stats(conn)
+        conn.commit()
+    with engine.connect() as conn:
+        after = index_stats(conn)
+
+    indexes = []
+    for name, stats in sorted(after.items()):
+        leaves = set(stats["leaf_names"]) | {name}
+        used_by = [query for query, plan in plans.items() if leaves & set(plan["indexes"])]
+        scans = stats["scans"] - before.get(name, {}).get("scans", 0)
+        indexes.append({
+            "index": name,
+            "unique": stats["is_unique"],
+            "scans": int(scans),
+            "size_bytes": int(stats["size_bytes"]),
+            "partitions": int(stats["leaves"]),
+            "used_by": used_by,
+            "drop_candidate": not stats["is_unique"] and scans == 0 and not used_by,
+        })
+    return {
+        "repeat": repeat,
+        "indexes": indexes,
+        "queries": plans,
+        "unindexed_queries": [query for query, plan in plans.items() if not plan["indexes"]],
+    }
+
+
+def print_report(report: dict):
+    print(f"{'índice':<45} {'escaneos':>9} {'tamaño':>10} {'part.':>6}  usado por")
+    for index in report["indexes"]:
+        flag = "  ← candidato a eliminar" if index["drop_candidate"] else ""
+        print(
+            f"{index['index']:<45} {index['scans']:>9} {index['size_bytes'] // 1024:>8}kB "
+            f"{index['partitions']:>6}  {', '.join(index['used_by']) or '-'}{flag}"
+        )
+    if report["unindexed_queries"]:
+        print("\nConsultas sin índice (recorrido secuencial):")
+        for query in report["unindexed_queries"]:
+            print(f"  - {query}: {len(report['queries'][query]['seq_scans'])} particiones")
+
+
+def main(argv: Optional[List[str]] = None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="Veces que se repite la carga")
+    parser.add_argument("--json", dest="json_path", help="Guardar el informe en JSON")
+    args = parser.parse_args(argv)
+
+    from database import engine
+
+    report = run_audit(engine, repeat=args.repeat)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        logger.info(f"📄 Informe guardado en {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
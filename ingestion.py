@@ -0,0 +1,167 @@
+"""
+Cola de ingesta en memoria (write-behind) para KCH Forms API
+
+Los endpoints validan la respuesta, la encolan y contestan de inmediato con el
+id generado por make_meta. Una tarea en segundo plano vacía la cola en lotes
+multi-fila (acotados por tamaño y por tiempo) sobre form_submissions.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+from database import AsyncSessionLocal, insert_submissions
+
+logger = logging.getLogger(__name__)
+
+# Configuración - ajustable vía variables de entorno
+INGESTION_QUEUE_ENABLED = os.getenv("INGESTION_QUEUE_ENABLED", "false").lower() in ("1", "true", "yes")
+INGESTION_QUEUE_MAXSIZE = int(os.getenv("INGESTION_QUEUE_MAXSIZE", "10000"))
+INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", "500"))
+INGESTION_FLUSH_INTERVAL = float(os.getenv("INGESTION_FLUSH_INTERVAL", "0.2"))
+INGESTION_ENQUEUE_TIMEOUT = float(os.getenv("INGESTION_ENQUEUE_TIMEOUT", "0.05"))
+INGESTION_MAX_RETRIES = int(os.getenv("INGESTION_MAX_RETRIES", "3"))
+
+_STOP = object()
+
+
+class QueueFullError(Exception):
+    """La cola está llena (o cerrándose) y no admite más envíos"""
+
+
+class SubmissionQueue:
+    """
+    Cola asíncrona con vaciado por lotes hacia form_submissions
+    """
+
+    def __init__(
+        self,
+        maxsize: int = INGESTION_QUEUE_MAXSIZE,
+        batch_size: int = INGESTION_BATCH_SIZE,
+        flush_interval: float = INGESTION_FLUSH_INTERVAL,
+        enqueue_timeout: float = INGESTION_ENQUEUE_TIMEOUT,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.session_factory = session_factory
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.flushed = 0
+        self.failed = 0
+        # Segundos entre la recepción del envío más antiguo del último lote y su escritura
+        self.last_lag = 0.0
+
+    @property
+    def depth(self) -> int:
+        """Número de envíos pendientes de escribir"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        """Arranca la tarea de vaciado (se llama desde el lifespan de la app)"""
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._closing = False
+        self._task = asyncio.create_task(self._run(), name="submission-queue-flusher")
+
+    async def stop(self):
+        """Deja de aceptar envíos y espera a que se escriba todo lo pendiente"""
+        if self._task is None:
+            return
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def enqueue(self, row: dict):
+        """
+        Encola una fila de form_submissions tal cual: las respuestas de dimensión
+        siguen en texto, insert_submissions las traduce a sus ids al escribir.
+        Si la cola sigue llena tras enqueue_timeout, lanza QueueFullError (backpressure).
+        """
+        if self._queue is None or self._closing:
+            raise QueueFullError("La cola de ingesta no está activa")
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(row), timeout=self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                raise QueueFullError("La cola de ingesta está llena") from None
+
+    async def _run(self):
+        """Bucle principal: agrupa filas hasta batch_size o flush_interval y las escribe"""
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch: List[dict] = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # Drenaje final: lo que quede tras la señal de parada
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for start in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[start:start + self.batch_size])
+
+    async def _flush(self, batch: List[dict]):
+        """
+        Escribe un lote con un único INSERT multi-fila, reintentando si falla.
+        Si la base de datos rechaza alguna fila (DataError / IntegrityError),
+        reintentar no sirve: el lote se parte en dos hasta aislarla, y solo se
+        descarta esa fila.
+        """
+        for attempt in range(1, INGESTION_MAX_RETRIES + 1):
+            try:
+                async with self.session_factory() as db:
+                    await insert_submissions(db, batch)
+                    await db.commit()
+                self.flushed += len(batch)
+                oldest = min(row["received_at"] for row in batch)
+                self.last_lag = (datetime.now(timezone.utc) - oldest).total_seconds()
+                return
+            except (DataError, IntegrityError):
+                if len(batch) == 1:
+                    logger.exception("Envío rechazado por la base de datos, se descarta: %s", batch[0]["id"])
+                    self.failed += 1
+                    return
+                middle = len(batch) // 2
+                await self._flush(batch[:middle])
+                await self._flush(batch[middle:])
+                return
+            except Exception:
+                logger.exception(
+                    "Error escribiendo lote de %d envíos (intento %d/%d)",
+                    len(batch), attempt, INGESTION_MAX_RETRIES,
+                )
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 2.0))
+        self.failed += len(batch)
+        logger.error("Se descartan %d envíos: %s", len(batch), [str(row["id"]) for row in batch])
+
+
+# Instancia compartida por la aplicación
+submission_queue = SubmissionQueue()
@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 """
 Script para inicializar la base de datos PostgreSQL para KCH Forms API
+
+Uso:
+    python init_database.py          # instalación inicial: crea la BD, migra, rellena el rollup y verifica
+    python init_database.py --boot   # arranque del contenedor: crear BD si falta + alembic upgrade head + particiones
 """
 
 import os
@@ -83,21 +87,48 @@ def create_database():
         return False
 
 
-def create_tables():
-    """Crea las tablas usando SQLAlchemy"""
+def run_migrations():
+    """Aplica las migraciones pendientes de Alembic (alembic upgrade head)"""
     try:
-        logger.info("Creando tablas...")
-        
+        logger.info("Aplicando migraciones...")
+
         # Importar después de que la base de datos exista
-        from database import Base, engine, create_tables as db_create_tables
-        
-        # Crear todas las tablas
-        db_create_tables()
-        logger.info("✅ Tablas creadas exitosamente")
+        from alembic import command
+        from alembic.config import Config
+        from database import engine
+        from partitioning import ensure_form_partitions
+
+        config = Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini"))
+        command.upgrade(config, "head")
+
+        # Particiones de formularios añadidos al registro y de los próximos meses
+        with engine.begin() as conn:
+            ensure_form_partitions(conn)
+        logger.info("✅ Esquema actualizado")
         return True
-        
+
     except Exception as e:
-        logger.error(f"❌ Error creando las tablas: {e}")
+        logger.error(f"❌ Error aplicando las migraciones: {e}")
+        return False
+
+
+def backfill_rollups():
+    """Rellena el rollup de reportes si está vacío y ya hay respuestas guardadas"""
+    try:
+        from database import engine
+        from reports import rebuild_rollups
+
+        with engine.begin() as conn:
+            rollup_empty = conn.execute(text("SELECT NOT EXISTS (SELECT 1 FROM form_answer_daily)")).scalar()
+            has_submissions = conn.execute(text("SELECT EXISTS (SELECT 1 FROM form_submissions)")).scalar()
+            if rollup_empty and has_submissions:
+                logger.info("Calculando el rollup de reportes (form_answer_daily)...")
+                rebuild_rollups(conn)
+                logger.info("✅ Rollup de reportes calculado")
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Error calculando el rollup de reportes: {e}")
         return False
 
 
@@ -142,8 +173,23 @@ def verify_tables():
         return False
 
 
+def boot():
+    """
+    Camino rápido para cada arranque del contenedor: crea la base de datos si
+    falta y aplica migraciones y particiones de los próximos meses. No prueba la
+    conexión por separado (start.sh ya espera con pg_isready) ni inspecciona la
+    estructura de las tablas.
+    """
+    if not create_database() or not run_migrations():
+        sys.exit(1)
+
+
 def main():
     """Función principal para inicializar la base de datos"""
+    if sys.argv[1:] == ["--boot"]:
+        boot()
+        return
+
     logger.info("🚀 Iniciando configuración de la base de datos...")
     
     # Paso 1: Probar conexión a PostgreSQL
@@ -156,12 +202,17 @@ def main():
         logger.error("No se pudo crear la base de datos.")
         sys.exit(1)
     
-    # Paso 3: Crear las tablas
-    if not create_tables():
-        logger.error("No se pudieron crear las tablas.")
+    # Paso 3: Crear / migrar las tablas
+    if not run_migrations():
+        logger.error("No se pudieron aplicar las migraciones.")
         sys.exit(1)
-    
-    # Paso 4: Verificar las tablas
+
+    # Paso 4: Rellenar el rollup de reportes (solo la primera vez)
+    if not backfill_rollups():
+        logger.error("No se pudo calcular el rollup de reportes.")
+        sys.exit(1)
+
+    # Paso 5: Verificar las tablas
     if not verify_tables():
         logger.error("No se pudieron verificar las tablas.")
         sys.exit(1)
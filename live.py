@@ -0,0 +1,313 @@
+"""
+Contadores en vivo de envíos (GET /live/stream, Server-Sent Events)
+
+Opcional (LIVE_COUNTERS_ENABLED=true): cada worker abre una conexión de LISTEN
+propia, fuera del pool de SQLAlchemy.
+
+El panel de campaña se suscribe a /live/stream en lugar de consultar la base
+de datos cada pocos segundos. Las consultas no dependen de los espectadores:
+
+- Tras el commit de cada inserción, los incrementos del rollup que ya se
+  calcularon en la transacción (envíos por formulario y por respuesta) se
+  suman a un Counter en memoria, sin E/S.
+- Una tarea por worker los publica cada LIVE_PUBLISH_INTERVAL segundos con
+  un NOTIFY (canal kch_live), y cada worker los recibe todos por LISTEN: todos
+  ven los envíos de todos los workers.
+- Con esos incrementos cada worker arma una sola instantánea por intervalo
+  (total del día por formulario y distribución de respuestas de los últimos
+  LIVE_WINDOW_MINUTES minutos) que se reparte a todos sus suscriptores.
+
+El total del día se resincroniza con el rollup (form_answer_daily) cada
+LIVE_RESYNC_INTERVAL segundos: entre resincronizaciones es aproximado (un
+worker arranca a mitad de día, un NOTIFY se pierde al reconectar). La
+resincronización nunca hace bajar un total, porque el rollup se escribe con
+unos segundos de retraso (ver database.RollupWriter).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, deque
+from datetime import date, datetime, timezone
+from typing import AsyncIterator, Deque, Iterable, List, Optional, Set, Tuple
+
+import asyncpg
+import orjson
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from database import (
+    ASYNC_DATABASE_URL, DB_CONNECT_TIMEOUT, TOTAL_DIMENSION, WRITTEN_COUNTS_KEY, FormAnswerDaily, async_engine,
+)
+from forms import FORMS
+
+logger = logging.getLogger(__name__)
+
+LIVE_COUNTERS_ENABLED = os.getenv("LIVE_COUNTERS_ENABLED", "false").lower() in ("1", "true", "yes")
+LIVE_CHANNEL = "kch_live"
+LIVE_PUBLISH_INTERVAL = float(os.getenv("LIVE_PUBLISH_INTERVAL", "1"))
+LIVE_WINDOW_MINUTES = int(os.getenv("LIVE_WINDOW_MINUTES", "15"))
+LIVE_TOP_ANSWERS = int(os.getenv("LIVE_TOP_ANSWERS", "10"))
+LIVE_RESYNC_INTERVAL = float(os.getenv("LIVE_RESYNC_INTERVAL", "60"))
+LIVE_MAX_SUBSCRIBERS = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "1000"))
+# Comentario SSE periódico para que proxies y balanceadores no corten la conexión
+LIVE_KEEPALIVE_SECONDS = float(os.getenv("LIVE_KEEPALIVE_SECONDS", "15"))
+# Duración máxima de cada conexión: al cerrarla, EventSource reconecta tras
+# LIVE_RECONNECT_MS. Debe quedar por debajo de GRACEFUL_TIMEOUT (gunicorn
+# espera a las respuestas abiertas antes del apagado del lifespan, que drena la cola)
+LIVE_STREAM_MAX_SECONDS = float(os.getenv("LIVE_STREAM_MAX_SECONDS", "20"))
+LIVE_RECONNECT_MS = int(os.getenv("LIVE_RECONNECT_MS", "1000"))
+# Límite de Postgres para el payload de NOTIFY: 8000 bytes
+NOTIFY_MAX_BYTES = 7900
+
+# Incremento publicado: (día ISO, formulario, dimensión, respuesta, n)
+Entry = Tuple[str, str, str, str, int]
+
+
+def notify_payloads(entries: Iterable[Entry], max_bytes: int = NOTIFY_MAX_BYTES) -> List[bytes]:
+    """Reparte los incrementos en payloads JSON de NOTIFY por debajo de max_bytes"""
+    payloads, chunk, size = [], [], 2
+    for entry in entries:
+        encoded = orjson.dumps(entry)
+        if chunk and size + len(encoded) + 1 > max_bytes:
+            payloads.append(b"[" + b",".join(chunk) + b"]")
+            chunk, size = [], 2
+        chunk.append(encoded)
+        size += len(encoded) + 1
+    if chunk:
+        payloads.append(b"[" + b",".join(chunk) + b"]")
+    return payloads
+
+
+def listen_dsn(url: str = ASYNC_DATABASE_URL) -> str:
+    """DSN de asyncpg (sin el driver de SQLAlchemy) para la conexión de LISTEN"""
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class LiveCounters:
+    """Contadores agregados de todos los workers y reparto de la instantánea a los suscriptores"""
+
+    def __init__(
+        self,
+        publish_interval: float = LIVE_PUBLISH_INTERVAL,
+        window_minutes: int = LIVE_WINDOW_MINUTES,
+        top_answers: int = LIVE_TOP_ANSWERS,
+        resync_interval: float = LIVE_RESYNC_INTERVAL,
+    ):
+        self.publish_interval = publish_interval
+        self.window_minutes = window_minutes
+        self.top_answers = top_answers
+        self.resync_interval = resync_interval
+        # Incrementos de este worker aún sin publicar
+        self.pending: Counter = Counter()
+        self.day: date = datetime.now(timezone.utc).date()
+        self.totals: Counter = Counter()
+        # (minuto, incrementos (formulario, dimensión, respuesta) -> n) de la ventana reciente
+        self.buckets: Deque[Tuple[int, Counter]] = deque()
+        self.snapshot: Optional[dict] = None
+        self.message: Optional[str] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._listener: Optional[asyncpg.Connection] = None
+        self._resynced_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def record(self, counts: Counter):
+        """Incrementos del rollup de una transacción confirmada (sin E/S)"""
+        for (day, form, dimension, answer), n in counts.items():
+            self.pending[(day.isoformat(), form, dimension, answer)] += n
+
+    def apply(self, entries: Iterable[Entry], now: Optional[float] = None):
+        """Suma incrementos publicados (por cualquier worker) a los totales y a la ventana reciente"""
+        minute = int((time.time() if now is None else now) // 60)
+        if not self.buckets or self.buckets[-1][0] != minute:
+            self.buckets.append((minute, Counter()))
+        bucket = self.buckets[-1][1]
+        today = self.day.isoformat()
+        for day, form, dimension, answer, n in entries:
+            if dimension == TOTAL_DIMENSION and day == today:
+                self.totals[form] += n
+            bucket[(form, dimension, answer)] += n
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            self.apply(orjson.loads(payload))
+        except Exception:
+            logger.exception("Notificación de contadores en vivo no válida")
+
+    async def publish(self):
+        """Envía los incrementos pendientes a todos los workers (NOTIFY)"""
+        if not self.pending:
+            return
+        entries = [(*key, n) for key, n in self.pending.items()]
+        self.pending.clear()
+        try:
+            async with async_engine.begin() as conn:
+                for payload in notify_payloads(entries):
+                    await conn.execute(select(func.pg_notify(LIVE_CHANNEL, payload.decode())))
+        except Exception:
+            # Sin NOTIFY, al menos este worker refleja sus propios envíos
+            logger.exception("No se pudieron publicar los contadores en vivo")
+            self.apply(entries)
+
+    async def listen(self):
+        """Abre (o reabre) la conexión dedicada que recibe los incrementos de todos los workers"""
+        if self._listener is not None and not self._listener.is_closed():
+            return
+        try:
+            self._listener = await asyncpg.connect(listen_dsn(), timeout=DB_CONNECT_TIMEOUT)
+            await self._listener.add_listener(LIVE_CHANNEL, self._on_notify)
+        except Exception:
+            logger.exception("No se pudo escuchar el canal de contadores en vivo")
+            self._listener = None
+
+    async def resync(self):
+        """
+        Total del día por formulario según el rollup, sin perder incrementos ya
+        aplicados: cada worker escribe el rollup cada ROLLUP_FLUSH_INTERVAL
+        segundos, así que la tabla puede ir por detrás de lo recibido por
+        NOTIFY. Se queda el mayor de los dos (la tabla corrige los NOTIFY perdidos).
+        """
+        today = datetime.now(timezone.utc).date()
+        table = FormAnswerDaily.__table__
+        async with async_engine.connect() as conn:
+            rows = (await conn.execute(
+                select(table.c.form, table.c.count)
+                .where(table.c.day == today, table.c.dimension == TOTAL_DIMENSION)
+            )).all()
+        stored = Counter(dict(rows))
+        if today == self.day:
+            stored = Counter({form: max(stored[form], self.totals[form]) for form in stored.keys() | self.totals.keys()})
+        self.day = today
+        self.totals = stored
+        self._resynced_at = time.monotonic()
+
+    def build_snapshot(self, now: Optional[float] = None) -> dict:
+        now = time.time() if now is None else now
+        oldest = int(now // 60) - self.window_minutes + 1
+        while self.buckets and self.buckets[0][0] < oldest:
+            self.buckets.popleft()
+        recent = Counter()
+        for _, bucket in self.buckets:
+            recent.update(bucket)
+
+        submissions = {spec.name: 0 for spec in FORMS}
+        answers = {}
+        for (form, dimension, answer), n in recent.items():
+            if dimension == TOTAL_DIMENSION:
+                submissions[form] = submissions.get(form, 0) + n
+            else:
+                answers.setdefault(dimension, Counter())[answer] += n
+        return {
+            "day": self.day.isoformat(),
+            "totals": {**{spec.name: 0 for spec in FORMS}, **self.totals},
+            "recent": {
+                "minutes": self.window_minutes,
+                "submissions": submissions,
+                "answers": {
+                    dimension: [{"answer": answer, "count": n} for answer, n in counts.most_common(self.top_answers)]
+                    for dimension, counts in sorted(answers.items())
+                },
+            },
+        }
+
+    def broadcast(self, now: Optional[float] = None):
+        """Arma la instantánea y, si cambió, la codifica una vez y la entrega a todos los suscriptores"""
+        snapshot = self.build_snapshot(now)
+        if snapshot == self.snapshot:
+            return
+        self.snapshot = snapshot
+        body = orjson.dumps({**snapshot, "generated_at": datetime.now(timezone.utc)}, option=orjson.OPT_UTC_Z)
+        self.message = f"event: counts\ndata: {body.decode()}\n\n"
+        for queue in self._subscribers:
+            # Un suscriptor lento solo recibe la última instantánea
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(self.message)
+
+    async def tick(self):
+        """Un ciclo: publicar, resincronizar si toca y repartir la instantánea"""
+        await self.publish()
+        await self.listen()
+        stale = time.monotonic() - self._resynced_at >= self.resync_interval
+        if stale or datetime.now(timezone.utc).date() != self.day:
+            try:
+                await self.resync()
+            except Exception:
+                logger.exception("No se pudo resincronizar el total del día")
+        self.broadcast()
+
+    async def start(self):
+        await self.tick()
+        self._task = asyncio.create_task(self._run(), name="live-counters")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Publicar lo pendiente antes de apagar el worker
+        await self.publish()
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.publish_interval)
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("Error actualizando los contadores en vivo")
+
+    async def stream(
+        self, keepalive: float = LIVE_KEEPALIVE_SECONDS, max_seconds: float = LIVE_STREAM_MAX_SECONDS
+    ) -> AsyncIterator[str]:
+        """
+        Eventos SSE para un suscriptor: la instantánea actual y cada cambio.
+        Termina a los `max_seconds` segundos indicando al cliente que reconecte
+        (campo retry), para que ninguna conexión retrase el apagado del worker.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        deadline = time.monotonic() + max_seconds
+        try:
+            if self.message is not None:
+                yield self.message
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    yield await asyncio.wait_for(queue.get(), min(keepalive, remaining))
+                except asyncio.TimeoutError:
+                    if time.monotonic() >= deadline:
+                        break
+                    yield ": keepalive\n\n"
+            yield f"retry: {LIVE_RECONNECT_MS}\n\n"
+        finally:
+            self._subscribers.discard(queue)
+
+
+# Instancia compartida por la aplicación (una por worker)
+live_counters = LiveCounters()
+
+
+@event.listens_for(Session, "after_commit")
+def _record_after_commit(session):
+    counts: Optional[Counter] = session.info.pop(WRITTEN_COUNTS_KEY, None)
+    if counts and LIVE_COUNTERS_ENABLED:
+        live_counters.record(counts)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop(WRITTEN_COUNTS_KEY, None)
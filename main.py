@@ -3,7 +3,10 @@ KCH – Formularios de captación: Especificación mejorada
 =======================================================
 Objetivo: exponer **9 endpoints** (uno por pregunta/formulario) para recopilar datos de clientes.
 Cada endpoint:
-  - Método: **POST** (idempotencia no requerida; se considera una captura de respuesta).
+  - Método: **POST**. Cabecera opcional `Idempotency-Key`: los reintentos con la
+    misma clave devuelven la respuesta original sin guardar otro envío (ver
+    idempotency.py). Con la cola de ingesta activa, los envíos con clave no se
+    encolan: se escriben en la misma transacción que la clave.
   - Cuerpo: JSON con los campos descritos.
   - Respuesta: eco del payload validado + metadatos (timestamp, formulario, id).
   - Validación estricta de tipos y opciones.
@@ -52,24 +55,83 @@ Notas técnicas
 --------------
 - Framework: FastAPI (Pydantic v2).
 - CORS abierto para facilitar pruebas (ajustar en producción).
-- Almacenamiento: en memoria (dict) a modo de demo; sustituir por DB más adelante.
+- Almacenamiento: PostgreSQL vía SQLAlchemy asíncrono (asyncpg), sin bloquear el event loop.
 - Se proveen ejemplos y descripciones en los modelos para una mejor DX en Swagger UI.
 - Nombres de variables en inglés para alinearse con la preferencia del usuario.
 
 """
 
-from enum import Enum
+import json
+import logging
+from contextlib import asynccontextmanager
 from typing import List, Optional
-from uuid import uuid4
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
+from uuid import UUID
 
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, EmailStr, constr
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db, get_pool_status, create_tables, insert_submissions, rollup_writer
+from export import EXPORT_PAGE_SIZE, csv_stream, decode_cursor, encode_cursor, fetch_page, iter_pages, ndjson_stream
+from forms import FORMS, FORMS_BY_NAME, FormJSONResponse, FormResponse, FormSpec, form_response_body
+from ingestion import INGESTION_QUEUE_ENABLED, QueueFullError, submission_queue
+from cache import report_cache
+from dimensions import dimension_cache
+from health import readiness_monitor
+from ids import uuid7
+from idempotency import IDEMPOTENCY_HEADER, IDEMPOTENCY_KEY_MAX_LENGTH, IdempotencyConflict, claim_key
+from live import LIVE_COUNTERS_ENABLED, LIVE_MAX_SUBSCRIBERS, live_counters
+from metrics import METRICS_ENABLED, NULL_CLOCK, MetricsMiddleware, render_metrics, stage_clock
+from payloads import stored_data
+from replicas import get_read_db, replica_monitor
+from reports import (
+    ALL_FORMS,
+    DIMENSION_FORMS,
+    ReportBucket,
+    ReportDimension,
+    ReportResponse,
+    answers_report,
+    default_range,
+    submissions_report,
+)
+from search import SEARCH_FORMS, ProductSearchResponse, product_counts, search_products, to_tsquery_text
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Precarga de las dimensiones; si falla, se completan al llegar cada valor
+    try:
+        await dimension_cache.load()
+    except Exception:
+        logger.exception("No se pudieron precargar las tablas de dimensión")
+    # Rollup diario: los incrementos se acumulan en memoria y se escriben cada pocos segundos
+    await rollup_writer.start()
+    # Cola de ingesta opcional: se arranca al iniciar y se drena al apagar
+    if INGESTION_QUEUE_ENABLED:
+        await submission_queue.start()
+    # Comprobación de disponibilidad en segundo plano (/ready, /health)
+    await readiness_monitor.start()
+    # Retraso de la réplica de lectura (solo con READ_DATABASE_URL)
+    await replica_monitor.start()
+    # Contadores en vivo (/live/stream), agregados entre workers con LISTEN/NOTIFY
+    if LIVE_COUNTERS_ENABLED:
+        await live_counters.start()
+    yield
+    # Primero se drena la cola: sus últimos lotes generan incrementos que los
+    # contadores en vivo y el rollup deben publicar y escribir al parar
+    if INGESTION_QUEUE_ENABLED:
+        await submission_queue.stop()
+    if LIVE_COUNTERS_ENABLED:
+        await live_counters.stop()
+    await replica_monitor.stop()
+    await readiness_monitor.stop()
+    await rollup_writer.stop()
 
-from database import get_db, create_tables, FormSubmission, extract_fields_from_data
 
 app = FastAPI(
     title="KCH – Formularios de Captación",
@@ -78,6 +140,7 @@ app = FastAPI(
         "para capturar respuestas de clientes con validación y ejemplos."
     ),
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS (ajustar allow_origins en producción)
@@ -89,432 +152,454 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# -----------------
-# Utilidades comunes
-# -----------------
-class FormResponse(BaseModel):
-    id: str = Field(..., description="Identificador único de la respuesta")
-    form: str = Field(..., description="Nombre del formulario / endpoint")
-    received_at: datetime = Field(..., description="Fecha ISO de recepción (UTC)")
-
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "id": "f9d0b4e2-9a9a-4fa7-9c6c-5c3b7bc9e123",
-                "form": "age",
-                "received_at": "2025-09-26T12:00:00Z",
-            }
-        }
-
-# Crear tablas al iniciar la aplicación
-create_tables()
+# El esquema no se crea al importar: lo aplica Alembic una sola vez al arrancar
+# el contenedor (init_database.py --boot), antes de lanzar los workers
 
 
 def make_meta(form: str) -> FormResponse:
-    return FormResponse(
-        id=str(uuid4()),
-        form=form,
-        received_at=datetime.now(timezone.utc),
-    )
-
-
-# 1) Edad
-class AgeEnum(str, Enum):
-    a_18_24 = "18-24"
-    a_25_35 = "25-35"
-    a_35_44 = "35-44"
-    a_45_plus = "45+"
-
-
-class AgePayload(BaseModel):
-    age: AgeEnum = Field(..., description="Rango de edad")
-
-    class Config:
-        json_schema_extra = {"example": {"age": "25-35"}}
+    # Los valores ya tienen el tipo correcto: se construye sin validar.
+    # El id (UUIDv7) lleva el mismo instante que received_at
+    received_at = datetime.now(timezone.utc)
+    return FormResponse.model_construct(id=uuid7(received_at), form=form, received_at=received_at)
+
+
+def submission_row(meta: FormResponse, data_dict: dict, specific_fields: dict) -> dict:
+    """Fila de form_submissions a partir de los metadatos y el payload validado"""
+    return {
+        "id": meta.id,
+        "form": meta.form,
+        "received_at": meta.received_at,
+        "data": stored_data(meta.form, data_dict),
+        **specific_fields,
+    }
+
+
+async def persist_submission(
+    db: AsyncSession, meta: FormResponse, data_dict: dict, specific_fields: dict, clock=NULL_CLOCK, direct=False
+):
+    """
+    Guarda la respuesta: directamente en la base de datos (un único INSERT, sin
+    recargar la fila) o, si la cola de ingesta está activa, encolándola para su
+    escritura por lotes.
+    Con `direct` (envíos con Idempotency-Key) se escribe siempre en la
+    transacción de la petición, junto con la clave: si se encolara, la clave
+    quedaría confirmada aunque el lote se descartara después, y el reintento
+    recibiría la respuesta de un envío que no existe.
+    """
+    row = submission_row(meta, data_dict, specific_fields)
+    if INGESTION_QUEUE_ENABLED and not direct:
+        try:
+            await submission_queue.enqueue(row)
+        except QueueFullError:
+            raise HTTPException(
+                status_code=503,
+                detail="Servicio saturado, reintenta en unos segundos",
+                headers={"Retry-After": "1"},
+            )
+        clock.lap("insert")
+        return
+
+    await insert_submissions(db, [row])
+    clock.lap("insert")
+    await db.commit()
+    clock.lap("commit")
 
 
-class AgeResponse(FormResponse):
-    data: AgePayload
-
-
-@app.post("/form/age", response_model=AgeResponse, tags=["01 – Edad"])
-async def submit_age(payload: AgePayload, db: Session = Depends(get_db)):
-    meta = make_meta("age")
-    data_dict = payload.model_dump()
-    
-    # Extraer campos específicos
-    specific_fields = extract_fields_from_data("age", data_dict)
-    
-    # Crear registro en la base de datos
-    db_submission = FormSubmission(
-        id=meta.id,
-        form=meta.form,
-        received_at=meta.received_at,
-        data=data_dict,
-        **specific_fields
-    )
-    
-    db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
-    
-    return AgeResponse(**meta.model_dump(), data=payload)
-
-
-# 2) Datos personales
-class PersonalDataPayload(BaseModel):
-    name: constr(strip_whitespace=True, min_length=1) = Field(..., description="Nombre completo")
-    street: constr(strip_whitespace=True, min_length=1) = Field(..., description="Calle")
-    number: constr(strip_whitespace=True, min_length=1) = Field(..., description="Número de portal (como texto)")
-    floor: Optional[constr(strip_whitespace=True, min_length=1)] = Field(None, description="Piso")
-    door: Optional[constr(strip_whitespace=True, min_length=1)] = Field(None, description="Puerta")
-    stair: Optional[constr(strip_whitespace=True, min_length=1)] = Field(None, description="Escalera")
-
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "name": "Ana Pérez",
-                "street": "Gran Vía",
-                "number": "123",
-                "floor": "4",
-                "door": "B",
-                "stair": "2",
-            }
-        }
-
-
-class PersonalDataResponse(FormResponse):
-    data: PersonalDataPayload
-
-
-@app.post("/form/personal-data", response_model=PersonalDataResponse, tags=["02 – Datos personales"])
-async def submit_personal_data(payload: PersonalDataPayload, db: Session = Depends(get_db)):
-    meta = make_meta("personal-data")
-    data_dict = payload.model_dump()
-    
-    specific_fields = extract_fields_from_data("personal-data", data_dict)
-    
-    db_submission = FormSubmission(
-        id=meta.id,
-        form=meta.form,
-        received_at=meta.received_at,
-        data=data_dict,
-        **specific_fields
-    )
-    
-    db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
-    
-    return PersonalDataResponse(**meta.model_dump(), data=payload)
-
-
-# 3) Identificación
-class IdentificationPayload(BaseModel):
-    document_type: constr(strip_whitespace=True, min_length=2) = Field(
-        ..., description="Tipo de documento (DNI, NIE, Pasaporte, etc.)"
-    )
-    document_number: constr(strip_whitespace=True, min_length=3) = Field(
-        ..., description="Número de documento"
-    )
-    phone: constr(strip_whitespace=True, min_length=6, pattern=r"^[+]?[- 0-9()]{6,}$") = Field(
-        ..., description="Teléfono (se acepta formato local o E.164)")
+# -----------------
+# Endpoints de formularios (generados desde el registro de forms.py)
+# -----------------
+def make_form_endpoint(spec: FormSpec):
+    """Crea el handler POST de un formulario a partir de su FormSpec"""
+    form = spec.name
+    extract = spec.extract
+
+    async def submit(
+        payload: spec.payload_model,
+        db: AsyncSession = Depends(get_db),
+        idempotency_key: Optional[str] = Header(
+            None,
+            alias=IDEMPOTENCY_HEADER,
+            min_length=1,
+            max_length=IDEMPOTENCY_KEY_MAX_LENGTH,
+            description="Clave única del envío: los reintentos con la misma clave devuelven la respuesta original",
+        ),
+    ):
+        clock = stage_clock(form)
+        clock.lap("validate")
+        meta = make_meta(form)
+        data_dict = payload.model_dump()
+        specific_fields = extract(data_dict)
+        clock.lap("extract")
+        if idempotency_key is not None:
+            try:
+                original = await claim_key(db, idempotency_key, meta, data_dict)
+            except IdempotencyConflict as e:
+                raise HTTPException(status_code=422, detail=str(e))
+            if original is not None:
+                clock.done()
+                # Reintento: respuesta original, sin segundo INSERT
+                body = form_response_body(original, data_dict)
+                return FormJSONResponse(body, headers={"Idempotent-Replayed": "true"})
+        await persist_submission(db, meta, data_dict, specific_fields, clock, direct=idempotency_key is not None)
+        clock.done()
+        # Camino rápido: sin construir response_model ni revalidarlo (ver FormJSONResponse)
+        return FormJSONResponse(form_response_body(meta, data_dict))
+
+    submit.__name__ = f"submit_{form.replace('-', '_')}"
+    return submit
+
+
+for spec in FORMS:
+    app.post(spec.route, response_model=spec.response_model, tags=[spec.tag])(make_form_endpoint(spec))
+
+
+# 10) Envío por lotes (kioscos / app offline)
+BATCH_MAX_ITEMS = 1000
+BATCH_CHUNK_SIZE = 500
+
+
+class BatchItem(BaseModel):
+    form: str = Field(..., description="Formulario al que pertenece la respuesta (p.ej. \"age\")")
+    data: dict = Field(..., description="Payload del formulario, igual que en su endpoint individual")
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
 
     class Config:
         json_schema_extra = {
             "example": {
-                "document_type": "DNI",
-                "document_number": "12345678Z",
-                "phone": "+34 600 123 456",
+                "items": [
+                    {"form": "age", "data": {"age": "25-35"}},
+                    {"form": "favorite-store", "data": {"store": "KCH Centro"}},
+                    {"form": "contact", "data": {"email": "ana@example.com", "large_family": True}},
+                ]
             }
         }
 
 
-class IdentificationResponse(FormResponse):
-    data: IdentificationPayload
-
-
-@app.post("/form/identification", response_model=IdentificationResponse, tags=["03 – Identificación"])
-async def submit_identification(payload: IdentificationPayload, db: Session = Depends(get_db)):
-    meta = make_meta("identification")
-    data_dict = payload.model_dump()
-    
-    specific_fields = extract_fields_from_data("identification", data_dict)
-    
-    db_submission = FormSubmission(
-        id=meta.id,
-        form=meta.form,
-        received_at=meta.received_at,
-        data=data_dict,
-        **specific_fields
-    )
-    
-    db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
-    
-    return IdentificationResponse(**meta.model_dump(), data=payload)
-
-
-# 4) Descubrimiento de descuentos
-class DiscoveryPayload(BaseModel):
-    source: constr(strip_whitespace=True, min_length=2) = Field(
-        ..., description="¿Cómo te enteraste de los descuentos?"
-    )
-
-    class Config:
-        json_schema_extra = {"example": {"source": "Instagram"}}
-
-
-class DiscoveryResponse(FormResponse):
-    data: DiscoveryPayload
-
-
-@app.post("/form/discovery", response_model=DiscoveryResponse, tags=["04 – Marketing / Descubrimiento"])
-async def submit_discovery(payload: DiscoveryPayload, db: Session = Depends(get_db)):
-    meta = make_meta("discovery")
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Posición del elemento en el lote")
+    form: Optional[str] = None
+    id: Optional[UUID] = Field(None, description="Identificador asignado si se ha aceptado")
+    received_at: Optional[datetime] = None
+    errors: Optional[List[dict]] = Field(None, description="Errores de validación si se ha rechazado")
+
+
+class BatchResponse(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[BatchItemResult]
+
+
+def validate_batch_item(index: int, form: Optional[str], data) -> tuple:
+    """
+    Valida un elemento del lote con el modelo de su formulario.
+    Devuelve (fila para form_submissions o None, resultado del elemento).
+    """
+    if not isinstance(form, str):
+        # NDJSON: el campo puede traer cualquier tipo JSON
+        error = {"loc": ["form"], "msg": "El formulario debe ser un texto", "type": "string_type"}
+        return None, BatchItemResult(index=index, errors=[error])
+    spec = FORMS_BY_NAME.get(form)
+    if spec is None:
+        error = {"loc": ["form"], "msg": f"Formulario desconocido: {form!r}", "type": "value_error"}
+        return None, BatchItemResult(index=index, form=form, errors=[error])
+    try:
+        payload = spec.payload_model.model_validate(data)
+    except ValidationError as e:
+        errors = [
+            {"loc": ["data", *error["loc"]], "msg": error["msg"], "type": error["type"]}
+            for error in e.errors(include_url=False)
+        ]
+        return None, BatchItemResult(index=index, form=form, errors=errors)
+
+    meta = make_meta(form)
     data_dict = payload.model_dump()
-    
-    specific_fields = extract_fields_from_data("discovery", data_dict)
-    
-    db_submission = FormSubmission(
-        id=meta.id,
-        form=meta.form,
-        received_at=meta.received_at,
-        data=data_dict,
-        **specific_fields
-    )
-    
-    db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
-    
-    return DiscoveryResponse(**meta.model_dump(), data=payload)
-
-
-# 5) Tienda favorita
-class FavoriteStorePayload(BaseModel):
-    store: constr(strip_whitespace=True, min_length=1) = Field(..., description="Tienda que visita más")
-
-    class Config:
-        json_schema_extra = {"example": {"store": "KCH Centro"}}
-
-
-class FavoriteStoreResponse(FormResponse):
-    data: FavoriteStorePayload
-
+    row = submission_row(meta, data_dict, spec.extract(data_dict))
+    return row, BatchItemResult(index=index, form=form, id=meta.id, received_at=meta.received_at)
+
+
+def batch_response(results: List[BatchItemResult]) -> BatchResponse:
+    accepted = sum(1 for result in results if result.errors is None)
+    return BatchResponse(accepted=accepted, rejected=len(results) - accepted, results=results)
+
+
+@app.post("/form/batch", response_model=BatchResponse, tags=["10 – Envío por lotes"])
+async def submit_batch(batch: BatchRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Recibe varias respuestas (de uno o varios formularios) en una sola petición.
+    Cada elemento se valida por separado; los válidos se guardan en una única transacción.
+    """
+    rows, results = [], []
+    for index, item in enumerate(batch.items):
+        row, result = validate_batch_item(index, item.form, item.data)
+        results.append(result)
+        if row is not None:
+            rows.append(row)
+
+    for start in range(0, len(rows), BATCH_CHUNK_SIZE):
+        await insert_submissions(db, rows[start:start + BATCH_CHUNK_SIZE])
+    await db.commit()
+
+    return batch_response(results)
+
+
+@app.post("/form/batch/ndjson", response_model=BatchResponse, tags=["10 – Envío por lotes"])
+async def submit_batch_ndjson(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Variante en streaming: cuerpo NDJSON (`application/x-ndjson`), una línea
+    `{"form": ..., "data": {...}}` por respuesta. Se procesa a medida que llega
+    y todo se confirma en una única transacción al final.
+    Admite como mucho BATCH_MAX_ITEMS líneas, igual que /form/batch.
+    """
+    rows, results = [], []
+    buffer = b""
+    index = 0
+
+    async def handle_line(line: bytes):
+        nonlocal index
+        if not line.strip():
+            return
+        if index >= BATCH_MAX_ITEMS:
+            # Se descarta todo el lote (la transacción no se confirma)
+            raise HTTPException(
+                status_code=422, detail=f"El lote admite como mucho {BATCH_MAX_ITEMS} elementos"
+            )
+        try:
+            item = json.loads(line)
+            form, data = item.get("form"), item.get("data")
+        except (ValueError, AttributeError):
+            error = {"loc": [], "msg": "Línea NDJSON inválida", "type": "json_invalid"}
+            results.append(BatchItemResult(index=index, errors=[error]))
+        else:
+            row, result = validate_batch_item(index, form, data)
+            results.append(result)
+            if row is not None:
+                rows.append(row)
+                if len(rows) >= BATCH_CHUNK_SIZE:
+                    await insert_submissions(db, rows)
+                    rows.clear()
+        index += 1
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            await handle_line(line)
+    await handle_line(buffer)
+
+    await insert_submissions(db, rows)
+    await db.commit()
+
+    return batch_response(results)
+
+
+# Endpoint utilitario para ver (demo) los datos guardados, paginado (no usar en prod)
+class DebugDump(BaseModel):
+    count: int
+    items: dict
+    next_cursor: Optional[str] = Field(None, description="Cursor para pedir la página siguiente (after=...)")
 
-@app.post("/form/favorite-store", response_model=FavoriteStoreResponse, tags=["05 – Preferencias de tienda"])
-async def submit_favorite_store(payload: FavoriteStorePayload, db: Session = Depends(get_db)):
-    meta = make_meta("favorite-store")
-    data_dict = payload.model_dump()
-    
-    specific_fields = extract_fields_from_data("favorite-store", data_dict)
-    
-    db_submission = FormSubmission(
-        id=meta.id,
-        form=meta.form,
-        received_at=meta.received_at,
-        data=data_dict,
-        **specific_fields
-    )
-    
-    db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
-    
-    return FavoriteStoreResponse(**meta.model_dump(), data=payload)
-
-
-# 6) Tipo de servicio a domicilio
-class DeliveryTypePayload(BaseModel):
-    service_type: constr(strip_whitespace=True, min_length=2) = Field(
-        ..., description="Tipo de servicio a domicilio"
-    )
 
-    class Config:
-        json_schema_extra = {"example": {"service_type": "Express"}}
+def parse_cursor(after: Optional[str]):
+    try:
+        return decode_cursor(after) if after else None
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 
-class DeliveryTypeResponse(FormResponse):
-    data: DeliveryTypePayload
+def check_form_filter(form: Optional[str]):
+    if form is not None and form not in FORMS_BY_NAME:
+        raise HTTPException(status_code=422, detail=f"Formulario desconocido: {form!r}")
 
 
-@app.post("/form/delivery-type", response_model=DeliveryTypeResponse, tags=["06 – Envíos"])
-async def submit_delivery_type(payload: DeliveryTypePayload, db: Session = Depends(get_db)):
-    meta = make_meta("delivery-type")
-    data_dict = payload.model_dump()
-    
-    specific_fields = extract_fields_from_data("delivery-type", data_dict)
-    
-    db_submission = FormSubmission(
-        id=meta.id,
-        form=meta.form,
-        received_at=meta.received_at,
-        data=data_dict,
-        **specific_fields
+@app.get("/debug/dump", response_model=DebugDump, tags=["_debug"])
+async def dump(
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = Query(None, description="Cursor devuelto en next_cursor"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    rows = await fetch_page(db, after=parse_cursor(after), limit=limit)
+    items = {}
+    for row in rows:
+        items[str(row["id"])] = {
+            "form": row["form"],
+            "data": row["data"],
+            "received_at": row["received_at"].isoformat()
+        }
+    next_cursor = encode_cursor(rows[-1]["received_at"], rows[-1]["id"]) if len(rows) == limit else None
+    return DebugDump(count=len(rows), items=items, next_cursor=next_cursor)
+
+
+# Exportación completa en streaming (NDJSON o CSV), con memoria constante
+@app.get("/export/submissions", tags=["_export"])
+async def export_submissions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    form: Optional[str] = Query(None, description="Filtrar por formulario"),
+    since: Optional[datetime] = Query(None, description="received_at >= since"),
+    until: Optional[datetime] = Query(None, description="received_at < until"),
+    page_size: int = Query(EXPORT_PAGE_SIZE, ge=1, le=10000),
+):
+    check_form_filter(form)
+    pages = iter_pages(
+        form=form, since=since, until=until, page_size=page_size, session_factory=replica_monitor.session_factory()
     )
-    
-    db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
-    
-    return DeliveryTypeResponse(**meta.model_dump(), data=payload)
-
-
-# 7) Lista de productos a comprar
-class ProductsPayload(BaseModel):
-    products: List[constr(strip_whitespace=True, min_length=1)] = Field(
-        ..., min_length=1, description="Listado de productos de interés"
+    if format == "csv":
+        return StreamingResponse(
+            csv_stream(pages),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="form_submissions.csv"'},
+        )
+    return StreamingResponse(ndjson_stream(pages), media_type="application/x-ndjson")
+
+
+# Reportes sobre el rollup diario (sin recorrer form_submissions)
+@app.get("/reports/submissions", response_model=ReportResponse, tags=["_reports"])
+async def report_submissions(
+    bucket: ReportBucket = ReportBucket.day,
+    since: Optional[date] = Query(None, description="Primer día incluido (por defecto, hace 30 días)"),
+    until: Optional[date] = Query(None, description="Último día incluido (por defecto, hoy)"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Nº de envíos por formulario, agrupados por día o semana"""
+    since, until = default_range(since, until)
+    rows = await report_cache.get_or_load(
+        ("submissions", bucket, since, until),
+        lambda: submissions_report(db, bucket, since, until),
+        tags=ALL_FORMS,
     )
-
-    class Config:
-        json_schema_extra = {"example": {"products": ["Champú", "Acondicionador", "Serum"]}}
-
-
-class ProductsResponse(FormResponse):
-    data: ProductsPayload
-
-
-@app.post("/form/products", response_model=ProductsResponse, tags=["07 – Productos"])
-async def submit_products(payload: ProductsPayload, db: Session = Depends(get_db)):
-    meta = make_meta("products")
-    data_dict = payload.model_dump()
-    
-    specific_fields = extract_fields_from_data("products", data_dict)
-    
-    db_submission = FormSubmission(
-        id=meta.id,
-        form=meta.form,
-        received_at=meta.received_at,
-        data=data_dict,
-        **specific_fields
-    )
-    
-    db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
-    
-    return ProductsResponse(**meta.model_dump(), data=payload)
-
-
-# 8) Conocimiento de promociones semanales
-class WeeklyPromosKnowledgePayload(BaseModel):
-    answer: constr(strip_whitespace=True, min_length=1) = Field(
-        ..., description="Respuesta a si conoces las promociones semanales (Sí/No/…)"
+    return ReportResponse(dimension="form", bucket=bucket, since=since, until=until, rows=rows)
+
+
+@app.get("/reports/answers/{dimension}", response_model=ReportResponse, tags=["_reports"])
+async def report_answers(
+    dimension: ReportDimension,
+    bucket: ReportBucket = ReportBucket.day,
+    since: Optional[date] = Query(None, description="Primer día incluido (por defecto, hace 30 días)"),
+    until: Optional[date] = Query(None, description="Último día incluido (por defecto, hoy)"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Nº de envíos por respuesta (p.ej. por tienda favorita), agrupados por día o semana"""
+    since, until = default_range(since, until)
+    rows = await report_cache.get_or_load(
+        ("answers", dimension, bucket, since, until),
+        lambda: answers_report(db, dimension, bucket, since, until),
+        tags=DIMENSION_FORMS[dimension],
     )
-
-    class Config:
-        json_schema_extra = {"example": {"answer": "Sí"}}
-
-
-class WeeklyPromosKnowledgeResponse(FormResponse):
-    data: WeeklyPromosKnowledgePayload
-
-
-@app.post(
-    "/form/weekly-promos-knowledge",
-    response_model=WeeklyPromosKnowledgeResponse,
-    tags=["08 – Promociones"],
-)
-async def submit_weekly_promos_knowledge(payload: WeeklyPromosKnowledgePayload, db: Session = Depends(get_db)):
-    meta = make_meta("weekly-promos-knowledge")
-    data_dict = payload.model_dump()
-    
-    specific_fields = extract_fields_from_data("weekly-promos-knowledge", data_dict)
-    
-    db_submission = FormSubmission(
-        id=meta.id,
-        form=meta.form,
-        received_at=meta.received_at,
-        data=data_dict,
-        **specific_fields
+    return ReportResponse(dimension=dimension.value, bucket=bucket, since=since, until=until, rows=rows)
+
+
+# Búsqueda de productos (texto completo, sin distinguir tildes)
+@app.get("/search/products", response_model=ProductSearchResponse, tags=["_reports"])
+async def search_products_endpoint(
+    q: str = Query(..., min_length=1, max_length=200, description="Texto a buscar (p.ej. champu, serum)"),
+    since: Optional[date] = Query(None, description="Primer día incluido (por defecto, hace 30 días)"),
+    until: Optional[date] = Query(None, description="Último día incluido (por defecto, hoy)"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Envíos de productos que coinciden, por relevancia, y frecuencia de cada producto"""
+    try:
+        tsquery = to_tsquery_text(q)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    since, until = default_range(since, until)
+
+    async def load():
+        results = await search_products(db, tsquery, since, until, limit)
+        products = await product_counts(db, tsquery, since, until, limit)
+        return ProductSearchResponse(query=q, since=since, until=until, results=results, products=products)
+
+    return await report_cache.get_or_load(("search", tsquery, since, until, limit), load, tags=SEARCH_FORMS)
+
+
+@app.get("/reports/cache", tags=["_reports"])
+async def report_cache_stats():
+    """Aciertos / fallos de la caché de reportes de este worker"""
+    return report_cache.stats()
+
+
+# Liveness: el proceso responde (sin E/S)
+@app.get("/live", tags=["_system"])
+async def live():
+    return {"status": "alive"}
+
+
+# Contadores en vivo para el panel de campaña (Server-Sent Events)
+@app.get("/live/stream", tags=["_reports"])
+async def live_stream():
+    """
+    Envíos de hoy por formulario y respuestas recientes; un evento `counts` por
+    cada cambio. Cada conexión dura como mucho LIVE_STREAM_MAX_SECONDS y el
+    navegador (EventSource) reconecta solo.
+    """
+    if not LIVE_COUNTERS_ENABLED:
+        raise HTTPException(status_code=404, detail="Contadores en vivo desactivados (LIVE_COUNTERS_ENABLED=false)")
+    if live_counters.subscribers >= LIVE_MAX_SUBSCRIBERS:
+        raise HTTPException(status_code=503, detail="Demasiados suscriptores en este worker")
+    return StreamingResponse(
+        live_counters.stream(),
+        media_type="text/event-stream",
+        # Sin caché ni buffering en proxies (nginx) para que cada evento llegue al momento
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    
-    db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
-    
-    return WeeklyPromosKnowledgeResponse(**meta.model_dump(), data=payload)
 
 
-# 9) Contacto adicional (email + familia numerosa)
-class ContactPayload(BaseModel):
-    email: EmailStr = Field(..., description="Correo electrónico")
-    large_family: bool = Field(..., description="¿Tiene familia numerosa? true/false")
+# Readiness: último resultado de la comprobación en segundo plano (sin abrir conexiones)
+@app.get("/ready", tags=["_system"])
+async def ready():
+    status = readiness_monitor.status
+    if status is None:
+        return JSONResponse(status_code=503, content={"ready": False, "reasons": ["starting"]})
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
 
-    class Config:
-        json_schema_extra = {"example": {"email": "ana@example.com", "large_family": True}}
 
+# Health check endpoint for Docker
+@app.get("/health", tags=["_system"])
+async def health_check():
+    """Health check endpoint for Docker container monitoring (usa la comprobación en caché de /ready)"""
+    status = readiness_monitor.status
+    database_ok = status is not None and status["database"]["ok"]
+    result = {
+        "status": "healthy" if database_ok else "unhealthy",
+        "database": "connected" if database_ok else "disconnected",
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+    if status is not None and not database_ok:
+        result["error"] = status["database"]["error"]
+    return result
 
-class ContactResponse(FormResponse):
-    data: ContactPayload
 
+@app.get("/health/pool", tags=["_system"])
+async def pool_status():
+    """Métricas del pool de conexiones (para dimensionar workers frente a max_connections)"""
+    return get_pool_status()
 
-@app.post("/form/contact", response_model=ContactResponse, tags=["09 – Contacto"])
-async def submit_contact(payload: ContactPayload, db: Session = Depends(get_db)):
-    meta = make_meta("contact")
-    data_dict = payload.model_dump()
-    
-    specific_fields = extract_fields_from_data("contact", data_dict)
-    
-    db_submission = FormSubmission(
-        id=meta.id,
-        form=meta.form,
-        received_at=meta.received_at,
-        data=data_dict,
-        **specific_fields
-    )
-    
-    db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
-    
-    return ContactResponse(**meta.model_dump(), data=payload)
 
-
-# Endpoint utilitario para ver (demo) los datos en memoria (no usar en prod)
-class DebugDump(BaseModel):
-    count: int
-    items: dict
+@app.get("/health/replica", tags=["_system"])
+async def replica_status():
+    """Réplica de lectura: dónde van las lecturas de consulta y último retraso medido"""
+    return replica_monitor.stats()
 
 
-@app.get("/debug/dump", response_model=DebugDump, tags=["_debug"])
-async def dump(db: Session = Depends(get_db)):
-    submissions = db.query(FormSubmission).all()
-    items = {}
-    for submission in submissions:
-        items[str(submission.id)] = {
-            "form": submission.form,
-            "data": submission.data,
-            "received_at": submission.received_at.isoformat()
-        }
-    return DebugDump(count=len(submissions), items=items)
+# Métricas Prometheus (METRICS_ENABLED=true); desactivadas no añaden middleware
+@app.get("/metrics", tags=["_system"], include_in_schema=False)
+async def metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Métricas desactivadas (METRICS_ENABLED=false)")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 
-# Health check endpoint for Docker
-@app.get("/health", tags=["_system"])
-async def health_check():
-    """Health check endpoint for Docker container monitoring"""
-    try:
-        # Test database connection
-        from database import engine
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "database": "disconnected",
-            "error": str(e),
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
+if METRICS_ENABLED:
+    endpoint_labels = {route.path: route.path for route in app.routes if "{" not in route.path}
+    endpoint_labels.update({spec.route: spec.name for spec in FORMS})
+    app.add_middleware(MetricsMiddleware, endpoint_labels=endpoint_labels)
 
 
 if __name__ == "__main__":
     import uvicorn
+    # Desarrollo local: crea las tablas que falten antes de arrancar
+    create_tables()
     uvicorn.run(app, host="0.0.0.0", port=8000)
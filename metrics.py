@@ -0,0 +1,185 @@
+"""
+Métricas Prometheus para KCH Forms API (GET /metrics)
+
+- Peticiones y latencia por endpoint (los /form/* se etiquetan con el nombre
+  del formulario), medidas por un middleware ASGI.
+- Tiempo por etapa de cada envío:
+    validate   desde que llega la petición hasta que entra en el handler
+               (lectura del cuerpo, validación Pydantic y dependencias)
+    extract    model_dump y extracción de columnas (FormSpec.extract)
+    insert     INSERT en form_submissions + rollup (o encolado)
+    commit     COMMIT
+    serialize  desde que el handler devuelve hasta que se envían las cabeceras
+- Estado del pool de conexiones y de la cola de ingesta, leído al hacer scrape.
+
+Con METRICS_ENABLED=false (por defecto) no se instala el middleware, los
+cronómetros de etapa no hacen nada y /metrics responde 404.
+
+Con varios workers de gunicorn, definir PROMETHEUS_MULTIPROC_DIR (directorio
+vacío y escribible) para que /metrics sume los contadores de todos los
+procesos. El pool y la cola son los del worker que responde al scrape.
+"""
+
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import REGISTRY, CounterMetricFamily, GaugeMetricFamily
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+REQUESTS = Counter(
+    "kch_requests_total", "Peticiones HTTP por endpoint y código de estado", ("endpoint", "method", "status")
+)
+REQUEST_SECONDS = Histogram(
+    "kch_request_duration_seconds", "Latencia de las peticiones HTTP por endpoint", ("endpoint", "method"),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+STAGE_SECONDS = Histogram(
+    "kch_submission_stage_seconds", "Tiempo de cada etapa de un envío por formulario", ("form", "stage"),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5),
+)
+
+
+class RequestTiming:
+    """Tiempos de la petición en curso (compartidos entre el middleware y el handler)"""
+
+    __slots__ = ("start", "handler_end")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.handler_end: Optional[float] = None
+
+
+_current_request: ContextVar[Optional[RequestTiming]] = ContextVar("kch_request_timing", default=None)
+
+
+class StageClock:
+    """Cronómetro por vueltas: cada lap() registra el tiempo desde la vuelta anterior"""
+
+    __slots__ = ("form", "timing", "last")
+
+    def __init__(self, form: str, timing: Optional[RequestTiming]):
+        self.form = form
+        self.timing = timing
+        self.last = timing.start if timing is not None else time.perf_counter()
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        STAGE_SECONDS.labels(self.form, stage).observe(now - self.last)
+        self.last = now
+
+    def done(self):
+        """Fin del handler: la etapa serialize la cierra el middleware"""
+        if self.timing is not None:
+            self.timing.handler_end = time.perf_counter()
+
+
+class NullClock:
+    __slots__ = ()
+
+    def lap(self, stage: str):
+        pass
+
+    def done(self):
+        pass
+
+
+NULL_CLOCK = NullClock()
+
+
+def stage_clock(form: str):
+    """Cronómetro de etapas para un envío (no hace nada si las métricas están desactivadas)"""
+    if not METRICS_ENABLED:
+        return NULL_CLOCK
+    return StageClock(form, _current_request.get())
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI puro (más barato que BaseHTTPMiddleware): cuenta y mide
+    cada petición y cierra la etapa serialize de los envíos
+    """
+
+    def __init__(self, app, endpoint_labels: Dict[str, str]):
+        self.app = app
+        # Ruta -> etiqueta; las rutas no registradas se agrupan en "other" (cardinalidad acotada)
+        self.endpoint_labels = endpoint_labels
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming(time.perf_counter())
+        token = _current_request.set(timing)
+        status = 500
+        headers_sent_at = None
+
+        async def send_wrapper(message):
+            nonlocal status, headers_sent_at
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers_sent_at = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            endpoint = self.endpoint_labels.get(scope["path"], "other")
+            method = scope["method"]
+            REQUESTS.labels(endpoint, method, str(status)).inc()
+            REQUEST_SECONDS.labels(endpoint, method).observe(time.perf_counter() - timing.start)
+            if timing.handler_end is not None and headers_sent_at is not None:
+                STAGE_SECONDS.labels(endpoint, "serialize").observe(headers_sent_at - timing.handler_end)
+
+
+class RuntimeCollector:
+    """Pool de conexiones y cola de ingesta, leídos en el momento del scrape"""
+
+    def collect(self):
+        from database import get_pool_status
+        from ingestion import submission_queue
+
+        pool = get_pool_status()
+        gauges: Tuple[Tuple[str, str, float], ...] = (
+            ("kch_db_pool_size", "Conexiones persistentes del pool", pool["size"]),
+            ("kch_db_pool_checked_out", "Conexiones del pool en uso", pool["checked_out"]),
+            ("kch_db_pool_overflow", "Conexiones de overflow abiertas", pool["overflow"]),
+            ("kch_db_pool_capacity", "Conexiones máximas del pool", pool["capacity"]),
+            ("kch_db_pool_wait_max_seconds", "Espera máxima por una conexión", pool["wait"]["max_ms"] / 1000),
+            ("kch_ingestion_queue_depth", "Envíos pendientes en la cola de ingesta", submission_queue.depth),
+        )
+        for name, documentation, value in gauges:
+            yield GaugeMetricFamily(name, documentation, value=value)
+        yield CounterMetricFamily(
+            "kch_ingestion_flushed", "Envíos escritos por la cola de ingesta", value=submission_queue.flushed
+        )
+        yield CounterMetricFamily(
+            "kch_ingestion_failed", "Envíos descartados por la cola de ingesta", value=submission_queue.failed
+        )
+
+
+REGISTRY.register(RuntimeCollector())
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Cuerpo y content-type de la respuesta de /metrics"""
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(RuntimeCollector())
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,53 @@
+"""
+Entorno de Alembic para KCH Forms API
+
+La conexión se toma de database.py (DATABASE_URL y componentes POSTGRES_*),
+así que las migraciones usan la misma configuración que la aplicación.
+"""
+
+import logging
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import Base, DATABASE_URL, engine
+
+config = context.config
+
+# Respetar la configuración de logging si ya la hay (p.ej. desde init_database.py)
+if config.config_file_name is not None and not logging.getLogger().handlers:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Genera el SQL de las migraciones sin conectarse (alembic upgrade --sql)"""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Aplica las migraciones sobre la base de datos"""
+    with engine.connect() as connection:
+        # Las copias y reescrituras de tablas enteras no deben cortarse a mitad
+        # aunque DB_MAINTENANCE_STATEMENT_TIMEOUT_MS tenga un límite
+        connection.exec_driver_sql("SET statement_timeout = 0")
+        connection.commit()
+        context.configure(connection=connection, target_metadata=target_metadata)
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,85 @@
+"""Esquema inicial: form_submissions (tabla ancha sin particionar) y rollup de reportes
+
+Refleja el esquema que creaban create_tables() e init_database.py antes de
+usar Alembic. Todas las sentencias son idempotentes, así que las bases de
+datos existentes pueden ejecutar `alembic upgrade head` directamente.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXED_COLUMNS = (
+    "form",
+    "age_range",
+    "customer_name",
+    "document_number",
+    "phone",
+    "discovery_source",
+    "favorite_store",
+    "delivery_type",
+    "weekly_promos_answer",
+    "email",
+    "large_family",
+)
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS form_submissions (
+            id UUID NOT NULL,
+            form VARCHAR(50) NOT NULL,
+            received_at TIMESTAMP WITH TIME ZONE,
+            data JSON NOT NULL,
+            age_range VARCHAR(10),
+            customer_name VARCHAR(255),
+            street VARCHAR(255),
+            number VARCHAR(20),
+            floor VARCHAR(20),
+            door VARCHAR(20),
+            stair VARCHAR(20),
+            document_type VARCHAR(50),
+            document_number VARCHAR(50),
+            phone VARCHAR(50),
+            discovery_source VARCHAR(100),
+            favorite_store VARCHAR(100),
+            delivery_type VARCHAR(100),
+            products_text TEXT,
+            weekly_promos_answer VARCHAR(100),
+            email VARCHAR(255),
+            large_family BOOLEAN,
+            CONSTRAINT form_submissions_pkey PRIMARY KEY (id)
+        )
+    """)
+    for column in INDEXED_COLUMNS:
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_form_submissions_{column} ON form_submissions ({column})")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_form_submissions_received_at_id ON form_submissions (received_at, id)"
+    )
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS form_answer_daily (
+            day DATE NOT NULL,
+            form VARCHAR(50) NOT NULL,
+            dimension VARCHAR(50) NOT NULL,
+            answer VARCHAR(255) NOT NULL,
+            count BIGINT NOT NULL,
+            CONSTRAINT form_answer_daily_pkey PRIMARY KEY (day, form, dimension, answer)
+        )
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS form_answer_daily")
+    op.execute("DROP TABLE IF EXISTS form_submissions")
@@ -0,0 +1,130 @@
+"""Particionar form_submissions por formulario (LIST) con índices por partición
+
+La tabla ancha se renombra a form_submissions_legacy, se crea la tabla
+particionada con una partición por formulario (más DEFAULT), se copian las
+filas y se elimina la tabla antigua. Cada partición solo tiene los índices de
+sus propias columnas, en lugar de los doce índices globales anteriores.
+
+La copia recorre la tabla completa: ejecutar en una ventana de mantenimiento.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 09:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS_DDL = """
+    id UUID NOT NULL,
+    form VARCHAR(50) NOT NULL,
+    received_at TIMESTAMP WITH TIME ZONE,
+    data JSON NOT NULL,
+    age_range VARCHAR(10),
+    customer_name VARCHAR(255),
+    street VARCHAR(255),
+    number VARCHAR(20),
+    floor VARCHAR(20),
+    door VARCHAR(20),
+    stair VARCHAR(20),
+    document_type VARCHAR(50),
+    document_number VARCHAR(50),
+    phone VARCHAR(50),
+    discovery_source VARCHAR(100),
+    favorite_store VARCHAR(100),
+    delivery_type VARCHAR(100),
+    products_text TEXT,
+    weekly_promos_answer VARCHAR(100),
+    email VARCHAR(255),
+    large_family BOOLEAN
+"""
+
+COLUMNS = (
+    "id, form, received_at, data, age_range, customer_name, street, number, floor, door, stair, "
+    "document_type, document_number, phone, discovery_source, favorite_store, delivery_type, "
+    "products_text, weekly_promos_answer, email, large_family"
+)
+
+# Formulario -> columnas indexadas en su partición
+PARTITION_INDEXES = {
+    "age": ("age_range",),
+    "personal-data": ("customer_name",),
+    "identification": ("document_number", "phone"),
+    "discovery": ("discovery_source",),
+    "favorite-store": ("favorite_store",),
+    "delivery-type": ("delivery_type",),
+    "products": (),
+    "weekly-promos-knowledge": ("weekly_promos_answer",),
+    "contact": ("email", "large_family"),
+}
+
+LEGACY_INDEXED_COLUMNS = (
+    "form",
+    "age_range",
+    "customer_name",
+    "document_number",
+    "phone",
+    "discovery_source",
+    "favorite_store",
+    "delivery_type",
+    "weekly_promos_answer",
+    "email",
+    "large_family",
+)
+
+
+def upgrade() -> None:
+    # Los nombres de índices y restricciones son globales al esquema: se liberan
+    # eliminando los índices de la tabla antigua (ya no hacen falta para copiar)
+    op.execute("ALTER TABLE form_submissions RENAME TO form_submissions_legacy")
+    op.execute("ALTER TABLE form_submissions_legacy RENAME CONSTRAINT form_submissions_pkey TO form_submissions_legacy_pkey")
+    for column in LEGACY_INDEXED_COLUMNS:
+        op.execute(f"DROP INDEX IF EXISTS ix_form_submissions_{column}")
+    op.execute("DROP INDEX IF EXISTS ix_form_submissions_received_at_id")
+
+    op.execute(f"""
+        CREATE TABLE form_submissions (
+            {COLUMNS_DDL},
+            CONSTRAINT form_submissions_pkey PRIMARY KEY (id, form)
+        ) PARTITION BY LIST (form)
+    """)
+    op.execute("CREATE INDEX ix_form_submissions_received_at_id ON form_submissions (received_at, id)")
+    for form, columns in PARTITION_INDEXES.items():
+        name = f"form_submissions_{form.replace('-', '_')}"
+        op.execute(f"CREATE TABLE {name} PARTITION OF form_submissions FOR VALUES IN ('{form}')")
+        for column in columns:
+            op.execute(f"CREATE INDEX ix_fs_{form.replace('-', '_')}_{column} ON {name} ({column})")
+    op.execute("CREATE TABLE form_submissions_default PARTITION OF form_submissions DEFAULT")
+
+    op.execute(f"INSERT INTO form_submissions ({COLUMNS}) SELECT {COLUMNS} FROM form_submissions_legacy")
+    op.execute("DROP TABLE form_submissions_legacy")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE form_submissions RENAME TO form_submissions_partitioned")
+    op.execute(
+        "ALTER TABLE form_submissions_partitioned RENAME CONSTRAINT form_submissions_pkey "
+        "TO form_submissions_partitioned_pkey"
+    )
+    op.execute("DROP INDEX ix_form_submissions_received_at_id")
+
+    op.execute(f"""
+        CREATE TABLE form_submissions (
+            {COLUMNS_DDL},
+            CONSTRAINT form_submissions_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute(f"INSERT INTO form_submissions ({COLUMNS}) SELECT {COLUMNS} FROM form_submissions_partitioned")
+    op.execute("DROP TABLE form_submissions_partitioned")
+
+    for column in LEGACY_INDEXED_COLUMNS:
+        op.execute(f"CREATE INDEX ix_form_submissions_{column} ON form_submissions ({column})")
+    op.execute("CREATE INDEX ix_form_submissions_received_at_id ON form_submissions (received_at, id)")
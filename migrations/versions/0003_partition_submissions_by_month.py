@@ -0,0 +1,161 @@
+"""Subparticionar cada formulario por meses (RANGE sobre received_at)
+
+Cada partición de formulario pasa a estar particionada por RANGE (received_at)
+con una subpartición por mes (form_submissions_age_2026_10, ...) y una DEFAULT.
+received_at pasa a ser NOT NULL y forma parte de la clave primaria (requisito
+de Postgres para particionar por esa columna).
+
+Igual que la 0002, la tabla se reconstruye copiando todas las filas: ejecutar
+en una ventana de mantenimiento.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 11:00:00
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS_DDL = """
+    id UUID NOT NULL,
+    form VARCHAR(50) NOT NULL,
+    received_at TIMESTAMP WITH TIME ZONE {received_at_null},
+    data JSON NOT NULL,
+    age_range VARCHAR(10),
+    customer_name VARCHAR(255),
+    street VARCHAR(255),
+    number VARCHAR(20),
+    floor VARCHAR(20),
+    door VARCHAR(20),
+    stair VARCHAR(20),
+    document_type VARCHAR(50),
+    document_number VARCHAR(50),
+    phone VARCHAR(50),
+    discovery_source VARCHAR(100),
+    favorite_store VARCHAR(100),
+    delivery_type VARCHAR(100),
+    products_text TEXT,
+    weekly_promos_answer VARCHAR(100),
+    email VARCHAR(255),
+    large_family BOOLEAN
+"""
+
+COLUMNS = (
+    "id, form, received_at, data, age_range, customer_name, street, number, floor, door, stair, "
+    "document_type, document_number, phone, discovery_source, favorite_store, delivery_type, "
+    "products_text, weekly_promos_answer, email, large_family"
+)
+
+# Formulario -> columnas indexadas en su partición
+PARTITION_INDEXES = {
+    "age": ("age_range",),
+    "personal-data": ("customer_name",),
+    "identification": ("document_number", "phone"),
+    "discovery": ("discovery_source",),
+    "favorite-store": ("favorite_store",),
+    "delivery-type": ("delivery_type",),
+    "products": (),
+    "weekly-promos-knowledge": ("weekly_promos_answer",),
+    "contact": ("email", "large_family"),
+}
+
+# Meses futuros que se crean por adelantado (después, `python partitioning.py ensure`)
+MONTHS_AHEAD = 3
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def form_partition(form: str) -> str:
+    return f"form_submissions_{form.replace('-', '_')}"
+
+
+def rename_to_legacy(suffix: str) -> None:
+    """Libera los nombres de la tabla actual, sus particiones e índices"""
+    op.execute(f"ALTER TABLE form_submissions RENAME TO form_submissions_{suffix}")
+    op.execute(f"ALTER TABLE form_submissions_{suffix} RENAME CONSTRAINT form_submissions_pkey TO form_submissions_{suffix}_pkey")
+    op.execute("DROP INDEX ix_form_submissions_received_at_id")
+    for form, columns in PARTITION_INDEXES.items():
+        op.execute(f"ALTER TABLE {form_partition(form)} RENAME TO {form_partition(form)}_{suffix}")
+        for column in columns:
+            op.execute(f"DROP INDEX IF EXISTS ix_fs_{form.replace('-', '_')}_{column}")
+    op.execute(f"ALTER TABLE form_submissions_default RENAME TO form_submissions_default_{suffix}")
+
+
+def upgrade() -> None:
+    rename_to_legacy("legacy")
+
+    op.execute(f"""
+        CREATE TABLE form_submissions (
+            {COLUMNS_DDL.format(received_at_null="NOT NULL")},
+            CONSTRAINT form_submissions_pkey PRIMARY KEY (id, form, received_at)
+        ) PARTITION BY LIST (form)
+    """)
+    op.execute("CREATE INDEX ix_form_submissions_received_at_id ON form_submissions (received_at, id)")
+
+    # Un mes por cada mes con datos, hasta MONTHS_AHEAD meses después del actual
+    first = op.get_bind().execute(text(
+        "SELECT min(received_at AT TIME ZONE 'UTC')::date FROM form_submissions_legacy"
+    )).scalar()
+    current = date.today().replace(day=1)
+    month = min(first.replace(day=1), current) if first else current
+    months = []
+    while month <= add_months(current, MONTHS_AHEAD):
+        months.append(month)
+        month = add_months(month, 1)
+
+    for form, columns in PARTITION_INDEXES.items():
+        name = form_partition(form)
+        op.execute(
+            f"CREATE TABLE {name} PARTITION OF form_submissions FOR VALUES IN ('{form}') "
+            "PARTITION BY RANGE (received_at)"
+        )
+        op.execute(f"CREATE TABLE {name}_default PARTITION OF {name} DEFAULT")
+        for month in months:
+            op.execute(
+                f"CREATE TABLE {name}_{month:%Y_%m} PARTITION OF {name} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00+00') TO ('{add_months(month, 1):%Y-%m-%d} 00:00+00')"
+            )
+        for column in columns:
+            op.execute(f"CREATE INDEX ix_fs_{form.replace('-', '_')}_{column} ON {name} ({column})")
+    op.execute("CREATE TABLE form_submissions_default PARTITION OF form_submissions DEFAULT")
+
+    # Las filas sin fecha (la columna admitía NULL) toman la fecha de migración
+    op.execute(f"""
+        INSERT INTO form_submissions ({COLUMNS})
+        SELECT {COLUMNS.replace("received_at", "coalesce(received_at, now())")} FROM form_submissions_legacy
+    """)
+    op.execute("DROP TABLE form_submissions_legacy")
+
+
+def downgrade() -> None:
+    rename_to_legacy("monthly")
+
+    op.execute(f"""
+        CREATE TABLE form_submissions (
+            {COLUMNS_DDL.format(received_at_null="")},
+            CONSTRAINT form_submissions_pkey PRIMARY KEY (id, form)
+        ) PARTITION BY LIST (form)
+    """)
+    op.execute("CREATE INDEX ix_form_submissions_received_at_id ON form_submissions (received_at, id)")
+    for form, columns in PARTITION_INDEXES.items():
+        name = form_partition(form)
+        op.execute(f"CREATE TABLE {name} PARTITION OF form_submissions FOR VALUES IN ('{form}')")
+        for column in columns:
+            op.execute(f"CREATE INDEX ix_fs_{form.replace('-', '_')}_{column} ON {name} ({column})")
+    op.execute("CREATE TABLE form_submissions_default PARTITION OF form_submissions DEFAULT")
+
+    op.execute(f"INSERT INTO form_submissions ({COLUMNS}) SELECT {COLUMNS} FROM form_submissions_monthly")
+    op.execute("DROP TABLE form_submissions_monthly")
@@ -0,0 +1,53 @@
+"""Índices de form_submissions según la carga real
+
+Resultado de index_audit.py: los reportes leen el rollup form_answer_daily, así
+que los índices de las respuestas de marketing (columnas de baja cardinalidad
+como large_family) no los usa ninguna consulta y solo encarecen cada INSERT.
+Se eliminan y se añade un índice GIN de texto completo sobre los productos.
+
+Se mantienen: la clave primaria, (received_at, id) para la paginación keyset y
+los índices de búsqueda puntual (email, teléfono, documento, nombre).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16 12:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (formulario, columna) de los índices que se eliminan
+DROPPED_INDEXES = (
+    ("age", "age_range"),
+    ("discovery", "discovery_source"),
+    ("favorite-store", "favorite_store"),
+    ("delivery-type", "delivery_type"),
+    ("weekly-promos-knowledge", "weekly_promos_answer"),
+    ("contact", "large_family"),
+)
+
+PRODUCTS_TSVECTOR = "to_tsvector('spanish', coalesce(products_text, ''))"
+
+
+def upgrade() -> None:
+    for form, column in DROPPED_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS ix_fs_{form.replace('-', '_')}_{column}")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_fs_products_products_fts "
+        f"ON form_submissions_products USING gin ({PRODUCTS_TSVECTOR})"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_fs_products_products_fts")
+    for form, column in DROPPED_INDEXES:
+        partition = f"form_submissions_{form.replace('-', '_')}"
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_fs_{form.replace('-', '_')}_{column} ON {partition} ({column})")
@@ -0,0 +1,40 @@
+"""Índice de búsqueda de productos sin distinguir tildes
+
+Sustituye el índice GIN de texto completo de la 0004 por uno sobre el texto en
+minúsculas y sin tildes (translate, IMMUTABLE), que es la expresión que usa
+/search/products: así "champu" encuentra "Champú".
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OLD_TSVECTOR = "to_tsvector('spanish', coalesce(products_text, ''))"
+NEW_TSVECTOR = (
+    "to_tsvector('spanish', translate(lower(coalesce(products_text, '')), "
+    "'áàâäéèêëíìîïóòôöúùûüç', 'aaaaeeeeiiiioooouuuuc'))"
+)
+
+
+def recreate_index(tsvector: str) -> None:
+    op.execute("DROP INDEX IF EXISTS ix_fs_products_products_fts")
+    op.execute(f"CREATE INDEX ix_fs_products_products_fts ON form_submissions_products USING gin ({tsvector})")
+
+
+def upgrade() -> None:
+    recreate_index(NEW_TSVECTOR)
+
+
+def downgrade() -> None:
+    recreate_index(OLD_TSVECTOR)
@@ -0,0 +1,42 @@
+"""Claves de idempotencia de los envíos (cabecera Idempotency-Key)
+
+Tabla idempotency_keys: una fila por clave usada con el id y received_at del
+envío que creó. La clave primaria evita un segundo INSERT en los reintentos,
+incluso concurrentes o en otro worker (ver idempotency.py).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16 16:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key VARCHAR(255) NOT NULL,
+            form VARCHAR(50) NOT NULL,
+            fingerprint VARCHAR(64) NOT NULL,
+            submission_id UUID NOT NULL,
+            received_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            CONSTRAINT idempotency_keys_pkey PRIMARY KEY (key)
+        )
+    """)
+    # Purga de claves caducadas (python idempotency.py purge)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_idempotency_keys_received_at ON idempotency_keys (received_at)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS idempotency_keys")
@@ -0,0 +1,111 @@
+"""Tablas de dimensión para las respuestas de baja cardinalidad
+
+age_range, discovery_source, favorite_store, delivery_type y
+weekly_promos_answer pasan de texto repetido en cada fila a un id smallint
+que referencia dim_<nombre> (ver dimensions.py). Las variantes de una misma
+respuesta ("Sí", "si") se unifican por su forma canónica y toman como
+etiqueta la variante más frecuente. El rollup de esas dimensiones se
+recalcula para que las variantes queden agregadas.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-16 18:00:00
+
+"""
+import unicodedata
+from collections import Counter
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Dimensión -> (formulario, longitud de la columna VARCHAR original)
+DIMENSIONS = {
+    "age_range": ("age", 10),
+    "discovery_source": ("discovery", 100),
+    "favorite_store": ("favorite-store", 100),
+    "delivery_type": ("delivery-type", 100),
+    "weekly_promos_answer": ("weekly-promos-knowledge", 100),
+}
+
+
+def canonicalize(value: str) -> str:
+    """Copia de dimensions.canonicalize (las migraciones no importan la aplicación)"""
+    decomposed = unicodedata.normalize("NFKD", value.strip()[:100])
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(without_accents.casefold().split())
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    for name, (form, _) in DIMENSIONS.items():
+        op.execute(f"""
+            CREATE TABLE IF NOT EXISTS dim_{name} (
+                id SMALLINT GENERATED BY DEFAULT AS IDENTITY,
+                canonical VARCHAR(100) NOT NULL,
+                label VARCHAR(100) NOT NULL,
+                CONSTRAINT dim_{name}_pkey PRIMARY KEY (id),
+                CONSTRAINT dim_{name}_canonical_key UNIQUE (canonical)
+            )
+        """)
+        op.execute(
+            f"ALTER TABLE form_submissions ADD COLUMN {name}_id SMALLINT "
+            f"CONSTRAINT form_submissions_{name}_id_fkey REFERENCES dim_{name} (id)"
+        )
+
+        # Variantes guardadas -> forma canónica; la etiqueta es la variante más frecuente
+        variants = conn.execute(sa.text(
+            f"SELECT {name}, count(*) FROM form_submissions WHERE form = :form AND {name} IS NOT NULL GROUP BY 1"
+        ), {"form": form}).all()
+        by_canonical = {}
+        for value, n in variants:
+            by_canonical.setdefault(canonicalize(value), Counter())[value] += n
+        for canonical in sorted(by_canonical):
+            label = by_canonical[canonical].most_common(1)[0][0]
+            conn.execute(
+                sa.text(f"INSERT INTO dim_{name} (canonical, label) VALUES (:canonical, :label)"),
+                {"canonical": canonical, "label": label[:100]},
+            )
+
+        mapping = [{"value": value, "canonical": canonicalize(value)} for value, _ in variants]
+        if mapping:
+            op.execute("CREATE TEMPORARY TABLE dim_mapping (value TEXT, canonical TEXT)")
+            conn.execute(sa.text("INSERT INTO dim_mapping (value, canonical) VALUES (:value, :canonical)"), mapping)
+            conn.execute(sa.text(f"""
+                UPDATE form_submissions AS s SET {name}_id = dim.id
+                FROM dim_mapping AS m JOIN dim_{name} AS dim ON dim.canonical = m.canonical
+                WHERE s.form = :form AND s.{name} = m.value
+            """), {"form": form})
+            op.execute("DROP TABLE dim_mapping")
+        op.execute(f"ALTER TABLE form_submissions DROP COLUMN {name}")
+
+        # Rollup de la dimensión con las variantes ya unificadas
+        conn.execute(sa.text("DELETE FROM form_answer_daily WHERE dimension = :dimension"), {"dimension": name})
+        conn.execute(sa.text(f"""
+            INSERT INTO form_answer_daily (day, form, dimension, answer, count)
+            SELECT counts.day, counts.form, :dimension, left(dim.label, 255), counts.n
+            FROM (
+                SELECT (received_at AT TIME ZONE 'UTC')::date AS day, form, {name}_id AS dimension_id, count(*) AS n
+                FROM form_submissions WHERE {name}_id IS NOT NULL GROUP BY 1, 2, 3
+            ) AS counts
+            JOIN dim_{name} AS dim ON dim.id = counts.dimension_id
+        """), {"dimension": name})
+
+
+def downgrade() -> None:
+    for name, (form, length) in DIMENSIONS.items():
+        op.execute(f"ALTER TABLE form_submissions ADD COLUMN {name} VARCHAR({length})")
+        op.execute(f"""
+            UPDATE form_submissions AS s SET {name} = left(dim.label, {length})
+            FROM dim_{name} AS dim
+            WHERE s.form = '{form}' AND s.{name}_id = dim.id
+        """)
+        op.execute(f"ALTER TABLE form_submissions DROP COLUMN {name}_id")
+        op.execute(f"DROP TABLE IF EXISTS dim_{name}")
@@ -0,0 +1,39 @@
+"""data pasa a JSONB y admite NULL
+
+`data` se guarda como JSONB (binario, sin reparsear al consultar y con
+soporte de índices GIN). Admite NULL para el modo DATA_COLUMNS_ONLY, en el
+que los formularios con todos sus campos en columnas no duplican el payload
+(ver payloads.py). El índice GIN es opcional: python payloads.py index
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-16 20:00:00
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE form_submissions ALTER COLUMN data TYPE JSONB USING data::jsonb")
+    op.execute("ALTER TABLE form_submissions ALTER COLUMN data DROP NOT NULL")
+
+
+def downgrade() -> None:
+    missing = op.get_bind().execute(sa.text("SELECT count(*) FROM form_submissions WHERE data IS NULL")).scalar()
+    if missing:
+        raise RuntimeError(
+            f"{missing} filas sin data: ejecuta `python payloads.py backfill` antes de volver a la revisión 0007"
+        )
+    op.execute("DROP INDEX IF EXISTS ix_form_submissions_data")
+    op.execute("ALTER TABLE form_submissions ALTER COLUMN data SET NOT NULL")
+    op.execute("ALTER TABLE form_submissions ALTER COLUMN data TYPE JSON USING data::json")
@@ -0,0 +1,269 @@
+"""
+Particiones de form_submissions para KCH Forms API
+
+form_submissions está particionada en dos niveles:
+  1. LIST (form): una partición por formulario del registro (forms.FORMS) más
+     una partición DEFAULT para valores no previstos. Los índices de las
+     columnas específicas de cada formulario se crean solo en su partición.
+  2. RANGE (received_at): cada partición de formulario se divide por meses
+     (form_submissions_age_2026_10, ...) más una subpartición DEFAULT.
+
+Las particiones mensuales se crean por adelantado y las antiguas se archivan
+(DETACH + exportación a CSV comprimido + DROP) en lugar de borrar filas.
+
+Uso como script de mantenimiento:
+    python partitioning.py ensure [--months-ahead N]
+    python partitioning.py retain [--keep-months N] [--archive-dir DIR] [--dry-run]
+"""
+
+import argparse
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from forms import FORMS
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "form_submissions"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+RETENTION_MONTHS = int(os.getenv("RETENTION_MONTHS", "24"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+
+# Formulario -> columnas indexadas en su partición.
+# Solo búsquedas puntuales: las respuestas de marketing (edad, canal, tienda,
+# envío, promociones, familia numerosa) se consultan desde el rollup
+# form_answer_daily y sus índices no se usaban (ver index_audit.py).
+PARTITION_INDEXES: Dict[str, Tuple[str, ...]] = {
+    "age": (),
+    "personal-data": ("customer_name",),
+    "identification": ("document_number", "phone"),
+    "discovery": (),
+    "favorite-store": (),
+    "delivery-type": (),
+    "products": (),
+    "weekly-promos-knowledge": (),
+    "contact": ("email",),
+}
+
+# Búsqueda de texto completo: minúsculas y sin tildes ("Champú" y "champu"
+# coinciden). translate() es IMMUTABLE, así que sirve en índices (unaccent no).
+UNACCENT_FROM = "áàâäéèêëíìîïóòôöúùûüç"
+UNACCENT_TO = "aaaaeeeeiiiioooouuuuc"
+
+
+def search_tsvector(column: str) -> str:
+    """Expresión tsvector (configuración spanish) de una columna de texto"""
+    return f"to_tsvector('spanish', translate(lower(coalesce({column}, '')), '{UNACCENT_FROM}', '{UNACCENT_TO}'))"
+
+
+# Las consultas deben usar esta misma expresión para que Postgres elija el índice
+PRODUCTS_TSVECTOR = search_tsvector("products_text")
+
+# Formulario -> índices de expresión (sufijo del nombre, definición)
+PARTITION_EXPRESSION_INDEXES: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "products": (("products_fts", f"USING gin ({PRODUCTS_TSVECTOR})"),),
+}
+
+MONTH_SUFFIX = re.compile(r"_(\d{4})_(\d{2})$")
+
+
+def partition_name(form: str) -> str:
+    """Nombre de la partición de un formulario (p.ej. form_submissions_favorite_store)"""
+    return f"{PARENT_TABLE}_{form.replace('-', '_')}"
+
+
+def partition_index_name(form: str, column: str) -> str:
+    """Nombre corto (< 63 caracteres) del índice de una columna en la partición de un formulario"""
+    return f"ix_fs_{form.replace('-', '_')}_{column}"
+
+
+def add_months(month: date, months: int) -> date:
+    """Primer día del mes desplazado `months` meses"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_partition_name(form: str, month: date) -> str:
+    """Nombre de la subpartición mensual (p.ej. form_submissions_age_2026_10)"""
+    return f"{partition_name(form)}_{month:%Y_%m}"
+
+
+def partition_ddl(form: str) -> List[str]:
+    """Sentencias idempotentes que crean la partición de un formulario, sus índices y su DEFAULT mensual"""
+    name = partition_name(form)
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES IN ('{form}') PARTITION BY RANGE (received_at)",
+        f"CREATE TABLE IF NOT EXISTS {name}_default PARTITION OF {name} DEFAULT",
+    ]
+    for column in PARTITION_INDEXES.get(form, ()):
+        statements.append(f"CREATE INDEX IF NOT EXISTS {partition_index_name(form, column)} ON {name} ({column})")
+    for suffix, definition in PARTITION_EXPRESSION_INDEXES.get(form, ()):
+        statements.append(f"CREATE INDEX IF NOT EXISTS {partition_index_name(form, suffix)} ON {name} {definition}")
+    return statements
+
+
+def month_partition_ddl(form: str, month: date) -> str:
+    """Sentencia idempotente que crea la subpartición de un mes (rango [mes, mes siguiente) en UTC)"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {month_partition_name(form, month)} PARTITION OF {partition_name(form)} "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00+00') TO ('{add_months(month, 1):%Y-%m-%d} 00:00+00')"
+    )
+
+
+# Filas de un mes (parámetros de month_bounds)
+IN_MONTH = "received_at >= CAST(:start AS timestamptz) AND received_at < CAST(:end AS timestamptz)"
+
+
+def month_bounds(month: date) -> dict:
+    return {"start": f"{month:%Y-%m-%d} 00:00+00", "end": f"{add_months(month, 1):%Y-%m-%d} 00:00+00"}
+
+
+def move_default_rows(conn, form: str, month: date) -> int:
+    """
+    Crea la subpartición de un mes cuyas filas ya cayeron en la DEFAULT del
+    formulario (p.ej. si `ensure` no se ejecutó a tiempo): desvincula la
+    DEFAULT, crea el mes, traslada sus filas y vuelve a vincularla.
+    Postgres no deja crear la partición mientras la DEFAULT tenga filas de su rango.
+    Devuelve cuántas filas se trasladaron.
+    """
+    name = partition_name(form)
+    default = f"{name}_default"
+    bounds = month_bounds(month)
+    conn.execute(text(f"ALTER TABLE {name} DETACH PARTITION {default}"))
+    conn.execute(text(month_partition_ddl(form, month)))
+    moved = conn.execute(text(f"INSERT INTO {name} SELECT * FROM {default} WHERE {IN_MONTH}"), bounds).rowcount
+    conn.execute(text(f"DELETE FROM {default} WHERE {IN_MONTH}"), bounds)
+    conn.execute(text(f"ALTER TABLE {name} ATTACH PARTITION {default} DEFAULT"))
+    return moved
+
+
+def ensure_month_partition(conn, form: str, month: date):
+    """Crea la subpartición de un mes si falta, trasladando antes las filas que ya estén en la DEFAULT"""
+    name = month_partition_name(form, month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return
+    default = f"{partition_name(form)}_default"
+    has_rows = conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {IN_MONTH})"), month_bounds(month)
+    ).scalar()
+    if not has_rows:
+        conn.execute(text(month_partition_ddl(form, month)))
+        return
+    # Punto de guardado: si el traslado falla, el arranque sigue y las filas se quedan en la DEFAULT
+    try:
+        with conn.begin_nested():
+            moved = move_default_rows(conn, form, month)
+        logger.info(f"📦 {name} creada con {moved} filas trasladadas desde {default}")
+    except Exception:
+        logger.exception(f"No se pudo crear {name}: sus filas siguen en {default}")
+
+
+def ensure_form_partitions(conn, months_ahead: int = PARTITION_MONTHS_AHEAD, today: Optional[date] = None):
+    """
+    Crea lo que falte: partición de cada formulario del registro, sus índices y
+    las subparticiones mensuales desde el mes actual hasta `months_ahead` meses después
+    """
+    current_month = (today or datetime.now(timezone.utc).date()).replace(day=1)
+    for spec in FORMS:
+        for statement in partition_ddl(spec.name):
+            conn.execute(text(statement))
+        for offset in range(months_ahead + 1):
+            ensure_month_partition(conn, spec.name, add_months(current_month, offset))
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+
+
+def list_month_partitions(conn) -> List[Tuple[str, str, date]]:
+    """(partición de formulario, subpartición, mes) de todas las subparticiones mensuales"""
+    rows = conn.execute(text("""
+        SELECT parent.relname, child.relname
+        FROM pg_inherits AS form_level
+        JOIN pg_class AS parent ON parent.oid = form_level.inhrelid
+        JOIN pg_inherits AS month_level ON month_level.inhparent = parent.oid
+        JOIN pg_class AS child ON child.oid = month_level.inhrelid
+        WHERE form_level.inhparent = CAST(:parent AS regclass)
+    """), {"parent": PARENT_TABLE})
+    partitions = []
+    for parent, child in rows:
+        match = MONTH_SUFFIX.search(child)
+        if match:
+            partitions.append((parent, child, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: (partition[2], partition[1]))
+
+
+def archive_partition(conn, parent: str, name: str, archive_dir: str) -> str:
+    """
+    Desvincula una subpartición, exporta sus filas a `<archive_dir>/<name>.csv.gz`
+    y la elimina. Si la exportación falla, la transacción se revierte y la
+    partición sigue en su sitio.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    conn.execute(text(f"ALTER TABLE {parent} DETACH PARTITION {name}"))
+    cursor = conn.connection.dbapi_connection.cursor()
+    with gzip.open(path, "wt", encoding="utf-8") as archive:
+        cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER true)", archive)
+    conn.execute(text(f"DROP TABLE {name}"))
+    return path
+
+
+def apply_retention(
+    engine,
+    keep_months: int = RETENTION_MONTHS,
+    archive_dir: str = ARCHIVE_DIR,
+    dry_run: bool = False,
+    today: Optional[date] = None,
+) -> List[str]:
+    """
+    Archiva las subparticiones mensuales anteriores a los últimos `keep_months`
+    meses. Cada partición se procesa en su propia transacción.
+    """
+    cutoff = add_months((today or datetime.now(timezone.utc).date()).replace(day=1), -keep_months)
+    with engine.connect() as conn:
+        expired = [(parent, name) for parent, name, month in list_month_partitions(conn) if month < cutoff]
+
+    archived = []
+    for parent, name in expired:
+        if dry_run:
+            logger.info(f"[dry-run] Se archivaría {name}")
+            continue
+        with engine.begin() as conn:
+            path = archive_partition(conn, parent, name, archive_dir)
+        logger.info(f"📦 {name} archivada en {path}")
+        archived.append(name)
+    return archived
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    ensure = commands.add_parser("ensure", help="Crear particiones de formularios y meses futuros")
+    ensure.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    retain = commands.add_parser("retain", help="Archivar y eliminar particiones mensuales antiguas")
+    retain.add_argument("--keep-months", type=int, default=RETENTION_MONTHS)
+    retain.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    retain.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    from database import engine
+
+    if args.command == "ensure":
+        with engine.begin() as conn:
+            ensure_form_partitions(conn, months_ahead=args.months_ahead)
+        logger.info("✅ Particiones de form_submissions al día")
+    else:
+        archived = apply_retention(engine, args.keep_months, args.archive_dir, args.dry_run)
+        logger.info(f"✅ Retención aplicada: {len(archived)} particiones archivadas")
+
+
+if __name__ == "__main__":
+    main()
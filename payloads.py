@@ -0,0 +1,147 @@
+"""
+Almacenamiento de la columna data (payload validado) de form_submissions
+
+`data` es JSONB. Casi todos los formularios copian cada campo del payload a
+su propia columna (FormSpec.field_columns), así que `data` duplica la fila.
+Con DATA_COLUMNS_ONLY=true esos formularios guardan data = NULL y el payload
+se reconstruye desde las columnas al leer (exportación, /debug/dump). El de
+productos guarda siempre `data`: products_text no permite recuperar la lista.
+Las respuestas de dimensión se reconstruyen con su etiqueta canónica
+("si" -> "Sí", ver dimensions.py).
+
+Índice GIN opcional sobre data para consultas ad hoc (data @> '{...}'):
+    python payloads.py index [--drop]
+
+Mantenimiento de las filas existentes:
+    python payloads.py strip      # vaciar data en los formularios reconstruibles
+    python payloads.py backfill   # volver a rellenar data desde las columnas
+"""
+
+import argparse
+import logging
+import os
+from typing import Optional
+
+from sqlalchemy import bindparam, select, text, tuple_, update
+
+from database import FormSubmission
+from forms import FORMS, FORMS_BY_NAME
+
+logger = logging.getLogger(__name__)
+
+DATA_COLUMNS_ONLY = os.getenv("DATA_COLUMNS_ONLY", "false").lower() in ("1", "true", "yes")
+DATA_INDEX_NAME = "ix_form_submissions_data"
+BACKFILL_BATCH_SIZE = 1000
+
+# Formularios cuyo payload se puede reconstruir desde las columnas
+COLUMNS_ONLY_FORMS = frozenset(spec.name for spec in FORMS if spec.field_columns is not None)
+
+
+def stored_data(form: str, data: dict) -> Optional[dict]:
+    """Valor de la columna data para un envío nuevo"""
+    if DATA_COLUMNS_ONLY and form in COLUMNS_ONLY_FORMS:
+        return None
+    return data
+
+
+def restore_data(row: dict) -> dict:
+    """
+    Payload de una fila leída con las etiquetas de sus dimensiones
+    (export.EXPORT_SELECT_COLUMNS): `data` si está guardado o, si no, reconstruido
+    """
+    if row["data"] is not None:
+        return row["data"]
+    return FORMS_BY_NAME[row["form"]].rebuild_data(row)
+
+
+def create_data_index(conn, drop: bool = False):
+    """
+    Índice GIN (jsonb_path_ops: solo @>, más pequeño) sobre data. Se crea en la
+    tabla particionada, así que lo heredan todas las particiones, también las futuras.
+    """
+    if drop:
+        conn.execute(text(f"DROP INDEX IF EXISTS {DATA_INDEX_NAME}"))
+    else:
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {DATA_INDEX_NAME} ON form_submissions USING gin (data jsonb_path_ops)"
+        ))
+
+
+def strip_data(conn) -> int:
+    """Vacía data en las filas de los formularios reconstruibles; devuelve cuántas"""
+    result = conn.execute(
+        update(FormSubmission)
+        .where(FormSubmission.form.in_(sorted(COLUMNS_ONLY_FORMS)), FormSubmission.data.isnot(None))
+        .values(data=None)
+    )
+    return result.rowcount
+
+
+def backfill_data(engine, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Rellena data desde las columnas en las filas que no lo tienen, por lotes; devuelve cuántas"""
+    from export import EXPORT_SELECT_COLUMNS, EXPORT_SOURCE
+
+    table = FormSubmission.__table__
+    key = (table.c.received_at, table.c.id, table.c.form)
+    fill = (
+        update(table)
+        .where(
+            table.c.id == bindparam("row_id"),
+            table.c.form == bindparam("row_form"),
+            table.c.received_at == bindparam("row_received_at"),
+        )
+        .values(data=bindparam("row_data", type_=table.c.data.type))
+    )
+    filled, after = 0, None
+    while True:
+        stmt = (
+            select(*EXPORT_SELECT_COLUMNS)
+            .select_from(EXPORT_SOURCE)
+            .where(table.c.data.is_(None))
+            .order_by(*key)
+            .limit(batch_size)
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(*key) > tuple_(*after))
+        with engine.begin() as conn:
+            rows = [dict(row) for row in conn.execute(stmt).mappings()]
+            if rows:
+                conn.execute(fill, [
+                    {"row_id": row["id"], "row_form": row["form"], "row_received_at": row["received_at"],
+                     "row_data": FORMS_BY_NAME[row["form"]].rebuild_data(row)}
+                    for row in rows
+                ])
+        filled += len(rows)
+        if len(rows) < batch_size:
+            return filled
+        after = (rows[-1]["received_at"], rows[-1]["id"], rows[-1]["form"])
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    index = commands.add_parser("index", help="Crear (o eliminar) el índice GIN sobre data")
+    index.add_argument("--drop", action="store_true")
+    commands.add_parser("strip", help="Vaciar data en los formularios reconstruibles desde sus columnas")
+    commands.add_parser("backfill", help="Rellenar data desde las columnas donde falte")
+    args = parser.parse_args()
+
+    from database import engine
+
+    if args.command == "index":
+        with engine.begin() as conn:
+            create_data_index(conn, drop=args.drop)
+        logger.info(f"✅ Índice {DATA_INDEX_NAME} {'eliminado' if args.drop else 'creado'}")
+    elif args.command == "strip":
+        with engine.begin() as conn:
+            stripped = strip_data(conn)
+        # El espacio se recupera tras VACUUM (o VACUUM FULL / pg_repack para devolverlo al sistema)
+        logger.info(f"✅ data vaciado en {stripped} filas ({', '.join(sorted(COLUMNS_ONLY_FORMS))})")
+    else:
+        filled = backfill_data(engine)
+        logger.info(f"✅ data reconstruido en {filled} filas")
+
+
+if __name__ == "__main__":
+    main()
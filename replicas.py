@@ -0,0 +1,139 @@
+"""
+Réplica de lectura para el tráfico de consulta
+
+Las inserciones de /form/* van siempre al primario (get_db). Los endpoints de
+solo lectura (reportes, búsqueda de productos, exportación y /debug/dump) usan
+get_read_db: una sesión en la réplica (READ_DATABASE_URL, con su propio pool)
+mientras esté al día, o en el primario si no lo está.
+
+Una tarea en segundo plano mide el retraso de la réplica cada
+REPLICA_CHECK_INTERVAL segundos (como /ready, las peticiones no lo consultan).
+Si no responde o su retraso supera READ_MAX_LAG_SECONDS, las lecturas vuelven
+al primario hasta la siguiente comprobación correcta. Una lectura puede no ver
+los envíos de los últimos READ_MAX_LAG_SECONDS segundos (más el TTL de la
+caché de reportes).
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+
+from database import AsyncSessionLocal, ReadAsyncSessionLocal, read_async_engine
+
+logger = logging.getLogger(__name__)
+
+READ_MAX_LAG_SECONDS = float(os.getenv("READ_MAX_LAG_SECONDS", "30"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+REPLICA_CHECK_TIMEOUT = float(os.getenv("REPLICA_CHECK_TIMEOUT", "2"))
+
+# Segundos de retraso de la réplica: 0 si ya aplicó todo lo recibido (o si no
+# es una réplica); NULL si todavía no ha aplicado ninguna transacción
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class ReplicaMonitor:
+    """Comprueba en segundo plano si la réplica está al día y elige dónde van las lecturas"""
+
+    def __init__(
+        self,
+        engine=read_async_engine,
+        session_factory=ReadAsyncSessionLocal,
+        max_lag: float = READ_MAX_LAG_SECONDS,
+        interval: float = REPLICA_CHECK_INTERVAL,
+        timeout: float = REPLICA_CHECK_TIMEOUT,
+    ):
+        self.engine = engine
+        self.replica_session_factory = session_factory
+        self.max_lag = max_lag
+        self.interval = interval
+        self.timeout = timeout
+        self.status: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.engine is not None
+
+    @property
+    def usable(self) -> bool:
+        """¿Van las lecturas a la réplica? (no hasta la primera comprobación correcta)"""
+        return self.status is not None and self.status["usable"]
+
+    def session_factory(self):
+        return self.replica_session_factory if self.usable else AsyncSessionLocal
+
+    async def start(self):
+        if not self.enabled:
+            return
+        await self.refresh()
+        self._task = asyncio.create_task(self._run(), name="replica-monitor")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Error comprobando la réplica de lectura")
+
+    async def check_lag(self) -> Tuple[Optional[float], Optional[str]]:
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with self.engine.connect() as conn:
+                    lag = (await conn.execute(REPLICA_LAG_SQL)).scalar()
+            return (None if lag is None else float(lag)), None
+        except Exception as e:
+            return None, str(e) or type(e).__name__
+
+    async def refresh(self) -> dict:
+        lag, error = await self.check_lag()
+        usable = error is None and lag is not None and lag <= self.max_lag
+        if usable != self.usable:
+            if usable:
+                logger.info("Lecturas de consulta en la réplica")
+            else:
+                logger.warning(f"Réplica no disponible (retraso {lag}s, error {error}): lecturas al primario")
+        self.status = {
+            "usable": usable,
+            "lag_s": None if lag is None else round(lag, 3),
+            "max_lag_s": self.max_lag,
+            "error": error,
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+        }
+        return self.status
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "target": "replica" if self.usable else "primary", "status": self.status}
+
+
+# Instancia compartida por la aplicación (un monitor por worker)
+replica_monitor = ReplicaMonitor()
+
+
+async def get_read_db():
+    """
+    Dependency para obtener una sesión asíncrona de solo lectura
+    (réplica si está al día, primario si no)
+    """
+    async with replica_monitor.session_factory()() as db:
+        yield db
@@ -0,0 +1,178 @@
+"""
+Reportes de respuestas de marketing para KCH Forms API
+
+Las consultas leen el rollup diario form_answer_daily (mantenido por
+database.RollupWriter cada pocos segundos), nunca form_submissions.
+
+Uso como script de mantenimiento (recalcula el rollup desde form_submissions):
+    python reports.py rebuild
+"""
+
+import logging
+import sys
+from datetime import date, datetime, timedelta, timezone
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+from sqlalchemy import Date, cast, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import (
+    DIMENSION_TABLES,
+    PRODUCT_DIMENSION,
+    ROLLUP_COLUMNS,
+    TOTAL_DIMENSION,
+    FormAnswerDaily,
+    dimension_id_column,
+    engine,
+)
+from forms import FORMS
+
+logger = logging.getLogger(__name__)
+
+REPORT_DEFAULT_DAYS = 30
+
+
+class ReportBucket(str, Enum):
+    day = "day"
+    week = "week"
+
+
+class ReportDimension(str, Enum):
+    age_range = "age_range"
+    discovery_source = "discovery_source"
+    favorite_store = "favorite_store"
+    delivery_type = "delivery_type"
+    weekly_promos_answer = "weekly_promos_answer"
+    large_family = "large_family"
+    product = PRODUCT_DIMENSION
+
+
+# Dimensión -> formularios de los que depende (etiquetas para invalidar la caché)
+DIMENSION_SOURCE_COLUMNS = {ReportDimension.product: "products_text"}
+DIMENSION_FORMS = {
+    dimension: frozenset(
+        spec.name for spec in FORMS if DIMENSION_SOURCE_COLUMNS.get(dimension, dimension.value) in spec.columns
+    )
+    for dimension in ReportDimension
+}
+ALL_FORMS = frozenset(spec.name for spec in FORMS)
+
+
+class ReportRow(BaseModel):
+    period: date = Field(..., description="Inicio del periodo (día o lunes de la semana)")
+    form: Optional[str] = None
+    answer: Optional[str] = None
+    count: int
+
+
+class ReportResponse(BaseModel):
+    dimension: str
+    bucket: ReportBucket
+    since: date
+    until: date
+    rows: List[ReportRow]
+
+
+def default_range(since: Optional[date], until: Optional[date]) -> tuple:
+    """Rango [since, until] por defecto: los últimos REPORT_DEFAULT_DAYS días (UTC, como el rollup)"""
+    until = until or datetime.now(timezone.utc).date()
+    since = since or until - timedelta(days=REPORT_DEFAULT_DAYS - 1)
+    return since, until
+
+
+def period_column(bucket: ReportBucket):
+    table = FormAnswerDaily.__table__
+    if bucket == ReportBucket.week:
+        return cast(func.date_trunc("week", table.c.day), Date).label("period")
+    return table.c.day.label("period")
+
+
+async def submissions_report(
+    db: AsyncSession, bucket: ReportBucket, since: date, until: date
+) -> List[ReportRow]:
+    """Nº de envíos por periodo y formulario"""
+    table = FormAnswerDaily.__table__
+    period = period_column(bucket)
+    stmt = (
+        select(period, table.c.form, func.sum(table.c.count).label("count"))
+        .where(table.c.dimension == TOTAL_DIMENSION, table.c.day.between(since, until))
+        .group_by(period, table.c.form)
+        .order_by(period, table.c.form)
+    )
+    result = await db.execute(stmt)
+    return [ReportRow(period=row.period, form=row.form, count=row.count) for row in result]
+
+
+async def answers_report(
+    db: AsyncSession, dimension: ReportDimension, bucket: ReportBucket, since: date, until: date
+) -> List[ReportRow]:
+    """Nº de envíos por periodo y respuesta para una dimensión"""
+    table = FormAnswerDaily.__table__
+    period = period_column(bucket)
+    stmt = (
+        select(period, table.c.answer, func.sum(table.c.count).label("count"))
+        .where(table.c.dimension == dimension.value, table.c.day.between(since, until))
+        .group_by(period, table.c.answer)
+        .order_by(period, func.sum(table.c.count).desc(), table.c.answer)
+    )
+    result = await db.execute(stmt)
+    return [ReportRow(period=row.period, answer=row.answer, count=row.count) for row in result]
+
+
+def rebuild_rollups(conn):
+    """
+    Recalcula form_answer_daily desde form_submissions (backfill o corrección).
+    Recorre la tabla completa: pensado para mantenimiento, no para el camino caliente.
+    """
+    day = "(received_at AT TIME ZONE 'UTC')::date"
+    conn.execute(text("TRUNCATE form_answer_daily"))
+    conn.execute(text(f"""
+        INSERT INTO form_answer_daily (day, form, dimension, answer, count)
+        SELECT {day}, form, :dimension, '', count(*)
+        FROM form_submissions GROUP BY 1, 2
+    """), {"dimension": TOTAL_DIMENSION})
+    for column in ROLLUP_COLUMNS:
+        if column in DIMENSION_TABLES:
+            # Agregación por el id (smallint) y etiqueta de la dimensión al final
+            id_column = dimension_id_column(column)
+            conn.execute(text(f"""
+                INSERT INTO form_answer_daily (day, form, dimension, answer, count)
+                SELECT counts.day, counts.form, :dimension, left(dim.label, 255), counts.n
+                FROM (
+                    SELECT {day} AS day, form, {id_column} AS dimension_id, count(*) AS n
+                    FROM form_submissions WHERE {id_column} IS NOT NULL GROUP BY 1, 2, 3
+                ) AS counts
+                JOIN {DIMENSION_TABLES[column].name} AS dim ON dim.id = counts.dimension_id
+            """), {"dimension": column})
+            continue
+        conn.execute(text(f"""
+            INSERT INTO form_answer_daily (day, form, dimension, answer, count)
+            SELECT {day}, form, :dimension, left({column}::text, 255), count(*)
+            FROM form_submissions WHERE {column} IS NOT NULL GROUP BY 1, 2, 4
+        """), {"dimension": column})
+    conn.execute(text(f"""
+        INSERT INTO form_answer_daily (day, form, dimension, answer, count)
+        SELECT day, form, :dimension, product, count(*)
+        FROM (
+            SELECT DISTINCT id, {day} AS day, form, left(product, 255) AS product
+            FROM form_submissions, jsonb_array_elements_text(data -> 'products') AS product
+            WHERE form = 'products'
+        ) AS products
+        GROUP BY 1, 2, 4
+    """), {"dimension": PRODUCT_DIMENSION})
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if sys.argv[1:] != ["rebuild"]:
+        print(__doc__)
+        sys.exit(2)
+    with engine.begin() as conn:
+        rebuild_rollups(conn)
+    logger.info("✅ Rollup form_answer_daily recalculado")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Búsqueda de productos para KCH Forms API
+
+Texto completo (configuración spanish, sin distinguir tildes ni mayúsculas)
+sobre form_submissions.products_text, con el índice GIN de la partición de
+productos (ix_fs_products_products_fts). Cada palabra de la búsqueda se trata
+como prefijo: "ser" encuentra "Serum" y "champu" encuentra "Champú".
+
+La frecuencia de cada producto se lee del rollup form_answer_daily
+(dimensión "product"), no de form_submissions.
+"""
+
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List
+from uuid import UUID
+
+from pydantic import BaseModel
+from sqlalchemy import DateTime, Float, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import PRODUCT_DIMENSION
+from partitioning import PRODUCTS_TSVECTOR, UNACCENT_FROM, UNACCENT_TO, search_tsvector
+
+SEARCH_DEFAULT_LIMIT = 20
+
+UNACCENT = str.maketrans(UNACCENT_FROM, UNACCENT_TO)
+WORD = re.compile(r"\w+")
+
+# Etiqueta para invalidar la caché: solo depende del formulario de productos
+SEARCH_FORMS = frozenset({"products"})
+
+
+class ProductMatch(BaseModel):
+    id: UUID
+    received_at: datetime
+    products: List[str]
+    rank: float
+
+
+class ProductCount(BaseModel):
+    product: str
+    count: int
+
+
+class ProductSearchResponse(BaseModel):
+    query: str
+    since: date
+    until: date
+    results: List[ProductMatch]
+    products: List[ProductCount]
+
+
+def to_tsquery_text(query: str) -> str:
+    """
+    Convierte la búsqueda del usuario en una tsquery con prefijos
+    ("Champú serum" -> "champu:* & serum:*"). Lanza ValueError si no hay palabras.
+    """
+    words = WORD.findall(query.lower().translate(UNACCENT))
+    if not words:
+        raise ValueError(f"Búsqueda sin palabras: {query!r}")
+    return " & ".join(f"{word}:*" for word in words)
+
+
+def day_bounds(since: date, until: date) -> tuple:
+    """Rango [since 00:00, until+1 00:00) en UTC para filtrar received_at"""
+    start = datetime.combine(since, time.min, tzinfo=timezone.utc)
+    end = datetime.combine(until + timedelta(days=1), time.min, tzinfo=timezone.utc)
+    return start, end
+
+
+async def search_products(
+    db: AsyncSession, tsquery: str, since: date, until: date, limit: int = SEARCH_DEFAULT_LIMIT
+) -> List[ProductMatch]:
+    """Envíos del formulario de productos que coinciden, ordenados por relevancia"""
+    start, end = day_bounds(since, until)
+    # La expresión va literal (no como parámetro) para que coincida con la del índice
+    stmt = text(f"""
+        SELECT id, received_at, data -> 'products' AS products,
+               ts_rank({PRODUCTS_TSVECTOR}, to_tsquery('spanish', :tsquery)) AS rank
+        FROM form_submissions
+        WHERE form = 'products'
+          AND received_at >= :start AND received_at < :end
+          AND {PRODUCTS_TSVECTOR} @@ to_tsquery('spanish', :tsquery)
+        ORDER BY rank DESC, received_at DESC
+        LIMIT :limit
+    """).columns(id=PG_UUID(as_uuid=True), received_at=DateTime(timezone=True), products=JSONB, rank=Float)
+    result = await db.execute(stmt, {"tsquery": tsquery, "start": start, "end": end, "limit": limit})
+    return [ProductMatch(**row) for row in result.mappings()]
+
+
+async def product_counts(
+    db: AsyncSession, tsquery: str, since: date, until: date, limit: int = SEARCH_DEFAULT_LIMIT
+) -> List[ProductCount]:
+    """Productos que coinciden con la búsqueda y nº de envíos que los incluyen"""
+    stmt = text(f"""
+        SELECT answer AS product, sum(count) AS count
+        FROM form_answer_daily
+        WHERE dimension = :dimension
+          AND day BETWEEN :since AND :until
+          AND {search_tsvector("answer")} @@ to_tsquery('spanish', :tsquery)
+        GROUP BY answer
+        ORDER BY count DESC, answer
+        LIMIT :limit
+    """)
+    result = await db.execute(stmt, {
+        "dimension": PRODUCT_DIMENSION, "since": since, "until": until, "tsquery": tsquery, "limit": limit,
+    })
+    return [ProductCount(product=row.product, count=row.count) for row in result]
@@ -14,10 +14,24 @@ done
 
 echo "✅ PostgreSQL is ready!"
 
-# Initialize database tables
-echo "🔧 Initializing database tables..."
-python init_database.py || echo "⚠️  Database initialization failed or already exists"
+# Apply migrations once, before starting the workers (they don't touch the schema)
+# Full setup (backfill + table check): run `python init_database.py` by hand
+echo "🔧 Applying database migrations..."
+python init_database.py --boot
 
 # Start the FastAPI application
-echo "🎯 Starting FastAPI server..."
-exec uvicorn main:app --host 0.0.0.0 --port 8000 --reload
+# APP_PROFILE=dev: un solo proceso con recarga automática al cambiar el código
+# APP_PROFILE=production (por defecto): gunicorn con varios workers de uvicorn (gunicorn.conf.py)
+APP_PROFILE=${APP_PROFILE:-production}
+if [ "$APP_PROFILE" = "dev" ]; then
+    echo "🎯 Starting FastAPI server (dev, --reload)..."
+    exec uvicorn main:app --host 0.0.0.0 --port ${PORT:-8000} --reload
+fi
+
+# Prometheus multiprocess mode: the directory must be empty when the workers start
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+echo "🎯 Starting FastAPI server (production, gunicorn)..."
+exec gunicorn -c gunicorn.conf.py main:app
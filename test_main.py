@@ -1,19 +1,79 @@
+import asyncio
+import csv
+import gzip
+import os
+import io
+import httpx
 import pytest
 from fastapi.testclient import TestClient
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
+from uuid import RFC_4122, UUID
 import json
 
-from main import app, DB
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from prometheus_client import REGISTRY
+
+# Métricas y contadores en vivo se activan antes de importar la app (se leen al importar)
+os.environ.setdefault("METRICS_ENABLED", "true")
+os.environ.setdefault("LIVE_COUNTERS_ENABLED", "true")
+
+from main import app, make_meta
+from database import ASYNC_DATABASE_URL, AsyncSessionLocal, create_tables, engine, DIMENSION_COLUMNS, FormAnswerDaily, FormSubmission, IdempotencyKey, insert_submissions, rollup_writer
+from reports import default_range, rebuild_rollups
+from cache import TTLCache, report_cache
+from forms import FORMS, FORMS_BY_NAME
+from index_audit import run_audit
+from search import PRODUCTS_TSVECTOR
+from partitioning import apply_retention, ensure_form_partitions, month_partition_ddl, month_partition_name, partition_name
+from ingestion import QueueFullError, SubmissionQueue
+from health import evaluate, readiness_monitor
+from idempotency import idempotency_cache, purge_expired
+from dimensions import canonicalize, dimension_cache
+from ids import uuid7, uuid7_time_ms
+import payloads
+from payloads import COLUMNS_ONLY_FORMS, backfill_data, create_data_index, strip_data
+from replicas import replica_monitor
+from live import LiveCounters, live_counters, notify_payloads
+import main
 
 client = TestClient(app)
 
 
+def count_submissions() -> int:
+    """Número de filas guardadas en form_submissions"""
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(FormSubmission)).scalar_one()
+
+
+def flush_rollups():
+    """Escribe en form_answer_daily los incrementos acumulados (sin esperar al intervalo)"""
+    client.portal.call(rollup_writer.flush)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def app_lifespan():
+    """Un único event loop para toda la sesión (el pool asyncpg queda ligado a él)"""
+    create_tables()
+    with client:
+        yield
+
+
 @pytest.fixture(autouse=True)
 def clear_db():
-    """Limpia la base de datos en memoria antes de cada test"""
-    DB.clear()
+    """Vacía la tabla form_submissions antes y después de cada test"""
+    with engine.begin() as conn:
+        conn.execute(delete(FormSubmission))
+        conn.execute(delete(FormAnswerDaily))
+        conn.execute(delete(IdempotencyKey))
+    rollup_writer.pending.clear()
+    report_cache.clear()
+    idempotency_cache.clear()
     yield
-    DB.clear()
+    with engine.begin() as conn:
+        conn.execute(delete(FormSubmission))
+        conn.execute(delete(FormAnswerDaily))
+        conn.execute(delete(IdempotencyKey))
 
 
 class TestAgeEndpoint:
@@ -30,8 +90,9 @@ class TestAgeEndpoint:
         assert "received_at" in data
         
         # Verificar que se guardó en DB
-        assert len(DB) == 1
-        assert list(DB.values())[0]["form"] == "age"
+        assert count_submissions() == 1
+        with engine.connect() as conn:
+            assert conn.execute(select(FormSubmission.form)).scalar_one() == "age"
     
     def test_submit_age_all_options(self):
         """Test todas las opciones válidas de edad"""
@@ -102,6 +163,14 @@ class TestPersonalDataEndpoint:
         
         response = client.post("/form/personal-data", json=payload)
         assert response.status_code == 422
+
+    def test_submit_personal_data_too_long(self):
+        """Valores más largos que su columna se rechazan antes de llegar a la base de datos"""
+        payload = {"name": "x" * 256, "street": "Calle Mayor", "number": "456"}
+        assert client.post("/form/personal-data", json=payload).status_code == 422
+        payload = {"name": "Ana", "street": "Calle Mayor", "number": "1" * 21}
+        assert client.post("/form/personal-data", json=payload).status_code == 422
+        assert count_submissions() == 0
     
     def test_submit_personal_data_whitespace_trimming(self):
         """Test que se eliminan espacios en blanco"""
@@ -343,6 +412,995 @@ class TestDebugEndpoint:
         assert len(data["items"]) == 2
 
 
+class TestFormRegistry:
+    """Tests para el registro declarativo de formularios"""
+
+    def test_every_form_has_an_endpoint(self):
+        schema = client.get("/openapi.json").json()
+        for spec in FORMS:
+            assert spec.route in schema["paths"]
+            assert "post" in schema["paths"][spec.route]
+
+    def test_extractors(self):
+        assert FORMS_BY_NAME["age"].extract({"age": "45+"}) == {"age_range": "45+"}
+        assert FORMS_BY_NAME["products"].extract({"products": ["Champú", "Serum"]}) == {
+            "products_text": "Champú, Serum"
+        }
+        assert FORMS_BY_NAME["contact"].extract({"email": "a@b.com", "large_family": False}) == {
+            "email": "a@b.com",
+            "large_family": False,
+        }
+
+    def test_columns_are_stored(self):
+        client.post("/form/personal-data", json={"name": "Ana", "street": "Gran Vía", "number": "1"})
+        with engine.connect() as conn:
+            row = conn.execute(select(FormSubmission.customer_name, FormSubmission.floor)).one()
+        assert row == ("Ana", None)
+
+
+class TestPartitioning:
+    """Tests para el particionado de form_submissions por formulario"""
+
+    def test_rows_land_in_their_form_partition(self):
+        client.post("/form/age", json={"age": "25-35"})
+        client.post("/form/contact", json={"email": "ana@example.com", "large_family": False})
+        with engine.connect() as conn:
+            rows = conn.execute(text("SELECT form, tableoid::regclass::text FROM form_submissions ORDER BY form")).all()
+        month = datetime.now(timezone.utc).date().replace(day=1)
+        assert rows == [("age", month_partition_name("age", month)), ("contact", month_partition_name("contact", month))]
+
+    def test_every_form_has_a_partition(self):
+        with engine.connect() as conn:
+            partitions = set(conn.execute(text(
+                "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'form_submissions'::regclass"
+            )).scalars())
+        assert {partition_name(spec.name) for spec in FORMS} <= partitions
+
+    def test_ensure_moves_rows_out_of_the_default_partition(self):
+        """Un mes sin partición cuyas filas ya están en la DEFAULT no impide crearla"""
+        month = date(2099, 1, 1)
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "INSERT INTO form_submissions (id, form, received_at, data) "
+                    "VALUES (gen_random_uuid(), 'age', '2099-01-15T12:00:00Z', '{\"age\": \"25-35\"}')"
+                ))
+            with engine.begin() as conn:
+                ensure_form_partitions(conn, months_ahead=0, today=month)
+            with engine.connect() as conn:
+                location = conn.execute(text("SELECT tableoid::regclass::text FROM form_submissions")).scalar_one()
+            assert location == month_partition_name("age", month)
+        finally:
+            with engine.begin() as conn:
+                conn.execute(delete(FormSubmission))
+                for spec in FORMS:
+                    conn.execute(text(f"DROP TABLE IF EXISTS {month_partition_name(spec.name, month)}"))
+
+    def test_retention_archives_old_months(self, tmp_path):
+        old_month = date(2000, 1, 1)
+        with engine.begin() as conn:
+            conn.execute(text(month_partition_ddl("age", old_month)))
+            conn.execute(text(
+                "INSERT INTO form_submissions (id, form, received_at, data) "
+                "VALUES (gen_random_uuid(), 'age', '2000-01-15T12:00:00Z', '{\"age\": \"25-35\"}')"
+            ))
+        client.post("/form/age", json={"age": "25-35"})
+
+        archived = apply_retention(engine, keep_months=1, archive_dir=str(tmp_path))
+
+        assert archived == [month_partition_name("age", old_month)]
+        with gzip.open(tmp_path / f"{archived[0]}.csv.gz", "rt") as archive:
+            rows = list(csv.DictReader(archive))
+        assert [json.loads(row["data"]) for row in rows] == [{"age": "25-35"}]
+        assert count_submissions() == 1
+
+
+class TestIndexAudit:
+    """Tests para la auditoría de índices (index_audit.py)"""
+
+    def test_audit_reports_partition_indexes(self):
+        client.post("/form/contact", json={"email": "ana@example.com", "large_family": False})
+        report = run_audit(engine, repeat=1)
+
+        indexes = {index["index"]: index for index in report["indexes"]}
+        assert {"form_submissions_pkey", "ix_form_submissions_received_at_id", "ix_fs_contact_email"} <= set(indexes)
+        assert "ix_fs_contact_large_family" not in indexes
+        assert indexes["ix_fs_contact_email"]["partitions"] >= 2
+        assert not indexes["form_submissions_pkey"]["drop_candidate"]
+        assert set(report["queries"]) == {
+            "export_keyset", "dump_by_form", "lookup_email", "lookup_phone",
+            "lookup_document", "lookup_customer_name", "products_search",
+        }
+
+
+class TestBatchEndpoint:
+    """Tests para /form/batch y su variante NDJSON"""
+
+    def test_batch_all_valid(self):
+        items = [
+            {"form": "age", "data": {"age": "25-35"}},
+            {"form": "favorite-store", "data": {"store": "KCH Centro"}},
+            {"form": "products", "data": {"products": ["Champú", "Serum"]}},
+            {"form": "contact", "data": {"email": "ana@example.com", "large_family": True}},
+        ]
+        response = client.post("/form/batch", json={"items": items})
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["accepted"] == 4
+        assert data["rejected"] == 0
+        assert [result["form"] for result in data["results"]] == ["age", "favorite-store", "products", "contact"]
+        assert all(result["id"] and result["errors"] is None for result in data["results"])
+        assert count_submissions() == 4
+
+    def test_batch_partial_errors(self):
+        items = [
+            {"form": "age", "data": {"age": "invalid-age"}},
+            {"form": "discovery", "data": {"source": "Instagram"}},
+            {"form": "nonexistent", "data": {}},
+        ]
+        response = client.post("/form/batch", json={"items": items})
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["accepted"] == 1
+        assert data["rejected"] == 2
+        assert data["results"][0]["id"] is None
+        assert data["results"][0]["errors"][0]["loc"] == ["data", "age"]
+        assert data["results"][1]["id"] is not None
+        assert data["results"][2]["errors"][0]["loc"] == ["form"]
+        assert count_submissions() == 1
+
+    def test_batch_empty(self):
+        response = client.post("/form/batch", json={"items": []})
+        assert response.status_code == 422
+
+    def test_batch_ndjson(self):
+        lines = [
+            json.dumps({"form": "age", "data": {"age": "45+"}}),
+            "not json",
+            json.dumps({"form": "weekly-promos-knowledge", "data": {"answer": "Sí"}}),
+            "",
+        ]
+        response = client.post(
+            "/form/batch/ndjson",
+            content="\n".join(lines).encode(),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["accepted"] == 2
+        assert data["rejected"] == 1
+        assert data["results"][1]["errors"][0]["type"] == "json_invalid"
+        assert count_submissions() == 2
+
+    def test_batch_ndjson_non_string_form(self):
+        lines = [json.dumps({"form": [], "data": {}}), json.dumps({"form": "age", "data": {"age": "45+"}})]
+        response = client.post(
+            "/form/batch/ndjson",
+            content="\n".join(lines).encode(),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["accepted"] == 1
+        assert data["results"][0]["errors"][0]["loc"] == ["form"]
+        assert count_submissions() == 1
+
+    def test_batch_ndjson_too_many_lines(self):
+        line = json.dumps({"form": "age", "data": {"age": "45+"}})
+        response = client.post(
+            "/form/batch/ndjson",
+            content="\n".join([line] * (main.BATCH_MAX_ITEMS + 1)).encode(),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 422
+        assert count_submissions() == 0
+
+
+class TestDimensions:
+    """Tests para las tablas de dimensión de las respuestas de baja cardinalidad"""
+
+    def test_canonicalize(self):
+        assert canonicalize("Sí") == canonicalize(" si ") == canonicalize("SI") == "si"
+        assert canonicalize("KCH  Centro") == "kch centro"
+        assert canonicalize("Envío estándar") == "envio estandar"
+
+    def test_variants_share_one_answer(self):
+        """"Sí", "si" y "SI " se guardan con el mismo id y se agregan juntas"""
+        for answer in ["Sí", "si", "SI "]:
+            assert client.post("/form/weekly-promos-knowledge", json={"answer": answer}).status_code == 200
+
+        with engine.connect() as conn:
+            ids = set(conn.execute(select(FormSubmission.weekly_promos_answer_id)).scalars())
+        assert len(ids) == 1
+
+        flush_rollups()
+        rows = client.get("/reports/answers/weekly_promos_answer").json()["rows"]
+        assert len(rows) == 1 and rows[0]["count"] == 3
+        assert canonicalize(rows[0]["answer"]) == "si"
+
+    def test_rows_store_smallint_ids(self):
+        """La fila guarda el id de la dimensión; la exportación muestra la etiqueta"""
+        client.post("/form/delivery-type", json={"service_type": "Recogida en tienda"})
+        with engine.connect() as conn:
+            dimension_id, label = conn.execute(text(
+                "SELECT s.delivery_type_id, d.label FROM form_submissions s "
+                "JOIN dim_delivery_type d ON d.id = s.delivery_type_id"
+            )).one()
+        assert isinstance(dimension_id, int)
+        assert canonicalize(label) == "recogida en tienda"
+
+        line = json.loads(client.get("/export/submissions").text.splitlines()[0])
+        assert line["delivery_type"] == label
+        assert "delivery_type_id" not in line
+
+    def test_cold_cache_reuses_existing_ids(self):
+        """Sin la caché en memoria (otro worker) los valores existentes no se duplican"""
+        client.post("/form/favorite-store", json={"store": "KCH Sur"})
+        dimension_cache.clear()
+        client.post("/form/favorite-store", json={"store": "kch sur"})
+        with engine.connect() as conn:
+            ids = conn.execute(select(FormSubmission.favorite_store_id)).scalars().all()
+            dimension_rows = conn.execute(
+                text("SELECT count(*) FROM dim_favorite_store WHERE canonical = 'kch sur'")
+            ).scalar_one()
+        assert len(ids) == 2 and len(set(ids)) == 1
+        assert dimension_rows == 1
+
+
+class TestSubmissionIds:
+    """Tests para los ids UUIDv7 de los envíos"""
+
+    def test_ids_are_time_ordered_uuid7(self):
+        """Los ids son UUIDv7, crecientes y con el instante de received_at"""
+        ids = [uuid7() for _ in range(5000)]
+        assert ids == sorted(ids)
+        assert len(set(ids)) == len(ids)
+        assert all(value.version == 7 and value.variant == RFC_4122 for value in ids)
+
+        received_at = datetime(2026, 10, 16, 12, 0, 0, 123999, tzinfo=timezone.utc)
+        assert uuid7_time_ms(uuid7(received_at)) == int(received_at.timestamp()) * 1000 + 123
+
+    def test_submission_id_matches_received_at(self):
+        """El id devuelto por el endpoint codifica su received_at y se guarda tal cual"""
+        data = client.post("/form/age", json={"age": "25-35"}).json()
+        submission_id = UUID(data["id"])
+        received_at = datetime.fromisoformat(data["received_at"].replace("Z", "+00:00"))
+        assert submission_id.version == 7
+        assert uuid7_time_ms(submission_id) == int(received_at.timestamp()) * 1000 + received_at.microsecond // 1000
+        with engine.connect() as conn:
+            assert conn.execute(select(FormSubmission.id)).scalar_one() == submission_id
+
+
+class TestIdempotency:
+    """Tests para la cabecera Idempotency-Key de los endpoints /form/*"""
+
+    def test_retry_returns_original_response(self):
+        """Un reintento con la misma clave devuelve el envío original sin insertar otro"""
+        headers = {"Idempotency-Key": "retry-1"}
+        first = client.post("/form/favorite-store", json={"store": "KCH Centro"}, headers=headers)
+        retry = client.post("/form/favorite-store", json={"store": "KCH Centro"}, headers=headers)
+        assert first.status_code == retry.status_code == 200
+        assert retry.json() == first.json()
+        assert "idempotent-replayed" not in first.headers
+        assert retry.headers["idempotent-replayed"] == "true"
+        assert count_submissions() == 1
+
+    def test_retry_on_another_worker(self):
+        """Sin la caché en memoria (otro worker), la clave se resuelve en la base de datos"""
+        headers = {"Idempotency-Key": "retry-2"}
+        first = client.post("/form/products", json={"products": ["Champú", "Serum"]}, headers=headers)
+        idempotency_cache.clear()
+        retry = client.post("/form/products", json={"products": ["Champú", "Serum"]}, headers=headers)
+        assert retry.json() == first.json()
+        assert count_submissions() == 1
+
+    def test_concurrent_retries_insert_once(self):
+        """Peticiones simultáneas con la misma clave: un único envío, todas con el mismo id"""
+        async def send_all():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+                return await asyncio.gather(*(
+                    async_client.post("/form/age", json={"age": "25-35"}, headers={"Idempotency-Key": "burst"})
+                    for _ in range(5)
+                ))
+
+        responses = client.portal.call(send_all)
+        assert all(response.status_code == 200 for response in responses)
+        assert len({response.json()["id"] for response in responses}) == 1
+        assert count_submissions() == 1
+
+    def test_key_reused_with_other_payload(self):
+        """Reutilizar la clave con otro contenido u otro formulario es un error"""
+        headers = {"Idempotency-Key": "reused"}
+        assert client.post("/form/age", json={"age": "25-35"}, headers=headers).status_code == 200
+        assert client.post("/form/age", json={"age": "45+"}, headers=headers).status_code == 422
+        assert client.post("/form/discovery", json={"source": "Google"}, headers=headers).status_code == 422
+        assert count_submissions() == 1
+
+    def test_queue_mode_writes_keyed_submissions_directly(self, monkeypatch):
+        """Con la cola activa, un envío con clave se guarda en la transacción de la clave, no en la cola"""
+        monkeypatch.setattr(main, "INGESTION_QUEUE_ENABLED", True)
+        # La cola de la app no está arrancada: lo que llegue a ella se rechaza con 503
+        assert client.post("/form/age", json={"age": "25-35"}).status_code == 503
+
+        headers = {"Idempotency-Key": "queued"}
+        first = client.post("/form/age", json={"age": "25-35"}, headers=headers)
+        assert first.status_code == 200
+        assert count_submissions() == 1
+        with engine.connect() as conn:
+            stored = conn.execute(select(IdempotencyKey.submission_id)).scalar_one()
+        assert str(stored) == first.json()["id"]
+
+    def test_without_key_each_post_is_stored(self):
+        """Sin cabecera el comportamiento no cambia: cada POST es un envío"""
+        client.post("/form/age", json={"age": "25-35"})
+        client.post("/form/age", json={"age": "25-35"})
+        assert count_submissions() == 2
+
+    def test_invalid_key(self):
+        """Una clave vacía o demasiado larga se rechaza"""
+        too_long = {"Idempotency-Key": "x" * 256}
+        assert client.post("/form/age", json={"age": "25-35"}, headers=too_long).status_code == 422
+        assert client.post("/form/age", json={"age": "25-35"}, headers={"Idempotency-Key": ""}).status_code == 422
+        assert count_submissions() == 0
+
+    def test_purge_expired_keys(self):
+        """Las claves caducadas se purgan y la clave vuelve a quedar libre"""
+        headers = {"Idempotency-Key": "old"}
+        client.post("/form/age", json={"age": "25-35"}, headers=headers)
+        assert purge_expired(engine, hours=24) == 0
+        assert purge_expired(engine, hours=0, now=datetime.now(timezone.utc) + timedelta(seconds=1)) == 1
+        idempotency_cache.clear()
+        client.post("/form/age", json={"age": "25-35"}, headers=headers)
+        assert count_submissions() == 2
+
+
+class TestPayloadStorage:
+    """Tests para la columna data (JSONB) y el modo DATA_COLUMNS_ONLY"""
+
+    def post_examples(self):
+        examples = {}
+        for spec in FORMS:
+            example = spec.payload_model.model_config["json_schema_extra"]["example"]
+            assert client.post(spec.route, json=example).status_code == 200
+            examples[spec.name] = example
+        return examples
+
+    def assert_exported_data(self, examples):
+        """Cada envío exportado trae su payload (las dimensiones, con su etiqueta canónica)"""
+        exported = [json.loads(line) for line in client.get("/export/submissions").text.splitlines()]
+        assert len(exported) == len(examples)
+        for line in exported:
+            spec, data = FORMS_BY_NAME[line["form"]], line["data"]
+            assert data.keys() == examples[line["form"]].keys()
+            for name, value in examples[line["form"]].items():
+                if spec.field_columns is not None and spec.field_columns[name] in DIMENSION_COLUMNS:
+                    assert canonicalize(data[name]) == canonicalize(value)
+                else:
+                    assert data[name] == value
+
+    def test_columns_only_mode(self, monkeypatch):
+        """Los formularios reconstruibles guardan data = NULL y se leen igual"""
+        monkeypatch.setattr(payloads, "DATA_COLUMNS_ONLY", True)
+        examples = self.post_examples()
+        with engine.connect() as conn:
+            stored = dict(conn.execute(select(FormSubmission.form, FormSubmission.data)).all())
+        assert {form for form, data in stored.items() if data is None} == COLUMNS_ONLY_FORMS
+        assert stored["products"] == examples["products"]
+        self.assert_exported_data(examples)
+
+        dump = client.get("/debug/dump").json()
+        assert {item["form"]: item["data"] for item in dump["items"].values()}["contact"] == examples["contact"]
+
+    def test_strip_and_backfill(self):
+        """strip vacía data en las filas reconstruibles y backfill lo vuelve a rellenar"""
+        examples = self.post_examples()
+        with engine.begin() as conn:
+            assert strip_data(conn) == len(COLUMNS_ONLY_FORMS)
+        self.assert_exported_data(examples)
+
+        assert backfill_data(engine, batch_size=3) == len(COLUMNS_ONLY_FORMS)
+        with engine.connect() as conn:
+            assert conn.execute(select(func.count()).where(FormSubmission.data.is_(None))).scalar_one() == 0
+        self.assert_exported_data(examples)
+
+    def test_gin_index(self):
+        """El índice GIN opcional sobre data responde a consultas de contención"""
+        client.post("/form/products", json={"products": ["Champú", "Serum"]})
+        client.post("/form/products", json={"products": ["Mascarilla"]})
+        query = text("SELECT count(*) FROM form_submissions WHERE data @> CAST(:filter AS jsonb)")
+        exists = text("SELECT count(*) FROM pg_indexes WHERE indexname = :name")
+        try:
+            with engine.begin() as conn:
+                create_data_index(conn)
+                assert conn.execute(exists, {"name": payloads.DATA_INDEX_NAME}).scalar_one() > 0
+                assert conn.execute(query, {"filter": '{"products": ["Serum"]}'}).scalar_one() == 1
+        finally:
+            with engine.begin() as conn:
+                create_data_index(conn, drop=True)
+                assert conn.execute(exists, {"name": payloads.DATA_INDEX_NAME}).scalar_one() == 0
+
+
+class TestExportEndpoint:
+    """Tests para /export/submissions y la paginación de /debug/dump"""
+
+    def post_answers(self):
+        client.post("/form/age", json={"age": "25-35"})
+        client.post("/form/discovery", json={"source": "Instagram"})
+        client.post("/form/products", json={"products": ["Champú", "Serum"]})
+
+    def test_debug_dump_pagination(self):
+        self.post_answers()
+        first = client.get("/debug/dump", params={"limit": 2}).json()
+        assert first["count"] == 2
+        assert first["next_cursor"]
+
+        second = client.get("/debug/dump", params={"limit": 2, "after": first["next_cursor"]}).json()
+        assert second["count"] == 1
+        assert second["next_cursor"] is None
+        assert not set(first["items"]) & set(second["items"])
+
+    def test_debug_dump_invalid_cursor(self):
+        response = client.get("/debug/dump", params={"after": "not-a-cursor"})
+        assert response.status_code == 422
+
+    def test_export_ndjson_pages(self):
+        self.post_answers()
+        response = client.get("/export/submissions", params={"page_size": 1})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["form"] for line in lines] == ["age", "discovery", "products"]
+        assert lines[2]["products_text"] == "Champú, Serum"
+
+    def test_export_filter_by_form(self):
+        self.post_answers()
+        response = client.get("/export/submissions", params={"form": "discovery"})
+        lines = response.text.splitlines()
+        assert len(lines) == 1
+        assert json.loads(lines[0])["discovery_source"] == "Instagram"
+
+    def test_export_csv(self):
+        self.post_answers()
+        response = client.get("/export/submissions", params={"format": "csv", "page_size": 2})
+        assert response.status_code == 200
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 3
+        assert json.loads(rows[0]["data"]) == {"age": "25-35"}
+
+    def test_export_date_range(self):
+        self.post_answers()
+        response = client.get("/export/submissions", params={"until": "2000-01-01T00:00:00Z"})
+        assert response.text == ""
+
+    def test_export_unknown_form(self):
+        response = client.get("/export/submissions", params={"form": "nonexistent"})
+        assert response.status_code == 422
+
+
+class TestReports:
+    """Tests para /reports/* (rollup diario)"""
+
+    def post_answers(self):
+        for store in ["KCH Centro", "KCH Centro", "KCH Norte"]:
+            client.post("/form/favorite-store", json={"store": store})
+        client.post("/form/products", json={"products": ["Champú", "Serum", "Champú"]})
+        client.post("/form/contact", json={"email": "ana@example.com", "large_family": True})
+        flush_rollups()
+
+    def rollup(self):
+        with engine.connect() as conn:
+            rows = conn.execute(select(FormAnswerDaily)).all()
+        return sorted((row.form, row.dimension, row.answer, row.count) for row in rows)
+
+    def test_submissions_report(self):
+        self.post_answers()
+        response = client.get("/reports/submissions")
+        assert response.status_code == 200
+
+        counts = {row["form"]: row["count"] for row in response.json()["rows"]}
+        assert counts == {"contact": 1, "favorite-store": 3, "products": 1}
+
+    def test_answers_report(self):
+        self.post_answers()
+        rows = client.get("/reports/answers/favorite_store").json()["rows"]
+        assert [(row["answer"], row["count"]) for row in rows] == [("KCH Centro", 2), ("KCH Norte", 1)]
+
+        rows = client.get("/reports/answers/product").json()["rows"]
+        assert {row["answer"]: row["count"] for row in rows} == {"Champú": 1, "Serum": 1}
+
+        rows = client.get("/reports/answers/large_family").json()["rows"]
+        assert [(row["answer"], row["count"]) for row in rows] == [("true", 1)]
+
+    def test_weekly_bucket(self):
+        self.post_answers()
+        rows = client.get("/reports/answers/favorite_store", params={"bucket": "week"}).json()["rows"]
+        assert all(datetime.fromisoformat(row["period"]).weekday() == 0 for row in rows)
+
+    def test_batch_updates_rollup(self):
+        items = [{"form": "age", "data": {"age": "45+"}}] * 3
+        client.post("/form/batch", json={"items": items})
+        flush_rollups()
+        rows = client.get("/reports/answers/age_range").json()["rows"]
+        assert [(row["answer"], row["count"]) for row in rows] == [("45+", 3)]
+
+    def test_unknown_dimension(self):
+        response = client.get("/reports/answers/customer_name")
+        assert response.status_code == 422
+
+    def test_inserts_leave_rollup_to_the_writer(self):
+        """El envío no escribe el rollup en su transacción: lo hace RollupWriter después"""
+        row = TestIngestionQueue.make_row(age_range="45+")
+
+        async def scenario():
+            async with AsyncSessionLocal() as db:
+                await insert_submissions(db, [row])
+                written = (await db.execute(select(func.count()).select_from(FormAnswerDaily))).scalar_one()
+                await db.commit()
+            return written, sum(rollup_writer.pending.values())
+
+        assert client.portal.call(scenario) == (0, 2)
+        flush_rollups()
+        assert self.rollup() == [("age", "_total", "", 1), ("age", "age_range", "45+", 1)]
+        assert not rollup_writer.pending
+
+    def test_default_range_ends_today_utc(self):
+        since, until = default_range(None, None)
+        assert until == datetime.now(timezone.utc).date()
+        assert (until - since).days == 29
+
+    def test_rebuild_matches_incremental(self):
+        self.post_answers()
+        incremental = self.rollup()
+        with engine.begin() as conn:
+            rebuild_rollups(conn)
+        assert self.rollup() == incremental
+
+
+class TestProductSearch:
+    """Tests para /search/products"""
+
+    def submit_products(self, *lists):
+        for products in lists:
+            assert client.post("/form/products", json={"products": products}).status_code == 200
+        flush_rollups()
+
+    def test_search_ignores_accents_and_case(self):
+        self.submit_products(["Champú Anticaspa", "Serum"], ["champú"], ["Mascarilla"])
+        response = client.get("/search/products", params={"q": "CHAMPU"})
+        assert response.status_code == 200
+
+        data = response.json()
+        assert len(data["results"]) == 2
+        assert all(any("hamp" in product for product in result["products"]) for result in data["results"])
+        assert {item["product"]: item["count"] for item in data["products"]} == {"Champú Anticaspa": 1, "champú": 1}
+
+    def test_search_matches_prefixes(self):
+        self.submit_products(["Serum"], ["Mascarilla"])
+        data = client.get("/search/products", params={"q": "ser"}).json()
+        assert [result["products"] for result in data["results"]] == [["Serum"]]
+        assert data["products"] == [{"product": "Serum", "count": 1}]
+
+    def test_search_sees_new_submissions(self):
+        self.submit_products(["Serum"])
+        assert len(client.get("/search/products", params={"q": "serum"}).json()["results"]) == 1
+        self.submit_products(["Serum", "Champú"])
+        assert len(client.get("/search/products", params={"q": "serum"}).json()["results"]) == 2
+
+    def test_search_without_words(self):
+        response = client.get("/search/products", params={"q": "¿?"})
+        assert response.status_code == 422
+
+    def test_search_expression_matches_the_products_index(self):
+        # Con tablas vacías el planificador no elegiría el índice: se fuerza y se
+        # comprueba que la expresión de búsqueda es la indexada
+        with engine.begin() as conn:
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+            plan = conn.execute(text(
+                f"EXPLAIN SELECT id FROM {partition_name('products')} "
+                f"WHERE {PRODUCTS_TSVECTOR} @@ to_tsquery('spanish', 'champu:*')"
+            )).scalars().all()
+        assert any("Bitmap Index Scan" in line for line in plan)
+
+
+class TestReportCache:
+    """Tests para la caché TTL/LRU de reportes"""
+
+    def test_hit_and_invalidation_on_insert(self):
+        client.post("/form/favorite-store", json={"store": "KCH Centro"})
+        flush_rollups()
+        hits = report_cache.hits
+
+        first = client.get("/reports/answers/favorite_store").json()
+        second = client.get("/reports/answers/favorite_store").json()
+        assert first == second
+        assert report_cache.hits == hits + 1
+
+        # Una inserción de otro formulario no invalida esta entrada...
+        client.post("/form/age", json={"age": "45+"})
+        client.get("/reports/answers/favorite_store")
+        assert report_cache.hits == hits + 2
+
+        # ...pero una del mismo formulario sí
+        client.post("/form/favorite-store", json={"store": "KCH Centro"})
+        flush_rollups()
+        rows = client.get("/reports/answers/favorite_store").json()["rows"]
+        assert rows[0]["count"] == 2
+        assert report_cache.hits == hits + 2
+
+    def test_stats_endpoint(self):
+        client.get("/reports/submissions")
+        data = client.get("/reports/cache").json()
+        assert data["size"] == 1
+        assert data["misses"] >= 1
+
+    def test_ttl_and_lru(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)  # expulsa "b", el menos usado
+        assert cache.get("b") is None
+        assert cache.evictions == 1
+
+        expired = TTLCache(maxsize=2, ttl=-1)
+        expired.set("a", 1)
+        assert expired.get("a") is None
+
+    def test_concurrent_loads_share_one_query(self):
+        cache = TTLCache()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return ["rows"]
+
+        async def scenario():
+            return await asyncio.gather(*(cache.get_or_load("key", loader) for _ in range(5)))
+
+        assert client.portal.call(scenario) == [["rows"]] * 5
+        assert len(calls) == 1
+
+
+class TestIngestionQueue:
+    """Tests para la cola de ingesta por lotes (write-behind)"""
+
+    @staticmethod
+    def make_row(form="age", **fields):
+        meta = make_meta(form)
+        return {"id": meta.id, "form": meta.form, "received_at": meta.received_at, "data": fields, **fields}
+
+    def test_queue_flushes_in_batches_and_drains_on_stop(self):
+        queue = SubmissionQueue(maxsize=100, batch_size=3, flush_interval=0.05)
+
+        async def scenario():
+            await queue.start()
+            for _ in range(7):
+                await queue.enqueue(self.make_row(age_range="25-35"))
+            await queue.stop()
+
+        client.portal.call(scenario)
+        assert queue.flushed == 7
+        assert queue.failed == 0
+        assert count_submissions() == 7
+
+        # Las respuestas de dimensión llegan a insert_submissions y se guardan como ids
+        with engine.connect() as conn:
+            labels = conn.execute(text(
+                "SELECT d.label FROM form_submissions s JOIN dim_age_range d ON d.id = s.age_range_id"
+            )).scalars().all()
+        assert labels == ["25-35"] * 7
+        flush_rollups()
+        with engine.connect() as conn:
+            rollup = conn.execute(
+                select(FormAnswerDaily.answer, FormAnswerDaily.count).where(FormAnswerDaily.dimension == "age_range")
+            ).all()
+        assert rollup == [("25-35", 7)]
+
+    def test_rejected_row_does_not_drop_its_batch(self):
+        """Una fila que la base de datos rechaza se descarta sola; el resto del lote se guarda"""
+        queue = SubmissionQueue(maxsize=100, batch_size=50, flush_interval=0.05)
+
+        async def scenario():
+            await queue.start()
+            for _ in range(5):
+                await queue.enqueue(self.make_row(age_range="25-35"))
+            # customer_name es VARCHAR(255): el INSERT del lote entero falla
+            await queue.enqueue(self.make_row("personal-data", customer_name="x" * 300))
+            for _ in range(5):
+                await queue.enqueue(self.make_row("contact", email="ana@example.com", large_family=False))
+            await queue.stop()
+
+        client.portal.call(scenario)
+        assert queue.failed == 1
+        assert queue.flushed == 10
+        assert count_submissions() == 10
+
+    def test_queue_backpressure_when_full(self):
+        queue = SubmissionQueue(maxsize=2, batch_size=10, enqueue_timeout=0.01)
+
+        async def scenario():
+            # Sin tarea de vaciado en marcha: la cola se llena enseguida
+            queue._queue = asyncio.Queue(maxsize=2)
+            await queue.enqueue(self.make_row())
+            await queue.enqueue(self.make_row())
+            with pytest.raises(QueueFullError):
+                await queue.enqueue(self.make_row())
+
+        client.portal.call(scenario)
+
+    def test_enqueue_rejected_when_not_started(self):
+        queue = SubmissionQueue()
+
+        async def scenario():
+            with pytest.raises(QueueFullError):
+                await queue.enqueue(self.make_row())
+
+        client.portal.call(scenario)
+
+
+class TestPoolStatus:
+    """Tests para /health/pool"""
+
+    def test_pool_status(self):
+        client.post("/form/age", json={"age": "25-35"})
+        response = client.get("/health/pool")
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["checked_out"] == 0
+        assert data["capacity"] == data["size"] + data["max_overflow"]
+        assert data["wait"]["count"] >= 1
+
+    def test_maintenance_engine_has_no_statement_timeout(self):
+        """Migraciones y scripts de mantenimiento no heredan el statement_timeout de la API"""
+        with engine.connect() as conn:
+            assert conn.execute(text("SHOW statement_timeout")).scalar_one() == "0"
+
+
+class TestLiveCounters:
+    """Tests para los contadores en vivo (/live/stream)"""
+
+    def test_notify_payloads_fit_postgres_limit(self):
+        entries = [("2026-10-16", "products", "product", f"Producto {i} " + "x" * 200, i) for i in range(200)]
+        payloads = notify_payloads(entries)
+        assert len(payloads) > 1
+        assert all(len(payload) <= 7900 for payload in payloads)
+        assert [tuple(entry) for payload in payloads for entry in json.loads(payload)] == entries
+
+    def test_snapshot_totals_and_recent_window(self):
+        counters = LiveCounters(window_minutes=15)
+        today = counters.day.isoformat()
+        now = 1_800_000_000.0
+        counters.apply([(today, "age", "_total", "", 3), (today, "age", "age_range", "25-35", 3)], now=now - 3600)
+        counters.apply([(today, "age", "_total", "", 2), (today, "age", "age_range", "18-25", 2)], now=now)
+        counters.apply([("2020-01-01", "contact", "_total", "", 1)], now=now)
+        snapshot = counters.build_snapshot(now)
+        assert snapshot["totals"]["age"] == 5 and snapshot["totals"]["contact"] == 0
+        assert snapshot["recent"]["submissions"]["age"] == 2
+        assert snapshot["recent"]["answers"]["age_range"] == [{"answer": "18-25", "count": 2}]
+        assert set(snapshot["totals"]) >= {spec.name for spec in FORMS}
+
+    def test_resync_keeps_unflushed_increments(self):
+        """Un envío ya publicado pero aún no escrito en el rollup no se pierde al resincronizar"""
+        counters = LiveCounters()
+        client.post("/form/age", json={"age": "25-35"})
+        # Lo que habría llegado por NOTIFY; el rollup aún no lo tiene (RollupWriter no ha escrito)
+        counters.apply([(counters.day.isoformat(), "age", "_total", "", 1)])
+        client.portal.call(counters.resync)
+        assert counters.totals["age"] == 1
+
+        # Tras escribir el rollup, la tabla manda si va por delante (NOTIFY perdidos)
+        client.post("/form/age", json={"age": "25-35"})
+        flush_rollups()
+        client.portal.call(counters.resync)
+        assert counters.totals["age"] == 2
+
+    def test_commits_reach_every_worker(self):
+        """Un envío confirmado llega por NOTIFY a este worker y a cualquier otro que escuche"""
+        other = LiveCounters()
+
+        def recent(counters):
+            return counters.build_snapshot()["recent"]["submissions"].get("favorite-store", 0)
+
+        async def wait_for_notify(before):
+            for _ in range(100):
+                await live_counters.publish()
+                if recent(live_counters) > before and recent(other) > 0:
+                    return True
+                await asyncio.sleep(0.02)
+            return False
+
+        client.portal.call(other.listen)
+        try:
+            before = recent(live_counters)
+            client.post("/form/favorite-store", json={"store": "KCH Centro"})
+            assert client.portal.call(wait_for_notify, before)
+        finally:
+            client.portal.call(other.stop)
+
+    def test_stream_fans_out_snapshots(self):
+        """Cada suscriptor recibe la instantánea actual y luego cada cambio, codificado una sola vez"""
+        async def read_events():
+            stream = live_counters.stream()
+            try:
+                first = await stream.__anext__()
+                live_counters.apply([(live_counters.day.isoformat(), "age", "_total", "", 1)])
+                live_counters.broadcast()
+                second = await stream.__anext__()
+                return first, second, live_counters.subscribers, live_counters.message
+            finally:
+                await stream.aclose()
+
+        first, second, subscribers, message = client.portal.call(read_events)
+        assert first.startswith("event: counts\ndata: ")
+        assert second is message
+        assert json.loads(second.split("data: ", 1)[1])["totals"]["age"] >= 1
+        assert subscribers >= 1
+        assert live_counters.subscribers == 0
+
+    def test_stream_keepalive(self):
+        async def first_event():
+            stream = LiveCounters().stream(keepalive=0.01)
+            try:
+                return await stream.__anext__()
+            finally:
+                await stream.aclose()
+
+        assert client.portal.call(first_event) == ": keepalive\n\n"
+
+    def test_stream_ends_and_asks_to_reconnect(self):
+        """Cada conexión termina a los max_seconds: no retrasa el apagado del worker"""
+        counters = LiveCounters()
+
+        async def read_all():
+            async with asyncio.timeout(5):
+                return [event async for event in counters.stream(keepalive=10, max_seconds=0.05)]
+
+        assert client.portal.call(read_all) == ["retry: 1000\n\n"]
+        assert counters.subscribers == 0
+
+    def test_stream_rejects_over_capacity(self, monkeypatch):
+        monkeypatch.setattr(main, "LIVE_MAX_SUBSCRIBERS", 0)
+        assert client.get("/live/stream").status_code == 503
+
+
+class TestHealthChecks:
+    """Tests para /live, /ready y /health"""
+
+    POOL = {"checked_out": 1, "capacity": 15}
+
+    def test_live(self):
+        response = client.get("/live")
+        assert response.status_code == 200
+        assert response.json() == {"status": "alive"}
+
+    def test_ready(self):
+        client.portal.call(readiness_monitor.refresh)
+        response = client.get("/ready")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["ready"] is True
+        assert data["reasons"] == []
+        assert data["database"]["ok"] is True
+        assert data["pool"]["capacity"] > 0
+
+    def test_health_uses_cached_check(self):
+        client.portal.call(readiness_monitor.refresh)
+        checked_at = readiness_monitor.status["checked_at"]
+        data = client.get("/health").json()
+        assert data["status"] == "healthy"
+        assert data["database"] == "connected"
+        assert readiness_monitor.status["checked_at"] == checked_at
+
+    def test_not_ready_when_database_fails(self):
+        assert evaluate(False, self.POOL, None) == (False, ["database"])
+
+    def test_not_ready_when_pool_saturated(self):
+        assert evaluate(True, {"checked_out": 14, "capacity": 15}, None) == (False, ["pool_saturated"])
+
+    def test_not_ready_when_queue_lags(self):
+        queue = {"depth": 10, "maxsize": 10000, "last_lag_s": 30.0}
+        assert evaluate(True, self.POOL, queue) == (False, ["queue_lag"])
+        assert evaluate(True, self.POOL, {**queue, "depth": 0}) == (True, [])
+        assert evaluate(True, self.POOL, {**queue, "depth": 9000, "last_lag_s": 0.1}) == (False, ["queue_full"])
+
+
+class TestReadReplica:
+    """Tests para el enrutado de las lecturas de consulta a la réplica"""
+
+    @pytest.fixture
+    def replica(self, monkeypatch):
+        """Réplica simulada: otro motor (con su pool) contra la misma base de datos"""
+        read_engine = create_async_engine(ASYNC_DATABASE_URL)
+        opened = []
+        sessions = async_sessionmaker(read_engine, expire_on_commit=False)
+
+        def session_factory():
+            opened.append(True)
+            return sessions()
+
+        monkeypatch.setattr(replica_monitor, "engine", read_engine)
+        monkeypatch.setattr(replica_monitor, "replica_session_factory", session_factory)
+        monkeypatch.setattr(replica_monitor, "status", None)
+        yield opened
+        client.portal.call(read_engine.dispose)
+
+    def test_primary_without_replica(self):
+        data = client.get("/health/replica").json()
+        assert data == {"enabled": False, "target": "primary", "status": None}
+        assert replica_monitor.session_factory() is AsyncSessionLocal
+
+    def test_reads_go_to_replica(self, replica):
+        """Dump, exportación, reportes y búsqueda usan la réplica; los envíos, el primario"""
+        status = client.portal.call(replica_monitor.refresh)
+        assert status["usable"] is True and status["lag_s"] == 0
+        client.post("/form/products", json={"products": ["Serum"]})
+        assert replica == []
+
+        assert client.get("/debug/dump").json()["count"] == 1
+        assert len(client.get("/export/submissions").text.splitlines()) == 1
+        assert client.get("/reports/submissions").status_code == 200
+        assert client.get("/search/products", params={"q": "serum"}).json()["results"]
+        assert len(replica) == 4
+        assert client.get("/health/replica").json()["target"] == "replica"
+
+    def test_lagging_replica_falls_back_to_primary(self, replica, monkeypatch):
+        monkeypatch.setattr(replica_monitor, "max_lag", -1.0)
+        status = client.portal.call(replica_monitor.refresh)
+        assert status["usable"] is False and status["error"] is None
+        client.get("/debug/dump")
+        assert replica == []
+
+    def test_unreachable_replica_falls_back_to_primary(self, replica, monkeypatch):
+        down = create_async_engine("postgresql+asyncpg://postgres@127.0.0.1:1/kch", connect_args={"timeout": 1})
+        monkeypatch.setattr(replica_monitor, "engine", down)
+        status = client.portal.call(replica_monitor.refresh)
+        assert status["usable"] is False and status["error"]
+        assert replica_monitor.session_factory() is AsyncSessionLocal
+        client.portal.call(down.dispose)
+
+
+class TestMetrics:
+    """Tests para /metrics y los tiempos por etapa"""
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    def test_form_request_is_counted_by_form(self):
+        before = self.sample("kch_requests_total", endpoint="age", method="POST", status="200")
+        client.post("/form/age", json={"age": "25-35"})
+        assert self.sample("kch_requests_total", endpoint="age", method="POST", status="200") == before + 1
+
+    def test_stages_are_timed(self):
+        stages = ("validate", "extract", "insert", "commit", "serialize")
+        before = {stage: self.sample("kch_submission_stage_seconds_count", form="contact", stage=stage) for stage in stages}
+        client.post("/form/contact", json={"email": "ana@example.com", "large_family": True})
+        for stage in stages:
+            assert self.sample("kch_submission_stage_seconds_count", form="contact", stage=stage) == before[stage] + 1
+
+    def test_unknown_paths_share_a_label(self):
+        before = self.sample("kch_requests_total", endpoint="other", method="GET", status="404")
+        client.get("/no-existe/123")
+        assert self.sample("kch_requests_total", endpoint="other", method="GET", status="404") == before + 1
+
+    def test_metrics_endpoint(self):
+        client.post("/form/age", json={"age": "25-35"})
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        assert 'kch_request_duration_seconds_bucket{endpoint="age",le="0.001",method="POST"}' in body
+        assert "kch_db_pool_checked_out" in body
+        assert "kch_ingestion_queue_depth" in body
+
+
 class TestResponseFormat:
     """Tests para verificar el formato de respuesta común"""
     
@@ -381,6 +1439,19 @@ class TestResponseFormat:
             # Verificar formato de fecha
             datetime.fromisoformat(data["received_at"].replace("Z", "+00:00"))
 
+    def test_fast_response_matches_response_model(self):
+        """La respuesta serializada con orjson es idéntica a la de response_model"""
+        for spec in FORMS:
+            example = spec.payload_model.model_config["json_schema_extra"]["example"]
+            response = client.post(spec.route, json=example)
+            assert response.status_code == 200
+            assert response.headers["content-type"] == "application/json"
+
+            data = response.json()
+            assert data["received_at"].endswith("Z")
+            assert data == spec.response_model.model_validate(data).model_dump(mode="json")
+            assert data["data"] == spec.payload_model.model_validate(example).model_dump(mode="json")
+
 
 class TestErrorHandling:
     """Tests para manejo de errores"""